@@ -0,0 +1,382 @@
+"""
+Benchmarks of the sweep engine with simulated instruments.
+
+Every benchmark builds a sweep object from fake setters and getters, which
+keep their state in a dictionary and optionally wait for a fixed latency to
+simulate instrument round trips. For each benchmark the number of points per
+second (best of a number of repeats) and the peak memory allocated while
+running (measured with tracemalloc in a separate run) are reported. Points
+are single samples: a row with arrays of 1000 samples counts as 1000 points,
+so that the rates of benchmarks with numeric and array parameters can be
+compared. The number of rows is reported as well.
+
+The results are written to a JSON file named after the current git commit,
+so that runs on different commits can be compared. The qsweep package needs
+to be importable (e.g. after `pip install -e .`):
+
+    $ python benchmarks/run_benchmarks.py
+    $ git checkout other_branch
+    $ python benchmarks/run_benchmarks.py --compare benchmarks/results/<sha>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+import qcodes
+
+try:
+    from qcodes.dataset.sqlite.database import initialise_or_create_database_at
+except ImportError:
+    # Older versions of QCoDeS
+    from qcodes.dataset.database import initialise_or_create_database_at
+
+from qsweep import (
+    sweep, measure, nest, chain, szip, getter, setter, hardsweep
+)
+from qsweep.do_experiment import do_experiment
+from qsweep.storage import NumpyStore
+
+_RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Instruments:
+    """
+    Make fake setters and getters by name, in the manner of the
+    `indep_params` and `dep_params` test fixtures.
+
+    Args:
+        latency: The number of seconds each set and get call takes. A busy
+            wait is used, since sleeping is too coarse for latencies of
+            microseconds.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.state = {}
+
+    def _wait(self):
+        if self.latency:
+            deadline = time.perf_counter() + self.latency
+            while time.perf_counter() < deadline:
+                pass
+
+    def setter(self, name, paramtype="numeric"):
+
+        @setter((name, "V", paramtype))
+        def set_function(value):
+            self._wait()
+            self.state[name] = value
+
+        return set_function
+
+    def getter(self, name, paramtype="numeric"):
+
+        @getter((name, "A", paramtype))
+        def get_function():
+            self._wait()
+            return self.state.get("x", 0.0)
+
+        return get_function
+
+
+def bench_sweep(instruments, size):
+    x = instruments.setter("x")
+    return sweep(x, np.linspace(0, 1, size))
+
+
+def bench_sweep_measure(instruments, size):
+    x = instruments.setter("x")
+    i = instruments.getter("i")
+    return sweep(x, np.linspace(0, 1, size))(measure(i))
+
+
+def _deep_nest(instruments, size, depth=4):
+    # The points are divided over the levels of the nest
+    n_points = max(int(round(size ** (1 / depth))), 1)
+    sweep_objects = [
+        sweep(instruments.setter(f"x{level}"), np.linspace(0, 1, n_points))
+        for level in range(depth)
+    ]
+
+    return nest(*sweep_objects, measure(instruments.getter("i")))
+
+
+def bench_deep_nest(instruments, size):
+    return _deep_nest(instruments, size)
+
+
+def bench_deep_nest_compiled(instruments, size):
+    return _deep_nest(instruments, size).compile()
+
+
+def bench_wide_chain(instruments, size, width=50):
+    x = instruments.setter("x")
+    getters = [measure(instruments.getter(f"i{n}")) for n in range(width)]
+    return sweep(x, np.linspace(0, 1, max(size // width, 1)))(chain(*getters))
+
+
+def bench_zip(instruments, size):
+    x = instruments.setter("x")
+    y = instruments.setter("y")
+    return szip(
+        sweep(x, np.linspace(0, 1, size)), sweep(y, np.linspace(0, 1, size))
+    )
+
+
+# The number of samples which a hardsweep returns per call
+_HARDSWEEP_SAMPLES = 1000
+
+
+def bench_hardsweep_numeric(instruments, size):
+    n_points = _HARDSWEEP_SAMPLES
+
+    @hardsweep(ind=[("t", "s")], dep=[("v", "V")], n_points=n_points)
+    def acquire():
+        instruments._wait()
+        t = np.linspace(0, 1, n_points)
+        return t, np.sin(t)
+
+    x = instruments.setter("x")
+    return sweep(x, np.linspace(0, 1, max(size // n_points, 1)))(acquire())
+
+
+def bench_hardsweep_array(instruments, size):
+    n_samples = _HARDSWEEP_SAMPLES
+
+    @hardsweep(ind=[("t", "s", "array")], dep=[("v", "V", "array")])
+    def acquire():
+        instruments._wait()
+        t = np.linspace(0, 1, n_samples)
+        return t, np.sin(t)
+
+    x = instruments.setter("x")
+    return sweep(x, np.linspace(0, 1, max(size // n_samples, 1)))(acquire())
+
+
+# Benchmarks of iterating sweep objects, with their sizes in points and the
+# number of points (samples) in each row they yield
+SWEEP_BENCHMARKS = OrderedDict([
+    ("sweep", (bench_sweep, 100000, 1)),
+    ("sweep_measure", (bench_sweep_measure, 50000, 1)),
+    ("deep_nest", (bench_deep_nest, 50000, 1)),
+    ("deep_nest_compiled", (bench_deep_nest_compiled, 50000, 1)),
+    ("wide_chain", (bench_wide_chain, 50000, 1)),
+    ("zip", (bench_zip, 100000, 1)),
+    ("hardsweep_numeric", (bench_hardsweep_numeric, 200000, 1)),
+    ("hardsweep_array", (bench_hardsweep_array, 200000, _HARDSWEEP_SAMPLES)),
+])
+
+# Benchmarks of do_experiment; the names of the above benchmarks with
+# do_experiment options and whether to use a NumpyStore
+EXPERIMENT_BENCHMARKS = OrderedDict([
+    ("experiment_sqlite", ("sweep_measure", {}, False)),
+    ("experiment_sqlite_blocks", ("sweep_measure", {"block_size": 1000},
+                                  False)),
+    ("experiment_sqlite_pipelined", ("sweep_measure", {"pipelined": True},
+                                     False)),
+    ("experiment_sqlite_array", ("hardsweep_array", {}, False)),
+    ("experiment_numpy_store", ("sweep_measure", {"block_size": 1000}, True)),
+    ("experiment_numpy_store_array", ("hardsweep_array", {}, True)),
+])
+
+
+def _count(iterable):
+    count = 0
+    for value in iterable:
+        count += 1
+    return count
+
+
+def _run_sweep_benchmark(name, size, latency, directory):
+    """
+    Return the number of rows and the number of points
+    """
+    factory, default_size, row_points = SWEEP_BENCHMARKS[name]
+    sweep_object = factory(Instruments(latency), size or default_size)
+    n_rows = _count(sweep_object)
+    return n_rows, n_rows * row_points
+
+
+def _run_experiment_benchmark(name, size, latency, directory):
+    sweep_name, options, use_store = EXPERIMENT_BENCHMARKS[name]
+    factory, default_size, row_points = SWEEP_BENCHMARKS[sweep_name]
+    sweep_object = factory(Instruments(latency), size or default_size)
+
+    storage = None
+    if use_store:
+        storage = NumpyStore(tempfile.mkdtemp(dir=directory))
+
+    do_experiment("benchmark/sample", sweep_object, storage=storage,
+                  **options)
+    return len(sweep_object), len(sweep_object) * row_points
+
+
+def _measure(run, repeat):
+    """
+    Return the number of rows and points, the best time in seconds and the
+    peak memory in bytes of a benchmark
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_rows, n_points = run()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return n_rows, n_points, best, peak_memory
+
+
+def _git_commit():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=directory
+        ).decode().strip()
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=directory
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+    return commit, bool(status)
+
+
+def run_benchmarks(names=None, size=None, latency=0.0, repeat=3):
+    """
+    Run the benchmarks (all of them, or the ones with the given names) and
+    return the results as a dictionary
+    """
+    commit, dirty = _git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "qcodes": qcodes.__version__,
+        "latency": latency,
+        "results": OrderedDict()
+    }
+
+    all_names = list(SWEEP_BENCHMARKS) + list(EXPERIMENT_BENCHMARKS)
+    names = all_names if names is None else names
+
+    unknown = set(names) - set(all_names)
+    if len(unknown):
+        raise ValueError(f"Unknown benchmarks {sorted(unknown)}. Available "
+                         f"benchmarks: {all_names}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        initialise_or_create_database_at(
+            os.path.join(directory, "benchmarks.db")
+        )
+
+        for name in names:
+            if name in SWEEP_BENCHMARKS:
+                runner = _run_sweep_benchmark
+            else:
+                runner = _run_experiment_benchmark
+
+            n_rows, n_points, seconds, peak_memory = _measure(
+                lambda: runner(name, size, latency, directory), repeat
+            )
+
+            report["results"][name] = {
+                "rows": n_rows,
+                "points": n_points,
+                "seconds": seconds,
+                "points_per_second": n_points / seconds,
+                "peak_memory_bytes": peak_memory
+            }
+
+    return report
+
+
+def _print_report(report, baseline=None):
+    header = (
+        f"{'benchmark':<32}{'rows':>10}{'points':>10}{'points/s':>14}"
+        f"{'memory':>12}"
+    )
+    if baseline is not None:
+        header += f"{'vs ' + baseline['commit'][:8]:>14}"
+    print(header)
+
+    for name, result in report["results"].items():
+        line = (
+            f"{name:<32}{result['rows']:>10d}{result['points']:>10d}"
+            f"{result['points_per_second']:>14.0f}"
+            f"{result['peak_memory_bytes'] / 2 ** 20:>10.1f}MB"
+        )
+
+        if baseline is not None:
+            base = baseline["results"].get(name)
+            if base is None:
+                line += f"{'-':>14}"
+            else:
+                ratio = result["points_per_second"] / \
+                    base["points_per_second"]
+                line += f"{ratio:>13.2f}x"
+
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("names", nargs="*",
+                        help="The benchmarks to run (default: all)")
+    parser.add_argument("--size", type=int, default=None,
+                        help="The number of points of every benchmark")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="The latency of every set and get call (s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Report the best of this many runs")
+    parser.add_argument("--output", default=None,
+                        help="The JSON file to write the results to "
+                             "(default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None,
+                        help="A JSON file with earlier results to compare to")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        names=args.names or None, size=args.size, latency=args.latency,
+        repeat=args.repeat
+    )
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+
+    _print_report(report, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(_RESULTS_DIRECTORY, exist_ok=True)
+        suffix = "-dirty" if report["dirty"] else ""
+        output = os.path.join(
+            _RESULTS_DIRECTORY, f"{report['commit']}{suffix}.json"
+        )
+
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
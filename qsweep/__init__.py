@@ -1,3 +1,5 @@
-from .convenience import sweep, measure, nest, chain, szip
+from .convenience import (
+    sweep, measure, nest, chain, szip, parallel, adaptive_sweep
+)
 from .decorators import getter, setter, hardsweep
-from .do_experiment import do_experiment
+from .do_experiment import do_experiment, async_do_experiment, resume
@@ -0,0 +1,257 @@
+"""
+Sweep a parameter adaptively: choose each next set point from the results
+measured so far, so that points end up where the measured signal changes,
+instead of on a uniform grid.
+
+The sweep starts with the two end points of the interval. It then keeps
+splitting the interval between neighbouring points which has the largest
+loss, until the requested number of points is reached, the largest loss drops
+below a goal, or all intervals are smaller than the minimal step.
+
+Loss functions get the end points of an interval, with the set values scaled
+by the width of the swept interval and the measured values scaled by the
+range of values measured so far, so that both are of order one.
+"""
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+import numpy as np
+
+from qsweep import param_table
+from qsweep.base import (
+    BaseSweepObject, _SettleClock, _acall, _find_parallel, _holding_threads
+)
+
+
+def default_loss(
+        x: np.ndarray, y: np.ndarray, x_next: np.ndarray,
+        y_next: np.ndarray) ->np.ndarray:
+    """
+    The length of the line segments between neighbouring points. This
+    refines both where the signal changes quickly and, to a lesser degree,
+    large gaps in the set points.
+
+    Loss functions take arrays with the (scaled) set and measured values at
+    the left and right end of every interval, and return the loss of each
+    interval.
+    """
+    return np.hypot(x_next - x, y_next - y)
+
+
+def uniform_loss(
+        x: np.ndarray, y: np.ndarray, x_next: np.ndarray,
+        y_next: np.ndarray) ->np.ndarray:
+    """
+    The width of each interval, which refines the set points uniformly
+    """
+    return x_next - x
+
+
+class _Learner1D:
+    """
+    Keep track of the measured points and decide on the next set point
+    """
+    def __init__(
+            self, start: float, stop: float, loss: Callable,
+            n_points: Optional[int], loss_goal: Optional[float],
+            min_step: float) ->None:
+
+        self._start = start
+        self._stop = stop
+        self._loss = loss
+        self._n_points = n_points
+        self._loss_goal = loss_goal
+        self._min_step = min_step
+
+        self._pending = [start, stop]
+        self._x: List[float] = []
+        self._y: List[float] = []
+
+    def tell(self, x: float, y: float) ->None:
+        index = int(np.searchsorted(self._x, x))
+        self._x.insert(index, x)
+        self._y.insert(index, y)
+
+    def ask(self) ->Optional[float]:
+        """
+        Return the next set point, or None if we are done
+        """
+        if self._n_points is not None and len(self._x) >= self._n_points:
+            return None
+
+        if len(self._pending):
+            return self._pending.pop(0)
+
+        x = np.array(self._x)
+        y = np.array(self._y, dtype=float)
+
+        widths = np.diff(x)
+        splittable = widths >= 2 * self._min_step
+        if not np.any(splittable):
+            return None
+
+        finite = np.isfinite(y)
+        y_scaled = np.zeros_like(y)
+        if np.any(finite):
+            y_range = np.ptp(y[finite])
+            if y_range:
+                y_scaled[finite] = (y[finite] - y[finite].min()) / y_range
+
+        x_scaled = (x - x[0]) / (x[-1] - x[0])
+        losses = np.asarray(self._loss(
+            x_scaled[:-1], y_scaled[:-1], x_scaled[1:], y_scaled[1:]
+        ), dtype=float)
+        # Intervals next to failed measurements (e.g. NaN) are refined first
+        losses[~(finite[:-1] & finite[1:])] = np.inf
+        losses[~splittable] = -np.inf
+
+        interval = int(np.argmax(losses))
+        if self._loss_goal is not None and \
+                losses[interval] < self._loss_goal:
+            return None
+
+        return (x[interval] + x[interval + 1]) / 2
+
+
+class AdaptiveSweep(BaseSweepObject):
+    """
+    Sweep a parameter between two values and, at every set point, iterate
+    over a measurable sweep object (like a nest of a sweep and a
+    measurement). The set points are chosen one at a time from the values
+    of a target parameter measured so far; see the `qsweep.adaptive` module.
+
+    Since the set points depend on the measurements, the shape of an adaptive
+    sweep is not known in advance and it cannot be compiled. When nested
+    in another sweep, the refinement starts anew at every outer step (e.g.
+    line by line in a two dimensional map).
+
+    Parameters
+    ----------
+    set_function: callable
+        A function of one argument which sets the independent parameter,
+        decorated with `qsweep.setter`
+    sweep_object: BaseSweepObject
+        A measurable sweep object to run at every set point
+    start, stop: float
+        The interval to sweep
+    n_points: int
+        The maximum number of set points
+    loss_goal: float
+        Stop when the loss of every interval is below this value
+    min_step: float
+        Do not split intervals which are smaller than twice this value. By
+        default, this is a millionth of the swept interval.
+    loss: callable
+        The loss function; see `default_loss`
+    target: str
+        The name of the measured parameter whose values determine the loss.
+        If multiple rows carry this parameter at a set point, the last value
+        is used. By default, the first dependent parameter of the sweep
+        object.
+    """
+
+    def __init__(
+            self, set_function: Callable, sweep_object: BaseSweepObject,
+            start: float, stop: float, n_points: int = None,
+            loss_goal: float = None, min_step: float = None,
+            loss: Callable = None, target: str = None) ->None:
+
+        super().__init__()
+
+        if not sweep_object.measurable:
+            raise TypeError("An adaptive sweep needs a measurable sweep "
+                            "object to decide where to sample")
+
+        if n_points is None and loss_goal is None and min_step is None:
+            raise ValueError("Please specify at least one of n_points, "
+                             "loss_goal and min_step")
+
+        if n_points is not None and n_points < 2:
+            raise ValueError("An adaptive sweep needs at least two points")
+
+        if start == stop:
+            raise ValueError("The start and stop values need to differ")
+
+        names = [nest[-1] for nest in sweep_object.parameter_table.nests]
+        if target is None:
+            target = names[0]
+        elif target not in names:
+            raise ValueError(f"Unknown target parameter {target}. Please "
+                             f"choose one of {names}")
+
+        self._set_function = set_function
+        self._sweep_object = sweep_object
+        self._start = start
+        self._stop = stop
+        self._n_points = n_points
+        self._loss_goal = loss_goal
+        self._min_step = min_step if min_step is not None else \
+            abs(stop - start) * 1e-6
+        self._loss = loss or default_loss
+        self._target = target
+
+        self._measurable = True
+        self._parameter_table = param_table.prod([
+            set_function.parameter_table, sweep_object.parameter_table
+        ])
+        self._share_settle_clock(self._settle_clock)
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        super()._share_settle_clock(clock)
+        self._sweep_object._share_settle_clock(clock)
+
+    def _make_learner(self) ->_Learner1D:
+        return _Learner1D(
+            self._start, self._stop, self._loss, self._n_points,
+            self._loss_goal, self._min_step
+        )
+
+    def _generator_factory(self) ->Iterator:
+        # The sweep object is restarted at every point
+        return _holding_threads(
+            self._adaptive_generator(), _find_parallel([self._sweep_object])
+        )
+
+    def _adaptive_generator(self) ->Iterator:
+        learner = self._make_learner()
+
+        x = learner.ask()
+        while x is not None:
+            set_values = self._set_function(x)
+
+            value = np.nan
+            for result in self._sweep_object:
+                if self._target in result:
+                    value = result[self._target]
+                result.update(set_values)
+                yield result
+
+            learner.tell(x, _as_real(value))
+            x = learner.ask()
+
+    async def _async_generator_factory(self) ->AsyncIterator:
+        learner = self._make_learner()
+
+        x = learner.ask()
+        while x is not None:
+            set_values = await _acall(self._set_function, x)
+
+            value = np.nan
+            async for result in self._sweep_object:
+                if self._target in result:
+                    value = result[self._target]
+                result.update(set_values)
+                yield result
+
+            learner.tell(x, _as_real(value))
+            x = learner.ask()
+
+
+def _as_real(value) ->float:
+    """
+    Reduce a measured value to a single number for the loss function
+    """
+    try:
+        return float(np.abs(value)) if np.iscomplexobj(value) else \
+            float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -1,9 +1,240 @@
 import numpy as np
-from typing import Iterator, Callable, List
+from typing import (
+    Iterator, AsyncIterator, Callable, List, Optional, TYPE_CHECKING
+)
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
 import inspect
+import threading
+import time
 
 from qsweep import param_table
 from qsweep.param_table import ParamTable
+from qsweep.pipeline import MergedAcquisition, merged_async
+from qsweep.ordering import ORDERINGS
+from qsweep.setpoints import SetPoints
+
+if TYPE_CHECKING:
+    # The profiling module imports this one
+    from qsweep.profiling import Profiler
+
+
+def _stack(values: list) ->np.ndarray:
+    """
+    Stack the values of a single parameter into an array whose first axis
+    runs over the rows. Values which cannot be stacked (e.g. arrays of
+    unequal length) end up in an array of objects
+    """
+    try:
+        return np.array(values)
+    except ValueError:
+        stacked = np.empty(len(values), dtype=object)
+        for count, value in enumerate(values):
+            stacked[count] = value
+        return stacked
+
+
+def _rows_to_block(layout: tuple, rows: List[tuple]) ->dict:
+    return {
+        name: _stack(list(column)) for name, column in zip(layout, zip(*rows))
+    }
+
+
+def _rows_to_blocks(rows: Iterator[dict], block_size: int) ->Iterator[dict]:
+    """
+    Group consecutive rows with the same parameter names into blocks of at
+    most `block_size` rows
+    """
+    layout = None
+    values: List[tuple] = []
+
+    for data in rows:
+        keys = tuple(data.keys())
+        if keys != layout or len(values) == block_size:
+            if len(values):
+                yield _rows_to_block(layout, values)
+            layout = keys
+            values = []
+
+        values.append(tuple(data.values()))
+
+    if len(values):
+        yield _rows_to_block(layout, values)
+
+
+def _block_length(block: dict) ->int:
+    return len(next(iter(block.values())))
+
+
+def _concatenate_blocks(blocks: List[dict]) ->dict:
+    if len(blocks) == 1:
+        return blocks[0]
+
+    merged = {}
+    for name in blocks[0]:
+        columns = [block[name] for block in blocks]
+        try:
+            merged[name] = np.concatenate(columns)
+        except ValueError:
+            # E.g. arrays of another length than in the other blocks
+            merged[name] = _stack(
+                [row for column in columns for row in column]
+            )
+    return merged
+
+
+def _coalesce_blocks(blocks: Iterator[dict], block_size: int) ->Iterator[dict]:
+    """
+    Merge consecutive blocks with the same parameter names, so that all but
+    the last block of each layout have `block_size` rows. Blocks which are
+    already full are passed on as they are.
+    """
+    layout = None
+    pending: List[dict] = []
+    n_pending = 0
+
+    for block in blocks:
+        keys = tuple(block.keys())
+        if keys != layout:
+            if len(pending):
+                yield _concatenate_blocks(pending)
+            layout = keys
+            pending = []
+            n_pending = 0
+
+        pending.append(block)
+        n_pending += _block_length(block)
+        if n_pending < block_size:
+            continue
+
+        merged = _concatenate_blocks(pending)
+        for start in range(0, n_pending - block_size + 1, block_size):
+            yield {
+                name: column[start: start + block_size]
+                for name, column in merged.items()
+            }
+
+        rest = n_pending % block_size
+        pending = [{
+            name: column[n_pending - rest:] for name, column in merged.items()
+        }] if rest else []
+        n_pending = rest
+
+    if len(pending):
+        yield _concatenate_blocks(pending)
+
+
+def _repeat(value, count: int) ->np.ndarray:
+    """
+    Broadcast a single value to a column of `count` rows. The result is a
+    read-only view; the value is not copied.
+    """
+    value = np.asarray(value)
+    return np.broadcast_to(value, (count,) + value.shape)
+
+
+async def _acall(func: Callable, *args):
+    """
+    Call a set, get or post step function from a coroutine. Getter and setter
+    functions which wrap a coroutine function are awaited, as are awaitable
+    return values of plain functions
+    """
+    acall = getattr(func, "acall", None)
+    if acall is not None:
+        return await acall(*args)
+
+    result = func(*args)
+    if inspect.isawaitable(result):
+        result = await result
+
+    return result
+
+
+async def _alist(sweep_object: 'BaseSweepObject') ->list:
+    return [value async for value in sweep_object]
+
+
+def _find_parallel(sweep_objects) ->List['Parallel']:
+    """
+    The parallel sweep objects in the given trees of sweep objects
+    """
+    found = []
+    for so in sweep_objects:
+        if isinstance(so, Parallel):
+            found.append(so)
+        if isinstance(so, (Nest, Chain, Zip)):
+            found.extend(_find_parallel(so._sweep_objects))
+    return found
+
+
+def _holding_threads(iterator: Iterator,
+                     parallels: List['Parallel']) ->Iterator:
+    """
+    Iterate, while the given parallel sweep objects keep their threads from
+    one step to the next. Containers which restart a parallel sweep object at
+    every step use this, so that threads are not started at every step.
+    """
+    if not len(parallels):
+        yield from iterator
+        return
+
+    for so in parallels:
+        so._hold_threads()
+    try:
+        yield from iterator
+    finally:
+        for so in parallels:
+            so._release_threads()
+
+
+class _SettleClock:
+    """
+    Keep track of when the parameters which were set most recently have
+    settled. Sweeps with a step delay push the deadline forward whenever they
+    set a value; measurements wait for the deadline before they get a value.
+    Waiting is deferred until the settled state is actually needed, so that
+    settling overlaps with whatever happens in between (e.g. setting other
+    parameters, or processing and storing the previous point).
+
+    Deadlines are taken from the monotonic `time.perf_counter` clock, so
+    that the time it takes to set parameters does not add to the delays.
+
+    All sweep objects in a tree share a clock (see `_share_settle_clock`), so
+    that sweep objects of other trees, e.g. of other runs or on other
+    threads, do not wait for each other. The branches of a `Parallel` each
+    get a clock of their own, whose deadline includes that of the parent
+    clock of the Parallel.
+    """
+    def __init__(self, parent: '_SettleClock' = None) ->None:
+        self._parent = parent
+        self._deadline = 0.0
+
+    @property
+    def deadline(self) ->float:
+        if self._parent is None:
+            return self._deadline
+        return max(self._deadline, self._parent.deadline)
+
+    def settle(self, delay: float) ->float:
+        """
+        Start settling for `delay` seconds from now and return the deadline
+        """
+        deadline = time.perf_counter() + delay
+        if deadline > self._deadline:
+            self._deadline = deadline
+        return deadline
+
+    @staticmethod
+    def wait(deadline: float) ->None:
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    @staticmethod
+    async def async_wait(deadline: float) ->None:
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
 
 
 class BaseSweepObject:
@@ -14,9 +245,20 @@ class BaseSweepObject:
     def __init__(self) ->None:
 
         self._generator: Iterator = None
+        self._async_generator: AsyncIterator = None
         self._parameter_table: ParamTable = None
         self._measurable = False
         self._post_step_calls: List[Callable] = []
+        self._settle_clock = _SettleClock()
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        """
+        Make this sweep object, and the sweep objects it contains, use the
+        given settle clock. Containers call this on their children when they
+        are created, so that a whole tree of sweep objects shares the clock
+        of its root.
+        """
+        self._settle_clock = clock
 
     def _generator_factory(self) ->Iterator:
         """
@@ -41,9 +283,81 @@ class BaseSweepObject:
 
         return next_val
 
+    def _async_generator_factory(self) ->AsyncIterator:
+        """
+        The asynchronous counterpart of `_generator_factory`. This default
+        implementation unrolls the synchronous generator, which blocks the
+        event loop while stepping. Subclasses override it to await
+        asynchronous getters and setters.
+        """
+        async def unroll():
+            for value in self._generator_factory():
+                yield value
+
+        return unroll()
+
+    def __aiter__(self) ->'BaseSweepObject':
+        self._async_generator = self._async_generator_factory()
+        return self
+
+    async def __anext__(self) ->dict:
+        if self._async_generator is None:
+            self.__aiter__()
+
+        next_val = await self._async_generator.__anext__()
+        await self._async_call_post_step_calls()
+
+        return next_val
+
     def __call__(self, *sweep_objects):
         return Nest(self, Chain(*sweep_objects))
 
+    def compile(self) ->'BaseSweepObject':
+        """
+        Compile this sweep object into a flat program which produces the same
+        results with an overhead per point that does not depend on the
+        nesting depth. Compiling takes about as long as a run, so this only
+        pays off for programs which are run several times. See
+        `qsweep.compiler.compile_sweep`.
+        """
+        from qsweep.compiler import compile_sweep
+        return compile_sweep(self)
+
+    def profile(self, capacity: int = 100000) ->'Profiler':
+        """
+        Time the set, get and post step calls and the steps of every node
+        in this sweep object from now on. Returns the `Profiler` which
+        records the timings; see `qsweep.profiling.Profiler`.
+        """
+        from qsweep.profiling import Profiler
+        profiler = Profiler(capacity)
+        profiler.attach(self)
+        return profiler
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        """
+        Iterate over the sweep object in blocks. Each block is a dictionary
+        of numpy arrays, the first axis of which runs over at most
+        `block_size` rows. Consecutive rows with the same parameter names
+        end up in the same block.
+
+        This generic implementation groups the dictionaries produced by
+        iterating the sweep object. Subclasses override it to produce column
+        arrays without building a dictionary per point.
+        """
+        yield from _rows_to_blocks(self, block_size)
+
+    def _call_post_step_calls_per_row(self, block: dict) ->None:
+        """
+        Block iteration skips `__next__`, so make sure the post step
+        functions are still called once for every row. Only use this where
+        all rows of the block were acquired at once, as otherwise the post
+        steps would no longer run between the points.
+        """
+        if len(self._post_step_calls):
+            for _ in range(_block_length(block)):
+                self._call_post_step_calls()
+
     def _call_post_step_calls(self) -> None:
         """
         Call all stop-step functions
@@ -51,6 +365,10 @@ class BaseSweepObject:
         for cable in self._post_step_calls:
             cable()
 
+    async def _async_call_post_step_calls(self) -> None:
+        for cable in self._post_step_calls:
+            await _acall(cable)
+
     def add_post_step(self, func: Callable) -> None:
         """
         Add a function to be executed after taking each step in the
@@ -62,6 +380,28 @@ class BaseSweepObject:
 
         self._post_step_calls.append(func)
 
+    @property
+    def shape(self) ->Optional[tuple]:
+        """
+        The number of rows this sweep object yields along each of its
+        dimensions, or None if this is not known before running it. For
+        example, sweeping x over 3 points and y over 4 points in a nest and
+        measuring two parameters at each point has shape (3, 4, 2).
+        """
+        return None
+
+    def __len__(self) ->int:
+        shape = self.shape
+        if shape is None:
+            raise TypeError(f"The length of this {type(self).__name__} is "
+                            f"not known in advance")
+
+        return int(np.prod(shape))
+
+    def __bool__(self) ->bool:
+        # Do not let truth testing fall back on `__len__`
+        return True
+
     @property
     def parameter_table(self) ->ParamTable:
         return self._parameter_table
@@ -86,23 +426,140 @@ class IteratorSweep(BaseSweepObject):
     iterator_function: callable
         A callable with no parameters, returning an iterator. Unrolling this
         iterator has the effect of setting the independent parameters.
+    block_function: callable
+        Optional. A callable with no parameters, returning an iterator over
+        blocks (dictionaries of column arrays) with the same content as the
+        dictionaries returned by `iterator_function`. If given, this is used
+        when iterating in blocks.
+    async_iterator_function: callable
+        Optional. A callable with no parameters, returning an asynchronous
+        iterator with the same content as the iterator returned by
+        `iterator_function`. If given, this is used when iterating
+        asynchronously.
+    shape: tuple
+        Optional. The shape of the iterator (see `BaseSweepObject.shape`),
+        if it is known in advance.
     """
 
     def __init__(
             self,
             iterator_function: Callable,
             parameter_table: ParamTable=None,
-            measurable: bool = False
+            measurable: bool = False,
+            block_function: Callable = None,
+            shape: tuple = None,
+            async_iterator_function: Callable = None
     )->None:
         super().__init__()
         self._iterator_function = iterator_function
         self._parameter_table = parameter_table
         self._measurable = measurable
+        self._block_function = block_function
+        self._shape = shape
+        self._async_iterator_function = async_iterator_function
+
+    @property
+    def shape(self) ->Optional[tuple]:
+        return self._shape
 
     def _generator_factory(self) ->Iterator:
         for value in self._iterator_function():
             yield value
 
+    async def _async_generator_factory(self) ->AsyncIterator:
+        if self._async_iterator_function is not None:
+            async for value in self._async_iterator_function():
+                yield value
+            return
+
+        iterator = self._iterator_function()
+        if hasattr(iterator, "__aiter__"):
+            async for value in iterator:
+                yield value
+        else:
+            for value in iterator:
+                yield value
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        if self._block_function is None:
+            yield from super().iter_blocks(block_size)
+            return
+
+        for block in self._block_function():
+            length = _block_length(block)
+            for start in range(0, length, block_size):
+                sub_block = {
+                    name: column[start: start + block_size]
+                    for name, column in block.items()
+                }
+                self._call_post_step_calls_per_row(sub_block)
+                yield sub_block
+
+
+def _only_child(sweep_object: BaseSweepObject) ->BaseSweepObject:
+    """
+    Look through chains of a single sweep object, like the one made by
+    `sweep(...)(measure(...))`
+    """
+    while isinstance(sweep_object, Chain) and \
+            len(sweep_object._sweep_objects) == 1 and \
+            not len(sweep_object._post_step_calls):
+        sweep_object = sweep_object._sweep_objects[0]
+
+    return sweep_object
+
+
+def _buffered_acquisition(sweep: 'Sweep', upload: Callable,
+                          read: Callable, table: ParamTable) ->IteratorSweep:
+    """
+    Make a sweep object which uploads all set points of a sweep at once and
+    reads back the buffered measurements, like a `hardsweep`
+    """
+    set_values = [value for value, _ in sweep._points()]
+    names = sweep.parameter_table.nests[0]
+    values = np.asarray(set_values)
+    columns = [values] if len(names) == 1 else list(values.T)
+
+    def acquire() ->dict:
+        # Like a measurement, wait for swept parameters to settle
+        clock = sweep._settle_clock
+        if clock.deadline:
+            clock.wait(clock.deadline)
+
+        upload(*columns)
+        # Like the rows of the nest, measurements come first
+        block = read(len(set_values))
+        block.update(zip(names, columns))
+        return block
+
+    async def async_acquire() ->dict:
+        clock = sweep._settle_clock
+        if clock.deadline:
+            await clock.async_wait(clock.deadline)
+
+        await _acall(upload, *columns)
+        block = await _acall(read, len(set_values))
+        block.update(zip(names, columns))
+        return block
+
+    def rows() ->Iterator[dict]:
+        block = acquire()
+        for row in zip(*block.values()):
+            yield dict(zip(block.keys(), row))
+
+    async def async_rows() ->AsyncIterator[dict]:
+        block = await async_acquire()
+        for row in zip(*block.values()):
+            yield dict(zip(block.keys(), row))
+
+    def blocks() ->Iterator[dict]:
+        yield acquire()
+
+    return IteratorSweep(
+        rows, parameter_table=table, measurable=True, block_function=blocks,
+        shape=(len(set_values),), async_iterator_function=async_rows
+    )
+
 
 class Nest(BaseSweepObject):
     """
@@ -120,9 +577,39 @@ class Nest(BaseSweepObject):
     A fourth order by
         product = two_product(so1, two_product(so2, two_product(so3, so4)))
     Etc...
+
+    Orders
+    ------
+    By default ("raster"), every inner sweep object starts from its first
+    point at every outer step. Other orders visit the grid spanned by the
+    outer sweeps, which need to be `Sweep`s with static set points, in a way
+    which minimizes the distance the swept parameters travel (see
+    `qsweep.ordering`):
+
+    "snake": The leading sweeps with static set points form the grid. Every
+        inner sweep of the grid reverses its direction each time it is
+        restarted.
+    "hilbert": The first two sweep objects form the grid, which is visited
+        along a Hilbert curve.
+
+    The remaining sweep objects run at every point of the grid as usual. A
+    sweep of the grid is only set (and its post step functions called) when
+    its set point changes. The parameter table and the shape are those of
+    the raster order; only the order of the rows differs.
+
+    Buffered sweeps
+    ---------------
+    If the innermost sweep of a nest in raster order has static set points
+    and a buffered setter, and is followed by just a measurement with a
+    buffered getter (see `qsweep.setter` and `qsweep.getter`), all of its
+    set points are uploaded at once and the measurements are read back in a
+    single buffered read, instead of setting and getting point by point.
+    This only happens if neither has a step delay or post step functions.
+    Compiled nests always run point by point.
     """
 
-    def __init__(self, *sweep_objects: BaseSweepObject) ->None:
+    def __init__(self, *sweep_objects: BaseSweepObject,
+                 order: str = "raster") ->None:
         super().__init__()
 
         if any([so.has_chain for so in sweep_objects[:-1]]):
@@ -132,12 +619,118 @@ class Nest(BaseSweepObject):
             raise TypeError("In a nest, only the last sweep object may be "
                             "measurable")
 
+        if order not in ORDERINGS:
+            raise ValueError(f"Unknown order {order}. Please choose one of "
+                             f"{list(ORDERINGS)}")
+
         self._measurable = sweep_objects[-1].measurable
         self._sweep_objects = sweep_objects
+        self._order = order
         self._parameter_table = param_table.prod(
             [so.parameter_table for so in sweep_objects]
         )
 
+        # The buffered functions are looked up now, before a profiler wraps
+        # the set and get functions
+        self._buffered = self._find_buffered(sweep_objects)
+        # The sweep objects with the buffered acquisition; made on first use
+        self._buffered_objects: tuple = None
+
+        # The parallel sweep objects which are restarted at every step
+        self._parallels = _find_parallel(sweep_objects)
+
+        self._grid_size = None
+        self._inner: BaseSweepObject = None
+        if order != "raster":
+            self._grid_size = self._find_grid(sweep_objects, order)
+            inner = sweep_objects[self._grid_size:]
+            if len(inner) > 1:
+                self._inner = Nest(*inner)
+            elif len(inner):
+                self._inner = inner[0]
+
+        self._share_settle_clock(self._settle_clock)
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        super()._share_settle_clock(clock)
+        for so in self._sweep_objects:
+            so._share_settle_clock(clock)
+        if self._inner is not None:
+            self._inner._share_settle_clock(clock)
+
+    @staticmethod
+    def _find_grid(sweep_objects: tuple, order: str) ->int:
+        """
+        The number of leading sweep objects which span the grid
+        """
+        n_static = 0
+        for so in sweep_objects:
+            if not isinstance(so, Sweep) or not so.static_points:
+                break
+            n_static += 1
+
+        _, n_axes = ORDERINGS[order]
+        grid_size = n_static if n_axes is None else n_axes
+        if n_static < max(grid_size, 2):
+            raise TypeError(f"The {order} order needs the first "
+                            f"{max(grid_size, 2)} sweep objects of the nest "
+                            f"to be sweeps with static set points")
+
+        return grid_size
+
+    @property
+    def order(self) ->str:
+        return self._order
+
+    @staticmethod
+    def _find_buffered(sweep_objects: tuple) ->Optional[tuple]:
+        if len(sweep_objects) < 2:
+            return None
+
+        sweep, measure = sweep_objects[-2], _only_child(sweep_objects[-1])
+        if not isinstance(sweep, Sweep) or not sweep.static_points or \
+                not isinstance(measure, Measure):
+            return None
+
+        upload = getattr(sweep._set_function, "buffered", None)
+        read = getattr(measure._get_function, "buffered", None)
+        if upload is None or read is None:
+            return None
+
+        return sweep, measure, upload, read
+
+    def _runnable_objects(self) ->tuple:
+        """
+        The sweep objects to run in raster order, with a buffered sweep and
+        measurement replaced by a single buffered acquisition
+        """
+        if self._buffered is None:
+            return self._sweep_objects
+
+        # Post step functions may be added at any time, so check every run
+        sweep, measure, upload, read = self._buffered
+        if sweep.step_delay or len(sweep._post_step_calls) or \
+                len(measure._post_step_calls):
+            return self._sweep_objects
+
+        if self._buffered_objects is None:
+            table = param_table.prod([
+                sweep.parameter_table, self._sweep_objects[-1].parameter_table
+            ])
+            self._buffered_objects = self._sweep_objects[:-2] + (
+                _buffered_acquisition(sweep, upload, read, table),
+            )
+
+        return self._buffered_objects
+
+    @property
+    def shape(self) ->Optional[tuple]:
+        shapes = [so.shape for so in self._sweep_objects]
+        if any(shape is None for shape in shapes):
+            return None
+
+        return sum(shapes, ())
+
     @staticmethod
     def _two_product(sweep_object1: BaseSweepObject,
                      sweep_object2: BaseSweepObject) ->IteratorSweep:
@@ -147,15 +740,230 @@ class Nest(BaseSweepObject):
                     result1.update(result2)
                     yield result1
 
+        sweep = _only_child(sweep_object1)
+
+        def replay_inner():
+            # Instead of restarting the inner sweep at every outer step,
+            # replay its cached set points, so that only the set and post
+            # step calls are repeated
+            for result2 in sweep_object2:
+                for result1 in sweep._replay_points():
+                    sweep._call_post_step_calls()
+                    result1.update(result2)
+                    yield result1
+
+        if isinstance(sweep, Sweep) and sweep.static_points:
+            return IteratorSweep(replay_inner)
+
         return IteratorSweep(inner)
 
-    def _generator_factory(self) ->Iterator:
-        prod = self._sweep_objects[0]
-        for so in self._sweep_objects[1:]:
+    def _raster_product(self, sweep_objects: tuple) ->BaseSweepObject:
+        prod = sweep_objects[0]
+        for so in sweep_objects[1:]:
             prod = self._two_product(so, prod)
-
         return prod
 
+    def _grid_points(self) ->Iterator[list]:
+        """
+        For an ordered nest, iterate over the points of the grid. For every
+        point, yield tuples of the level in the grid, the sweep, the index of
+        the set point and the arguments to set it with, for the sweeps whose
+        set point changes.
+        """
+        grid = self._sweep_objects[:self._grid_size]
+        set_arguments = [[args for _, args in so._points()] for so in grid]
+        indices, _ = ORDERINGS[self._order]
+
+        previous = None
+        for index in indices([len(args) for args in set_arguments]):
+            yield [
+                (level, grid[level], count, set_arguments[level][count])
+                for level, count in enumerate(index)
+                if previous is None or previous[level] != count
+            ]
+            previous = index
+
+    def _settle_grid(self) ->None:
+        for so in self._sweep_objects[:self._grid_size]:
+            if so.step_delay:
+                _SettleClock.wait(so._settle_deadline)
+
+    def _ordered_generator(self) ->Iterator:
+        # The last set values of each sweep of the grid. Like in the raster
+        # order, the values of inner sweep objects come first in the rows.
+        grid_values = [{}] * self._grid_size
+
+        for changes in self._grid_points():
+            for level, so, _, set_args in changes:
+                grid_values[level] = so._set_point(*set_args)
+                so._call_post_step_calls()
+
+            if self._inner is None:
+                result = {}
+                for values in reversed(grid_values):
+                    result.update(values)
+                yield result
+                continue
+
+            for result in self._inner:
+                for values in reversed(grid_values):
+                    result.update(values)
+                yield result
+
+        # Like the sweeps themselves, do not leave the last point unsettled
+        self._settle_grid()
+
+    def _generator_factory(self) ->Iterator:
+        if self._order != "raster":
+            return _holding_threads(self._ordered_generator(), self._parallels)
+
+        # Restart the sweep object, which may be a cached buffered
+        # acquisition run before
+        return _holding_threads(
+            iter(self._raster_product(self._runnable_objects())),
+            self._parallels
+        )
+
+    async def _async_ordered_generator(self) ->AsyncIterator:
+        grid_values = [{}] * self._grid_size
+
+        for changes in self._grid_points():
+            for level, so, _, set_args in changes:
+                grid_values[level] = await so._async_set_point(*set_args)
+                await so._async_call_post_step_calls()
+
+            if self._inner is None:
+                result = {}
+                for values in reversed(grid_values):
+                    result.update(values)
+                yield result
+                continue
+
+            async for result in self._inner:
+                for values in reversed(grid_values):
+                    result.update(values)
+                yield result
+
+        for so in self._sweep_objects[:self._grid_size]:
+            if so.step_delay:
+                await _SettleClock.async_wait(so._settle_deadline)
+
+    async def _async_generator_factory(self) ->AsyncIterator:
+        if self._order != "raster":
+            async for result in self._async_ordered_generator():
+                yield result
+            return
+
+        async def product(sweep_objects):
+            outer, inner = sweep_objects[0], sweep_objects[1:]
+            if not len(inner):
+                async for result in outer:
+                    yield result
+                return
+
+            async for outer_values in outer:
+                async for result in product(inner):
+                    result.update(outer_values)
+                    yield result
+
+        async for result in product(self._runnable_objects()):
+            yield result
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        """
+        The outer sweep objects are stepped through one point at a time,
+        since their set values need to be in place before anything nested in
+        them runs. The values of the outer sweep objects are then broadcast
+        to the blocks produced by the innermost one. If an outer sweep object
+        is followed by just a measurement, which yields a single row per
+        outer step, the rows are collected into blocks instead.
+        Small blocks of consecutive outer steps are merged, so that blocks
+        have `block_size` rows whatever the shape of the nest.
+
+        If the nest has post step functions, it is iterated point by point
+        instead, so that these run right after each point like they do when
+        iterating normally.
+        """
+        if len(self._post_step_calls):
+            yield from BaseSweepObject.iter_blocks(self, block_size)
+            return
+
+        if self._order != "raster" and self._inner is None:
+            # Only the grid is swept, so blocks are made from its rows
+            yield from BaseSweepObject.iter_blocks(self, block_size)
+            return
+
+        def product(sweep_objects):
+            outer, inner = sweep_objects[0], sweep_objects[1:]
+            if not len(inner):
+                yield from outer.iter_blocks(block_size)
+                return
+
+            measure = _only_child(inner[0]) if len(inner) == 1 else None
+            if isinstance(measure, Measure):
+                # A single row per outer step
+                if isinstance(outer, Sweep):
+                    rows = self._measured_rows(outer, measure)
+                else:
+                    rows = self._raster_product(sweep_objects)
+
+                yield from _rows_to_blocks(rows, block_size)
+                return
+
+            for outer_values in outer:
+                for block in product(inner):
+                    length = _block_length(block)
+                    outer_block = {
+                        name: _repeat(value, length)
+                        for name, value in outer_values.items()
+                    }
+                    outer_block.update(block)
+                    yield outer_block
+
+        if self._order != "raster":
+            blocks = self._ordered_blocks(block_size)
+        else:
+            blocks = product(self._runnable_objects())
+
+        blocks = _holding_threads(blocks, self._parallels)
+        yield from _coalesce_blocks(blocks, block_size)
+
+    @staticmethod
+    def _measured_rows(sweep: 'Sweep', measure: 'Measure') ->Iterator[dict]:
+        """
+        The rows of a sweep with a single measurement, like those of their
+        nest, without stepping through the generators of both for every point
+        """
+        for _, set_args in sweep._points():
+            set_values = sweep._set_point(*set_args)
+            sweep._call_post_step_calls()
+            row = measure._get()
+            measure._call_post_step_calls()
+            row.update(set_values)
+            yield row
+
+        if sweep.step_delay:
+            sweep._settle_clock.wait(sweep._settle_deadline)
+
+    def _ordered_blocks(self, block_size: int) ->Iterator[dict]:
+        grid_values = [{}] * self._grid_size
+        for changes in self._grid_points():
+            for level, so, _, set_args in changes:
+                grid_values[level] = so._set_point(*set_args)
+                so._call_post_step_calls()
+
+            for block in self._inner.iter_blocks(block_size):
+                length = _block_length(block)
+                grid_block = {
+                    name: _repeat(value, length)
+                    for values in grid_values
+                    for name, value in values.items()
+                }
+                grid_block.update(block)
+                yield grid_block
+
+        self._settle_grid()
+
 
 class Chain(BaseSweepObject):
     """
@@ -170,12 +978,178 @@ class Chain(BaseSweepObject):
         )
 
         self._measurable = any([so.measurable for so in sweep_objects])
+        self._share_settle_clock(self._settle_clock)
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        super()._share_settle_clock(clock)
+        for so in self._sweep_objects:
+            so._share_settle_clock(clock)
+
+    @property
+    def shape(self) ->Optional[tuple]:
+        if any(so.shape is None for so in self._sweep_objects):
+            return None
+
+        return sum(len(so) for so in self._sweep_objects),
 
     def _generator_factory(self) ->Iterator:
         for so in self._sweep_objects:
             for result in so:
                 yield result
 
+    async def _async_generator_factory(self) ->AsyncIterator:
+        for so in self._sweep_objects:
+            async for result in so:
+                yield result
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        """
+        The blocks of the chained sweep objects, one after the other. If the
+        chain has post step functions, it is iterated point by point
+        instead, so that these run right after each point.
+        """
+        if len(self._post_step_calls):
+            yield from BaseSweepObject.iter_blocks(self, block_size)
+            return
+
+        for so in self._sweep_objects:
+            yield from so.iter_blocks(block_size)
+
+
+class Parallel(Chain):
+    """
+    Like a Chain of measurable sweep objects, but the sweep objects are
+    unrolled concurrently on a thread pool. This is useful when measuring
+    several independent instruments at each point: with N slow getters a point
+    costs about one instrument round trip instead of N.
+
+    By default, the results are yielded in the same order as the equivalent
+    Chain would yield them, which means that all results of a sweep object
+    are kept in memory until the preceding sweep objects have finished. With
+    `ordered=False`, the results are instead passed on as soon as they are
+    available, so that long independent branches (e.g. full sweeps on two
+    separate device channels) stream their results into the same run. The
+    results of each branch remain in order. In both cases the parameter
+    table is the same as that of the equivalent Chain.
+
+    When the Parallel is restarted at every step of a nest, its threads are
+    kept from one step to the next, until the nest has finished.
+
+    Parameters
+    ----------
+    sweep_objects:
+        Measurable sweep objects which do not share any hardware
+    max_workers: int
+        The maximum number of threads to use. By default, one thread per
+        sweep object. Without ordering there is always one thread per sweep
+        object.
+    ordered: bool
+        Whether to yield the results in the order of the equivalent Chain
+    queue_size: int
+        Without ordering, the maximum number of results which have been
+        acquired but not yet passed on. Branches which get ahead wait when
+        this number is reached.
+    """
+
+    def __init__(self, *sweep_objects: BaseSweepObject,
+                 max_workers: int = None, ordered: bool = True,
+                 queue_size: int = 1000) ->None:
+
+        if not all(so.measurable for so in sweep_objects):
+            raise TypeError("Only measurable sweep objects can be run in "
+                            "parallel")
+
+        super().__init__(*sweep_objects)
+        self._max_workers = max_workers or len(sweep_objects)
+        self._ordered = ordered
+        self._queue_size = queue_size
+
+        # The thread pool which is kept between steps while the threads are
+        # held (see `_holding_threads`)
+        self._executor: ThreadPoolExecutor = None
+        self._n_holds = 0
+        self._lock = threading.Lock()
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        # The branches run concurrently, so each has its own clock; they
+        # only share the deadlines of the sweep objects the Parallel is in
+        self._settle_clock = clock
+        for so in self._sweep_objects:
+            so._share_settle_clock(_SettleClock(parent=clock))
+
+    @property
+    def _n_threads(self) ->int:
+        return self._max_workers if self._ordered else len(self._sweep_objects)
+
+    def _hold_threads(self) ->None:
+        with self._lock:
+            self._n_holds += 1
+
+    def _release_threads(self) ->None:
+        with self._lock:
+            self._n_holds -= 1
+            executor = None
+            if not self._n_holds:
+                executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown()
+
+    def _held_executor(self) ->Optional[ThreadPoolExecutor]:
+        with self._lock:
+            if not self._n_holds:
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._n_threads
+                )
+            return self._executor
+
+    def _generator_factory(self) ->Iterator:
+        executor = self._held_executor()
+        if executor is not None:
+            yield from self._values(executor)
+            return
+
+        # The threads are shut down when the generator finishes or is closed
+        with ThreadPoolExecutor(max_workers=self._n_threads) as executor:
+            yield from self._values(executor)
+
+    def _values(self, executor: ThreadPoolExecutor) ->Iterator:
+        if not self._ordered:
+            with MergedAcquisition(self._sweep_objects, self._queue_size,
+                                   executor) as acquisition:
+                yield from acquisition
+            return
+
+        futures = [executor.submit(list, so) for so in self._sweep_objects]
+        try:
+            for future in futures:
+                for result in future.result():
+                    yield result
+        finally:
+            # The sweep objects are not stepped again while they still run
+            wait(futures)
+
+    async def _async_generator_factory(self) ->AsyncIterator:
+        if not self._ordered:
+            async for value in merged_async(self._sweep_objects,
+                                            self._queue_size):
+                yield value
+            return
+
+        # On an event loop the children run concurrently as coroutines
+        results = await asyncio.gather(
+            *[_alist(so) for so in self._sweep_objects]
+        )
+
+        for result in results:
+            for value in result:
+                yield value
+
+    # Chaining the blocks of the children would run them one after the other
+    iter_blocks = BaseSweepObject.iter_blocks
+
 
 class Zip(BaseSweepObject):
     def __init__(self, *sweep_objects: BaseSweepObject) ->None:
@@ -184,11 +1158,85 @@ class Zip(BaseSweepObject):
         self._parameter_table = param_table.prod(
             [so.parameter_table for so in sweep_objects]
         )
+        self._share_settle_clock(self._settle_clock)
+
+    def _share_settle_clock(self, clock: _SettleClock) ->None:
+        super()._share_settle_clock(clock)
+        for so in self._sweep_objects:
+            so._share_settle_clock(clock)
+
+    @property
+    def shape(self) ->Optional[tuple]:
+        if any(so.shape is None for so in self._sweep_objects):
+            return None
+
+        return min(len(so) for so in self._sweep_objects),
 
     def _generator_factory(self) ->Iterator:
         for sos in zip(*self._sweep_objects):
             yield {k: v for d in sos for k, v in d.items()}
 
+    async def _async_generator_factory(self) ->AsyncIterator:
+        iterators = [so.__aiter__() for so in self._sweep_objects]
+        while True:
+            try:
+                sos = [await iterator.__anext__() for iterator in iterators]
+            except StopAsyncIteration:
+                return
+
+            yield {k: v for d in sos for k, v in d.items()}
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        """
+        The zipped sweep objects are still stepped in lock step, point by
+        point, so that the order of the set operations is the same as when
+        iterating normally. Only the merging of the results is done column
+        wise. Post step functions of the zip are called after every point.
+        """
+        layout = None
+        rows: List[tuple] = []
+
+        for sos in zip(*self._sweep_objects):
+            keys = tuple(k for d in sos for k in d.keys())
+            if keys != layout or len(rows) == block_size:
+                if len(rows):
+                    yield _rows_to_block(layout, rows)
+                layout = keys
+                rows = []
+
+            rows.append(tuple(v for d in sos for v in d.values()))
+            self._call_post_step_calls()
+
+        if len(rows):
+            yield _rows_to_block(layout, rows)
+
+
+class _LazyPoints:
+    """
+    Like the list of set values and set function arguments which a sweep
+    with static set points caches, but computed from a set point generator
+    (see `qsweep.setpoints`) as the points are needed
+    """
+    def __init__(self, set_points: SetPoints) ->None:
+        self._set_points = set_points
+
+    def __len__(self) ->int:
+        return len(self._set_points)
+
+    def key(self) ->tuple:
+        """
+        The parameters of the set point generator (see `SetPoints._key`)
+        """
+        return self._set_points._key()
+
+    def __iter__(self) ->Iterator[tuple]:
+        # The generator computes its set points a chunk at a time
+        for set_value in self._set_points:
+            if np.ndim(set_value):
+                yield set_value, tuple(set_value)
+            else:
+                yield set_value, (set_value,)
+
 
 class Sweep(BaseSweepObject):
     """
@@ -201,20 +1249,162 @@ class Sweep(BaseSweepObject):
         A function of one argument which sets the independent parameter
     point_function (callable)
         Unrolling this iterator returns to us set values of the parameter
+    static_points (bool)
+        Declare that the point function returns the same set points every
+        time it is called. The set points are then evaluated only once and
+        cached, which saves a lot of work when this sweep is nested in
+        another sweep and hence restarted at every outer step; a nest then
+        steps through the cached set points directly. If the point
+        function returns a set point generator (see `qsweep.setpoints`),
+        only the generator is kept and the set points are computed lazily.
+        The cache is kept for the lifetime of the sweep, also from one run
+        to the next, so changes to a list of set points made after the
+        first run are not picked up. Make a new sweep object instead.
+    step_delay (float)
+        The number of seconds the parameter needs to settle after each set
+        operation. Measurements wait until all parameters have settled, and
+        the next value is not set before the previous one has settled. In
+        the meantime, other work (like setting other parameters or storing
+        results) goes on.
     """
 
     def __init__(
             self, set_function: Callable, parameter_table: ParamTable,
-            point_function: Callable) ->None:
+            point_function: Callable, static_points: bool = False,
+            step_delay: float = 0) ->None:
 
         super().__init__()
         self._point_function = point_function
         self._set_function = set_function
         self._parameter_table = parameter_table.copy()
+        self._static_points = static_points
+        self._cached_points: List[tuple] = None
+        self._step_delay = step_delay
+        self._settle_deadline = 0.0
+
+    def _points(self) ->Iterator[tuple]:
+        """
+        Iterate over tuples of set values and the arguments to give to the
+        set function for these values
+        """
+        if not self._static_points:
+            return (
+                (set_value, np.atleast_1d(set_value))
+                for set_value in self._point_function()
+            )
+
+        if self._cached_points is None:
+            points = self._point_function()
+            if isinstance(points, SetPoints):
+                # Set point generators know their length, so they do not
+                # need to be materialized
+                self._cached_points = _LazyPoints(points)
+            else:
+                self._cached_points = [
+                    (set_value, tuple(np.atleast_1d(set_value)))
+                    for set_value in points
+                ]
+
+        return iter(self._cached_points)
+
+    @property
+    def static_points(self) ->bool:
+        return self._static_points
+
+    @property
+    def step_delay(self) ->float:
+        return self._step_delay
+
+    def _set_point(self, *set_args) ->dict:
+        """
+        Set a point, after the previous point has settled
+        """
+        if not self._step_delay:
+            return self._set_function(*set_args)
+
+        self._settle_clock.wait(self._settle_deadline)
+        result = self._set_function(*set_args)
+        self._settle_deadline = self._settle_clock.settle(self._step_delay)
+        return result
+
+    async def _async_set_point(self, *set_args) ->dict:
+        if not self._step_delay:
+            return await _acall(self._set_function, *set_args)
+
+        await self._settle_clock.async_wait(self._settle_deadline)
+        result = await _acall(self._set_function, *set_args)
+        self._settle_deadline = self._settle_clock.settle(self._step_delay)
+        return result
+
+    @property
+    def shape(self) ->Optional[tuple]:
+        if not self._static_points:
+            return None
+
+        if self._cached_points is None:
+            self._points()
+
+        return len(self._cached_points),
 
     def _generator_factory(self)->Iterator:
-        for set_value in self._point_function():
-            yield self._set_function(*np.atleast_1d(set_value))
+        for _, set_args in self._points():
+            yield self._set_point(*set_args)
+
+        # Do not leave the last point unsettled
+        if self._step_delay:
+            self._settle_clock.wait(self._settle_deadline)
+
+    def _replay_points(self) ->Iterator[dict]:
+        """
+        Set the cached set points of a sweep with static set points one
+        after the other, like iterating the sweep does, but without
+        restarting it. Nests call this at every outer step instead of
+        iterating their inner sweeps; calling the post step functions is up
+        to the caller. Profilers time it like `_generator_factory` (see
+        `qsweep.profiling`).
+        """
+        for _, set_args in self._points():
+            yield self._set_point(*set_args)
+
+        if self._step_delay:
+            self._settle_clock.wait(self._settle_deadline)
+
+    async def _async_generator_factory(self) ->AsyncIterator:
+        for _, set_args in self._points():
+            yield await self._async_set_point(*set_args)
+
+        if self._step_delay:
+            await self._settle_clock.async_wait(self._settle_deadline)
+
+    def iter_blocks(self, block_size: int) ->Iterator[dict]:
+        """
+        The set function is called for each point, but the block is made
+        directly from the set points instead of from the dictionaries the
+        set function returns.
+        """
+        names = self._parameter_table.nests[0]
+        chunk = []
+
+        def make_block():
+            values = np.asarray(chunk)
+            if len(names) == 1:
+                return {names[0]: values}
+            return {name: values[:, count] for count, name in enumerate(names)}
+
+        for set_value, set_args in self._points():
+            self._set_point(*set_args)
+            self._call_post_step_calls()
+            chunk.append(set_value)
+
+            if len(chunk) == block_size:
+                yield make_block()
+                chunk = []
+
+        if len(chunk):
+            yield make_block()
+
+        if self._step_delay:
+            self._settle_clock.wait(self._settle_deadline)
 
 
 class Measure(BaseSweepObject):
@@ -233,5 +1423,24 @@ class Measure(BaseSweepObject):
         self._parameter_table = parameter_table.copy()
         self._measurable = True
 
+    @property
+    def shape(self) ->Optional[tuple]:
+        return ()
+
+    def _get(self) ->dict:
+        """
+        Get the value, after all swept parameters have settled
+        """
+        clock = self._settle_clock
+        if clock.deadline:
+            clock.wait(clock.deadline)
+        return self._get_function()
+
     def _generator_factory(self)->Iterator:
-        yield self._get_function()
+        yield self._get()
+
+    async def _async_generator_factory(self) ->AsyncIterator:
+        clock = self._settle_clock
+        if clock.deadline:
+            await clock.async_wait(clock.deadline)
+        yield await _acall(self._get_function)
@@ -0,0 +1,139 @@
+"""
+Checkpoint the progress of a run, so that it can be resumed after a crash.
+
+Runs with a checkpoint execute the compiled form of the sweep object (see
+`qsweep.compiler`), which is a flat list of instructions. Every time results
+are written to the database, the checkpoint file is updated with the run id,
+the number of rows written so far and the index of the next instruction.
+It also holds a fingerprint of the program (see `SweepProgram.fingerprint`).
+Resuming (see `qsweep.do_experiment.resume`) compiles the same sweep object
+again, checks that it has the same fingerprint, skips the instructions which
+produced the rows already written and appends the remaining rows to the same
+dataset.
+
+Rows can reach the database before the checkpoint file is updated, e.g. when
+writing fails halfway through a flush, or when QCoDeS writes buffered results
+on its own. Therefore runs with a checkpoint write their rows in the order in
+which they are produced (see `ResultWriter`), and resuming counts the rows in
+the dataset instead of trusting the checkpoint file. This assumes that every
+row is stored as a single row of the dataset, which is not the case if a
+'numeric' parameter is measured as an array.
+
+The checkpoint file is a small JSON file which is replaced atomically, so
+that it is never left half written.
+"""
+import json
+import os
+from typing import Optional
+
+from qcodes.dataset.data_set import DataSet
+
+from qsweep.base import BaseSweepObject
+from qsweep.compiler import SweepProgram
+from qsweep.qcodes_compat import mark_incomplete
+
+
+class Checkpoint:
+    """
+    Keep track of the rows of a run which have been stored, in a JSON file
+
+    Args:
+        path: The checkpoint file
+        program: The compiled sweep object of the run
+        datasaver: The QCoDeS data saver of the run. Its buffered results
+            are written to the database before every checkpoint.
+        rows: The number of rows written before (when resuming)
+    """
+    def __init__(self, path: str, program: SweepProgram, datasaver,
+                 rows: int = 0) -> None:
+        self.path = path
+        self._program = program
+        self._datasaver = datasaver
+        self.rows = rows
+        self._fingerprint = program.fingerprint()
+
+    def rows_written(self, n_rows: int) -> None:
+        """
+        Record that rows were handed to the data saver, after making sure
+        they are in the database
+        """
+        self._datasaver.flush_data_to_database()
+        self.rows += n_rows
+        self.save()
+
+    def save(self, finished: bool = False) -> None:
+        state = {
+            "run_id": self._datasaver.run_id,
+            "rows": self.rows,
+            "instruction": self._program.instruction_after(self.rows),
+            "fingerprint": self._fingerprint,
+            "finished": finished
+        }
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as fh:
+            json.dump(state, fh)
+        os.replace(temporary_path, self.path)
+
+
+def checkpoint_program(sweep_object: BaseSweepObject) -> SweepProgram:
+    """
+    The compiled sweep object to run with a checkpoint. Raises a ValueError
+    for sweep objects which cannot be compiled.
+    """
+    if isinstance(sweep_object, SweepProgram):
+        return sweep_object
+
+    try:
+        return sweep_object.compile()
+    except TypeError as error:
+        raise ValueError(f"Only sweep objects which can be compiled can be "
+                         f"run with a checkpoint: {error}") from error
+
+
+def load_checkpoint(path: str, program: SweepProgram) -> dict:
+    """
+    Read a checkpoint file and check that it belongs to the given program
+    """
+    with open(path) as fh:
+        state = json.load(fh)
+
+    if state["finished"]:
+        raise ValueError(f"The run {state['run_id']} of checkpoint {path} "
+                         f"has already finished")
+
+    # The set points need to be the same too, which is not the case if they
+    # are drawn at random without a seed (see `qsweep.setpoints.Random`)
+    if state.get("fingerprint") != program.fingerprint():
+        raise ValueError(f"The checkpoint {path} was made with a different "
+                         f"sweep object, or one with other set points")
+
+    return state
+
+
+def completed_rows(state: dict, dataset: DataSet) -> int:
+    """
+    The number of rows of a checkpointed run which are in its dataset. This
+    is at least the number of rows in the checkpoint, and more if rows were
+    written after the checkpoint was last updated.
+    """
+    rows = dataset.number_of_results
+    if rows < state["rows"]:
+        raise ValueError(f"The dataset of run {state['run_id']} holds "
+                         f"{rows} rows, while its checkpoint records "
+                         f"{state['rows']} rows")
+    return rows
+
+
+def reopen_dataset(run_id: int, conn: Optional[object] = None) -> DataSet:
+    """
+    Load a dataset to append results to it. QCoDeS marks a dataset as
+    completed when the measurement ends, also if it ends with an exception,
+    and has no way to add results to a completed dataset. Hence the
+    completion is undone here (see `qsweep.qcodes_compat.mark_incomplete`).
+    """
+    dataset = DataSet(run_id=run_id, conn=conn)
+    if dataset.completed:
+        dataset = mark_incomplete(dataset)
+
+    return dataset
@@ -0,0 +1,416 @@
+"""
+Compile a tree of sweep objects into a flat program.
+
+Iterating a deeply nested sweep object passes every point through several
+levels of generators. Compiling the sweep object walks the tree once, without
+calling any getters or setters, and records the operations it would perform in
+flat arrays of op codes and arguments. The resulting `SweepProgram` executes
+these operations in a single loop, so that the overhead per point does not
+depend on how deeply the sweep objects are nested.
+
+Note that the operations of every point are recorded, so compiling takes
+about as long as iterating over the sweep object once, and the program holds
+13 bytes per operation in memory. Compiling therefore only pays off when
+the same program is run several times (e.g. a measurement which is repeated
+in a loop); running a sweep object once is faster without compiling it.
+"""
+import hashlib
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from qsweep.base import (
+    BaseSweepObject, Sweep, Measure, Nest, Chain, Parallel, Zip,
+    _SettleClock, _LazyPoints
+)
+from qsweep.param_table import ParamTable
+
+# Op codes
+_SET = 0   # Call the set function of a node with the set point `index`
+_GET = 1   # Call the get function of a node
+_POST = 2  # Call the post step functions of a (container) node
+_EMIT = 3  # Yield a row made from the registers listed in template `index`
+
+
+class _Row:
+    """
+    Emitted while walking a sweep object whenever it would yield a value
+
+    Args:
+        registers: The indices of the nodes whose last results make up the
+            yielded dictionary
+        post_steps: The indices of the container nodes whose post step
+            functions are called before the value reaches the consumer
+    """
+    def __init__(
+            self, registers: Tuple[int, ...], post_steps: Tuple[int, ...]
+    ) -> None:
+        self.registers = registers
+        self.post_steps = post_steps
+
+
+class SweepProgram(BaseSweepObject):
+    """
+    A sweep object which executes a compiled sweep object. Iterating over it
+    produces the same dictionaries, with the same calls to setters, getters
+    and post step functions in the same order, as iterating over the original
+    sweep object.
+
+    Programs are created with `compile_sweep` (or `BaseSweepObject.compile`).
+    A program may be iterated over any number of times.
+    """
+
+    def __init__(
+            self,
+            parameter_table: ParamTable,
+            measurable: bool,
+            nodes: List[BaseSweepObject],
+            templates: List[Tuple[int, ...]],
+            opcodes: np.ndarray,
+            node_indices: np.ndarray,
+            arguments: np.ndarray,
+            shape: tuple,
+            start: int = 0
+    ) -> None:
+
+        super().__init__()
+        self._shape = shape
+        self._start = start
+        # The positions of the emit instructions; computed when needed
+        self._emits: np.ndarray = None
+        self._parameter_table = parameter_table
+        self._measurable = measurable
+        self._nodes = nodes
+        self._templates = templates
+        self._opcodes = opcodes
+        self._node_indices = node_indices
+        self._arguments = arguments
+
+    @property
+    def shape(self) -> tuple:
+        return self._shape
+
+    @property
+    def n_instructions(self) -> int:
+        return len(self._opcodes)
+
+    def fingerprint(self) -> str:
+        """
+        A hash of the instructions of the program and the set points of its
+        sweeps. Compiling the same sweep object again, also in another
+        Python session, gives the same fingerprint; a sweep object with
+        other set points gives another one. Set point generators (see
+        `qsweep.setpoints`) are hashed by their parameters, without
+        computing their set points.
+        """
+        digest = hashlib.sha256()
+        for array in (self._opcodes, self._node_indices, self._arguments):
+            digest.update(array.tobytes())
+
+        for node in self._nodes:
+            if not isinstance(node, Sweep):
+                continue
+
+            points = node._points()
+            if isinstance(node._cached_points, _LazyPoints):
+                digest.update(repr(node._cached_points.key()).encode())
+                continue
+
+            set_values = np.asarray([args for _, args in points])
+            if set_values.dtype.kind in "biufc":
+                digest.update(set_values.tobytes())
+            else:
+                digest.update(repr(set_values.tolist()).encode())
+
+        return digest.hexdigest()
+
+    def instruction_after(self, rows: int) -> int:
+        """
+        The index of the instruction which follows the yielding of the given
+        number of rows (counted from the start of the whole program)
+        """
+        if not rows:
+            return 0
+
+        if self._emits is None:
+            self._emits = np.flatnonzero(self._opcodes == _EMIT)
+
+        emits = self._emits
+        if rows > len(emits):
+            raise ValueError(f"This program yields only {len(emits)} rows")
+
+        return int(emits[rows - 1]) + 1
+
+    def resume_after(self, rows: int) -> 'SweepProgram':
+        """
+        A program which continues this program after the given number of
+        rows, without performing the operations which produced these rows.
+        Before continuing, the sweeps are set once more to the set points
+        they had when the last of these rows was produced (without calling
+        their post step functions), since the instruments may have been
+        changed in the meantime. Measurements are not repeated, so rows may
+        not reuse the results of measurements taken before resuming.
+        """
+        shape = self._shape
+        if shape is not None:
+            shape = (int(np.prod(shape)) - rows,)
+
+        return SweepProgram(
+            self._parameter_table, self._measurable, self._nodes,
+            self._templates, self._opcodes, self._node_indices,
+            self._arguments, shape, start=self.instruction_after(rows)
+        )
+
+    def _generator_factory(self) -> Iterator:
+        functions = []
+        set_arguments = []
+        for node in self._nodes:
+            if isinstance(node, Sweep):
+                functions.append(node._set_point)
+                set_arguments.append([args for _, args in node._points()])
+            elif isinstance(node, Measure):
+                functions.append(node._get)
+                set_arguments.append(None)
+            else:
+                functions.append(None)
+                set_arguments.append(None)
+
+        post_steps = [node._post_step_calls for node in self._nodes]
+        templates = self._templates
+        registers: List[dict] = [None] * len(self._nodes)
+
+        start = self._start
+        if start:
+            # Restore the set points of the skipped part, outermost first
+            last_sets = {}
+            for position in np.flatnonzero(self._opcodes[:start] == _SET):
+                last_sets[int(self._node_indices[position])] = position
+
+            for position in sorted(last_sets.values()):
+                node = int(self._node_indices[position])
+                set_args = set_arguments[node][int(self._arguments[position])]
+                registers[node] = functions[node](*set_args)
+
+        for opcode, node, argument in zip(
+                self._opcodes[start:].tolist(),
+                self._node_indices[start:].tolist(),
+                self._arguments[start:].tolist()
+        ):
+            if opcode == _EMIT:
+                row = {}
+                for register in templates[argument]:
+                    row.update(registers[register])
+                yield row
+                continue
+
+            if opcode == _SET:
+                set_args = set_arguments[node][argument]
+                registers[node] = functions[node](*set_args)
+            elif opcode == _GET:
+                registers[node] = functions[node]()
+
+            for cable in post_steps[node]:
+                cable()
+
+        # Like the sweeps themselves, do not leave the last point unsettled
+        for node in self._nodes:
+            if isinstance(node, Sweep) and node.step_delay:
+                _SettleClock.wait(node._settle_deadline)
+
+
+class _Compiler:
+    def __init__(self) -> None:
+        self.nodes: List[BaseSweepObject] = []
+        self._node_index = {}
+
+    def node(self, sweep_object: BaseSweepObject) -> int:
+        key = id(sweep_object)
+        if key not in self._node_index:
+            self._node_index[key] = len(self.nodes)
+            self.nodes.append(sweep_object)
+
+        return self._node_index[key]
+
+    def own_post_steps(self, sweep_object: BaseSweepObject) -> Tuple[int, ...]:
+        if not len(sweep_object._post_step_calls):
+            return ()
+        return self.node(sweep_object),
+
+    def walk(self, sweep_object: BaseSweepObject) -> Iterator:
+        """
+        Yield the operations (tuples of op code, node index and argument) and
+        rows (`_Row` instances) of a sweep object, in the order in which
+        iterating over the sweep object would perform them.
+        """
+        # Note that Parallel is a subclass of Chain, so test it first
+        if isinstance(sweep_object, Parallel):
+            raise TypeError("Cannot compile parallel sweep objects")
+        if isinstance(sweep_object, Sweep):
+            return self._walk_sweep(sweep_object)
+        if isinstance(sweep_object, Measure):
+            return self._walk_measure(sweep_object)
+        if isinstance(sweep_object, Nest):
+            return self._walk_nest(sweep_object)
+        if isinstance(sweep_object, Chain):
+            return self._walk_chain(sweep_object)
+        if isinstance(sweep_object, Zip):
+            return self._walk_zip(sweep_object)
+
+        raise TypeError(
+            f"Cannot compile sweep objects of type "
+            f"{type(sweep_object).__name__}"
+        )
+
+    def _walk_sweep(self, sweep_object: Sweep) -> Iterator:
+        if not sweep_object.static_points:
+            raise TypeError("Only sweeps with static set points can be "
+                            "compiled")
+
+        node = self.node(sweep_object)
+        for index, _ in enumerate(sweep_object._points()):
+            yield _SET, node, index
+            yield _Row((node,), ())
+
+    def _walk_measure(self, sweep_object: Measure) -> Iterator:
+        node = self.node(sweep_object)
+        yield _GET, node, 0
+        yield _Row((node,), ())
+
+    def _walk_chain(self, sweep_object: Chain) -> Iterator:
+        own_post_steps = self.own_post_steps(sweep_object)
+        for child in sweep_object._sweep_objects:
+            for event in self.walk(child):
+                if isinstance(event, _Row):
+                    event = _Row(
+                        event.registers, event.post_steps + own_post_steps
+                    )
+                yield event
+
+    def _walk_nest(self, sweep_object: Nest) -> Iterator:
+        def product(sweep_objects):
+            if len(sweep_objects) == 1:
+                yield from self.walk(sweep_objects[0])
+                return
+
+            for event in self.walk(sweep_objects[0]):
+                if not isinstance(event, _Row):
+                    yield event
+                    continue
+                # The outer sweep object has finished its step, including
+                # post step functions, before the inner one starts
+                for node in event.post_steps:
+                    yield _POST, node, 0
+
+                for inner_event in product(sweep_objects[1:]):
+                    if isinstance(inner_event, _Row):
+                        inner_event = _Row(
+                            event.registers + inner_event.registers,
+                            inner_event.post_steps
+                        )
+                    yield inner_event
+
+        if sweep_object.order == "raster":
+            events = product(sweep_object._sweep_objects)
+        else:
+            events = self._walk_grid(sweep_object, product)
+
+        own_post_steps = self.own_post_steps(sweep_object)
+        for event in events:
+            if isinstance(event, _Row):
+                event = _Row(
+                    event.registers, event.post_steps + own_post_steps
+                )
+            yield event
+
+    def _walk_grid(self, sweep_object: Nest, product) -> Iterator:
+        """
+        Walk a nest which visits the grid of its outer sweeps in another
+        order than the raster order
+        """
+        grid_size = sweep_object._grid_size
+        inner = sweep_object._sweep_objects[grid_size:]
+        nodes = tuple(
+            self.node(so) for so in sweep_object._sweep_objects[:grid_size]
+        )
+
+        for changes in sweep_object._grid_points():
+            # The post step functions of a sweep run with its set operation
+            for level, _, index, _ in changes:
+                yield _SET, nodes[level], index
+
+            if not len(inner):
+                yield _Row(nodes, ())
+                continue
+
+            for event in product(inner):
+                if isinstance(event, _Row):
+                    event = _Row(nodes + event.registers, event.post_steps)
+                yield event
+
+    def _walk_zip(self, sweep_object: Zip) -> Iterator:
+        walkers = [self.walk(child) for child in sweep_object._sweep_objects]
+        own_post_steps = self.own_post_steps(sweep_object)
+
+        while True:
+            registers: Tuple[int, ...] = ()
+            for walker in walkers:
+                # Like the builtin `zip`, advance the children one after the
+                # other, until one of them is exhausted
+                for event in walker:
+                    if isinstance(event, _Row):
+                        break
+                    yield event
+                else:
+                    return
+
+                for node in event.post_steps:
+                    yield _POST, node, 0
+                registers += event.registers
+
+            yield _Row(registers, own_post_steps)
+
+
+def compile_sweep(sweep_object: BaseSweepObject) -> SweepProgram:
+    """
+    Compile a sweep object into a `SweepProgram`. No getters or setters are
+    called while compiling. This walks every point of the sweep object, so
+    it only pays off for programs which are run several times (see the
+    module docstring).
+
+    Only sweep objects built from `Sweep` (with static set points), `Measure`,
+    `Nest`, `Chain` and `Zip` can be compiled; a TypeError is raised
+    otherwise. Post step functions of containers (e.g. a Nest) need to be
+    added before compiling.
+    """
+    compiler = _Compiler()
+    templates = {}
+    opcodes: List[int] = []
+    node_indices: List[int] = []
+    arguments: List[int] = []
+
+    def add(opcode, node, argument):
+        opcodes.append(opcode)
+        node_indices.append(node)
+        arguments.append(argument)
+
+    for event in compiler.walk(sweep_object):
+        if not isinstance(event, _Row):
+            add(*event)
+            continue
+
+        for node in event.post_steps:
+            add(_POST, node, 0)
+
+        template = templates.setdefault(event.registers, len(templates))
+        add(_EMIT, -1, template)
+
+    return SweepProgram(
+        sweep_object.parameter_table,
+        sweep_object.measurable,
+        compiler.nodes,
+        sorted(templates, key=templates.get),
+        np.array(opcodes, dtype=np.int8),
+        np.array(node_indices, dtype=np.int32),
+        np.array(arguments, dtype=np.int64),
+        sweep_object.shape
+    )
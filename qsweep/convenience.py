@@ -1,27 +1,33 @@
-from typing import Union, Iterator, cast
+from typing import Union, Iterator
 import logging
 import time
+from warnings import warn
 import numpy as np
 
 from qcodes import Parameter
-from qsweep.base import Sweep, Measure, Zip, Nest, Chain, BaseSweepObject
+from qsweep import param_table
+from qsweep.adaptive import AdaptiveSweep
+from qsweep.base import (
+    Sweep, Measure, Zip, Nest, Chain, Parallel, BaseSweepObject, IteratorSweep
+)
 from qsweep.decorators import (
     parameter_setter, parameter_getter, MeasureFunction, SweepFunction
 )
+from qsweep.setpoints import Linspace
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
 
-def make_setpoints_array(
+def make_setpoints(
     start: float,
     stop: float,
     step_size: float = None,
     step_count: int = None
-) -> np.ndarray:
+) -> Linspace:
     """
-    Given start, stop and step_count or step values, return a numpy array
-    with set points values.
+    Given start, stop and step_count or step values, return a lazy set point
+    generator (see `qsweep.setpoints`) of evenly spaced set points.
 
     Args:
         start
@@ -55,9 +61,8 @@ def make_setpoints_array(
     if step_count is None:
         step_count = int(np.round((stop - start) / step_size)) + 1
 
-    set_points, actual_step = np.linspace(
-        start, stop, step_count, retstep=True
-    )
+    set_points = Linspace(start, stop, step_count)
+    actual_step = set_points.step
 
     if step_size is not None and not np.isclose(step_size, actual_step, rtol=0.01):
         log.warning(
@@ -69,6 +74,34 @@ def make_setpoints_array(
     return set_points
 
 
+def make_setpoints_array(
+    start: float,
+    stop: float,
+    step_size: float = None,
+    step_count: int = None
+) -> np.ndarray:
+    """
+    Like `make_setpoints`, but return a numpy array with the set point
+    values instead of a lazy set point generator.
+    """
+    return make_setpoints(start, stop, step_size, step_count).to_array()
+
+
+def _sweep_function(parameter: Union[Parameter, SweepFunction],
+                    parameter_type: str = None) ->SweepFunction:
+    if isinstance(parameter, Parameter):
+        fun = parameter_setter(parameter, paramtype=parameter_type)
+    elif isinstance(parameter, SweepFunction):
+        fun = parameter
+    else:
+        raise ValueError(
+            "Can only sweep a QCoDeS parameter or a function "
+            "decorated with qsweep.setter"
+        )
+
+    return fun
+
+
 def sweep(
         parameter: Union[Parameter, SweepFunction],
         set_points: Iterator = None,
@@ -84,7 +117,8 @@ def sweep(
 
     Args:
         parameter: The parameter to sweep
-        set_points: The set point values to sweep over.
+        set_points: The set point values to sweep over, or a set point
+            generator (see `qsweep.setpoints`), which is evaluated lazily.
             If the set points are not given, the start,
             stop and step or step_count values are needed.
         start: The start value of the sweep
@@ -100,35 +134,61 @@ def sweep(
         step_count: the number of step in the sweep.
             If the set point iterator is not provided, we either need this
             value or a value for `step`.
-        step_delay: At each iteration, wait for the specified number of seconds
+        step_delay: The number of seconds the parameter needs to settle
+            after each set operation. Measurements are delayed until the
+            parameter has settled, and so is setting the next value. See
+            `Sweep`.
         parameter_type: ['array', 'numeric', 'text', 'complex']
             The type of parameter which is being swept. The default value
             is 'numeric'
     """
 
-    if isinstance(parameter, Parameter):
-        fun = parameter_setter(parameter, paramtype=parameter_type)
-    elif isinstance(parameter, SweepFunction):
-        fun = parameter
-    else:
-        raise ValueError(
-            "Can only sweep a QCoDeS parameter or a function "
-            "decorated with qsweep.setter"
-        )
+    fun = _sweep_function(parameter, parameter_type)
 
     if set_points is None:
-        set_points = make_setpoints_array(
-            start, stop, step_size, step_count
-        )
+        set_points = make_setpoints(start, stop, step_size, step_count)
 
     if not callable(set_points):
-        sweep_object = Sweep(fun, fun.parameter_table, lambda: set_points)
-    else:
-        sweep_object = Sweep(fun, fun.parameter_table, set_points)
+        # A sequence of set points is read once and then cached
+        return Sweep(
+            fun, fun.parameter_table, lambda: set_points, static_points=True,
+            step_delay=step_delay
+        )
+
+    return Sweep(
+        fun, fun.parameter_table, set_points, step_delay=step_delay
+    )
 
-    sweep_object.add_post_step(lambda: time.sleep(step_delay))
 
-    return sweep_object
+def adaptive_sweep(
+        parameter: Union[Parameter, SweepFunction],
+        sweep_object: BaseSweepObject,
+        start: float,
+        stop: float,
+        n_points: int = None,
+        loss_goal: float = None,
+        min_step: float = None,
+        loss=None,
+        target: str = None,
+        parameter_type: str = None
+) -> AdaptiveSweep:
+    """
+    Create a sweep object which sweeps the given parameter between the start
+    and stop values, choosing the set points from the results of the given
+    measurable sweep object. Set points are added where the measured values
+    change the most, until `n_points` set points are measured, the largest
+    loss drops below `loss_goal`, or intervals get smaller than `min_step`.
+    See `qsweep.adaptive.AdaptiveSweep`.
+
+    Example:
+        >>> so = adaptive_sweep(gate, measure(current), -1, 1, n_points=50)
+    """
+    fun = _sweep_function(parameter, parameter_type)
+
+    return AdaptiveSweep(
+        fun, sweep_object, start, stop, n_points=n_points,
+        loss_goal=loss_goal, min_step=min_step, loss=loss, target=target
+    )
 
 
 def measure(fun_or_param, paramtype: str = None):
@@ -148,37 +208,191 @@ def szip(*sweep_objects):
     return Zip(*sweep_objects)
 
 
-def nest(*sweep_objects):
-    return Nest(*sweep_objects)
+def nest(*sweep_objects, order="raster"):
+    return Nest(*sweep_objects, order=order)
 
 
 def chain(*sweep_objects):
     return Chain(*sweep_objects)
 
 
-def time_trace(interval_time, total_time=None, stop_condition=None):
+def parallel(*sweep_objects, max_workers=None, ordered=True):
+    """
+    Measure the given (measurable) sweep objects concurrently. Use this
+    instead of chaining when the measurements are independent of each other,
+    e.g.
 
-    start_time = None   # Set when we call "generator_function"
+    >>> sweep(x, points)(parallel(measure(a), measure(b), measure(c)))
 
-    if total_time is None:
-        if stop_condition is None:
-            raise ValueError("Either specify the total time or the stop "
-                             "condition")
+    Branches which drive disjoint instruments can be run in parallel as
+    well. With `ordered=False`, their results are stored as they come in,
+    instead of in the order of the equivalent chain:
 
-    else:
-        def stop_condition():
-            global start_time
-            return time.time() - start_time > total_time
+    >>> parallel(
+    >>>     sweep(gate1, points)(measure(current1)),
+    >>>     sweep(gate2, points)(measure(current2)),
+    >>>     ordered=False
+    >>> )
+    """
+    return Parallel(*sweep_objects, max_workers=max_workers, ordered=ordered)
+
+
+def _fixed_rate_times(interval_time, total_time, stop_condition):
+    """
+    Yield the times of samples on a fixed rate grid: sample `n` is due at
+    `n * interval_time` after the first sample, however long it takes to
+    process each sample. Since the grid is computed from the start time,
+    errors do not accumulate.
+
+    A sample is taken at its grid point, or right away if processing the
+    previous sample made it late by less than an interval. Either way the
+    grid time of the sample is yielded, not the time at which it was
+    taken. If processing a sample overruns one or more grid points, these
+    samples are skipped, and a warning with the number of missed samples is
+    issued at the end.
+    """
+    start = time.perf_counter()
+    sample = 0
+    missed = 0
+
+    while total_time is None or sample * interval_time <= total_time:
+        grid_time = sample * interval_time
+        lateness = time.perf_counter() - (start + grid_time)
 
-    def generator_function():
-        global start_time
-        start_time = time.time()
-        while not stop_condition():
-            yield time.time() - start_time
-            time.sleep(interval_time)
+        if lateness < 0:
+            time.sleep(-lateness)
+        elif lateness >= interval_time:
+            skipped = int(lateness // interval_time)
+            missed += skipped
+            sample += skipped
+            continue
+
+        if stop_condition is not None and stop_condition():
+            break
+
+        yield grid_time
+        sample += 1
+
+    if missed:
+        warn(f"The time trace missed {missed} of {sample} samples, because "
+             f"acquiring a sample took longer than the interval of "
+             f"{interval_time} s", RuntimeWarning)
+
+
+def _check_stop(total_time, stop_condition):
+    if total_time is None and stop_condition is None:
+        raise ValueError("Either specify the total time or the stop "
+                         "condition")
+
+
+def time_trace(interval_time, total_time=None, stop_condition=None):
+    """
+    Create a sweep object which repeats whatever is nested in it at a fixed
+    rate, and records the time on the fixed rate grid at which this is due.
+    If running the nested sweep object overruns one or more grid points,
+    these samples are skipped and a warning is issued.
+
+    Args:
+        interval_time: The time between samples in seconds
+        total_time: Stop sampling after this many seconds
+        stop_condition: A function without arguments which is called before
+            each sample. Sampling stops when it returns True.
+    """
+    _check_stop(total_time, stop_condition)
 
     time_parameter = Parameter(
         name="time", unit="s", set_cmd=None, get_cmd=None)
 
-    return sweep(time_parameter, cast(Iterator, generator_function))
+    return sweep(time_parameter, lambda: _fixed_rate_times(
+        interval_time, total_time, stop_condition
+    ))
 
+
+def buffered_time_trace(
+        read_function, interval_time, total_time=None, stop_condition=None,
+        poll_interval=0.1):
+    """
+    Create a measurable sweep object which records samples which an
+    instrument acquires at a fixed rate and buffers. Instead of getting one
+    sample per point, the buffer is read every `poll_interval` seconds and
+    all new samples are passed on at once. The time of each sample follows
+    from its position in the buffer, since the instrument samples at a fixed
+    rate.
+
+    Args:
+        read_function: A function decorated with `qsweep.getter`, which
+            returns all samples acquired since it was last called. Each
+            parameter gets a one dimensional array; all arrays have the
+            same length.
+        interval_time: The time between samples in seconds, as configured
+            in the instrument
+        total_time: Stop after the sample at this time (in seconds). If
+            the buffer does not hold all samples up to this time a poll
+            interval after this time has passed (e.g. because the instrument
+            stopped acquiring), a warning is issued and sampling stops.
+        stop_condition: A function without arguments which is called
+            before every read. Sampling stops when it returns True.
+        poll_interval: The time between reads of the buffer in seconds
+    """
+    _check_stop(total_time, stop_condition)
+
+    if not isinstance(read_function, MeasureFunction):
+        raise ValueError("Can only read buffers with functions decorated "
+                         "with qsweep.getter")
+
+    time_table = parameter_setter(Parameter(
+        name="time", unit="s", set_cmd=None, get_cmd=None
+    )).parameter_table
+
+    table = param_table.prod([time_table, read_function.parameter_table])
+
+    def read_blocks():
+        start = time.perf_counter()
+        n_samples = 0
+        while stop_condition is None or not stop_condition():
+            # The samples up to the total time have certainly been acquired
+            # by now, so this is the last read
+            timed_out = total_time is not None and \
+                time.perf_counter() - start > total_time + poll_interval
+
+            samples = {
+                name: np.atleast_1d(values)
+                for name, values in read_function().items()
+            }
+            length = len(next(iter(samples.values())))
+            times = (n_samples + np.arange(length)) * interval_time
+
+            if total_time is not None:
+                length = np.searchsorted(times, total_time, side="right")
+                times = times[:length]
+                samples = {
+                    name: values[:length] for name, values in samples.items()
+                }
+
+            n_samples += length
+            if length:
+                block = {"time": times}
+                block.update(samples)
+                yield block
+
+            if total_time is not None and \
+                    n_samples * interval_time > total_time:
+                return
+
+            if timed_out:
+                warn(f"The buffer only held {n_samples} samples after the "
+                     f"total time of {total_time} s", RuntimeWarning)
+                return
+
+            time.sleep(poll_interval)
+
+    def read_rows():
+        for block in read_blocks():
+            names = list(block.keys())
+            for row in zip(*block.values()):
+                yield dict(zip(names, row))
+
+    return IteratorSweep(
+        read_rows, parameter_table=table, measurable=True,
+        block_function=read_blocks
+    )
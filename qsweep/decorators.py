@@ -1,6 +1,12 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import weakref
 import numpy as np
 
-from typing import List, Iterable, Tuple, Callable
+from typing import List, Iterable, Tuple, Callable, Optional
 
 from qcodes import ParamSpec
 from qsweep import param_table
@@ -8,25 +14,183 @@ from qsweep.param_table import ParamTable
 from qsweep.base import IteratorSweep
 
 
-class _GetterSetterFunction:
-    def __init__(self, cablle, table):
+class _BackgroundLoop:
+    """
+    An event loop which runs on a daemon thread of its own, to run coroutines
+    on from synchronous code. Unlike running a loop in the calling thread,
+    this also works when the caller is itself running on an event loop
+    (e.g. in a Jupyter notebook or inside `async_do_experiment`).
+    """
+    def __init__(self) ->None:
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._thread: threading.Thread = None
+        self._pid: int = None
+
+    def _start(self) ->asyncio.AbstractEventLoop:
+        with self._lock:
+            # The thread of the loop does not exist in a forked process
+            if self._loop is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="qsweep-event-loop",
+                    daemon=True
+                )
+                self._thread.start()
+
+        return self._loop
+
+    def run(self, coroutine):
+        """
+        Run a coroutine to completion on the background loop and wait for
+        its result
+        """
+        loop = self._start()
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise TypeError("Cannot call an asynchronous getter or setter "
+                            "synchronously from a coroutine running on the "
+                            "background event loop; please await its "
+                            "'acall' method instead")
+
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+_background_loop = _BackgroundLoop()
+
+
+def _run_coroutine(coroutine):
+    """
+    Run a coroutine to completion from synchronous code, on the background
+    event loop. Note that this blocks the calling thread, and therefore its
+    event loop if it has one; iterate asynchronously to avoid this.
+    """
+    return _background_loop.run(coroutine)
+
+
+class _AsyncCallable:
+    """
+    A function which may be a coroutine function. Calling it synchronously
+    runs the coroutine on the background event loop; `acall` awaits it.
+    """
+    def __init__(self, cablle):
         self._caller = cablle
-        self._table = table
+        self._is_async = inspect.iscoroutinefunction(cablle)
 
     def __call__(self, *args, **kwargs):
+        if self._is_async:
+            return _run_coroutine(self._caller(*args, **kwargs))
+        return self._caller(*args, **kwargs)
+
+    async def acall(self, *args, **kwargs):
+        """
+        Call the function from a coroutine. If the decorated function is a
+        coroutine function, it is awaited.
+        """
+        if self._is_async:
+            return await self._caller(*args, **kwargs)
         return self._caller(*args, **kwargs)
 
+    @property
+    def is_async(self) ->bool:
+        return self._is_async
+
+
+class _GetterSetterFunction(_AsyncCallable):
+    def __init__(self, cablle, table, buffered: Callable = None):
+        super().__init__(cablle)
+        self._table = table
+        self._buffered = buffered
+
     @property
     def parameter_table(self):
         return self._table
 
+    @property
+    def buffered(self) ->Callable:
+        """
+        The function which performs the buffered counterpart of this set or
+        get operation for a whole list of points, or None if the instrument
+        does not support this. See the `buffered` argument of `setter` and
+        `getter`.
+        """
+        return self._buffered
+
 
 class MeasureFunction(_GetterSetterFunction):
     pass
 
 
+class _SetValueCache:
+    """
+    Remember the values which were last written by a setter. The cache is
+    empty until the first successful set call, and after it is invalidated.
+
+    Args:
+        current: Optionally, a function which returns the value the
+            parameter is known to have (like the value in the cache of a
+            QCoDeS parameter), or None if this is not known. The cache is
+            treated as empty when this value is unknown or differs from the
+            one after the last set call, since the parameter was then
+            written by other means than the setters sharing this cache.
+    """
+    def __init__(self, current: Callable = None) ->None:
+        self.values: tuple = None
+        self._current = current
+        self._last_current = None
+
+    def unchanged(self, values: tuple, tolerance: float) ->bool:
+        if self.values is None or len(values) != len(self.values):
+            return False
+        if self._current is not None:
+            current = self._current()
+            if current is None or \
+                    not _same_value(current, self._last_current, 0):
+                return False
+        return all(
+            _same_value(new, old, tolerance)
+            for new, old in zip(values, self.values)
+        )
+
+    def remember(self, values: tuple) ->None:
+        self.values = values
+        if self._current is not None:
+            self._last_current = self._current()
+
+    def invalidate(self) ->None:
+        self.values = None
+
+
+def _same_value(new, old, tolerance: float) ->bool:
+    new, old = np.asarray(new), np.asarray(old)
+    if new.shape != old.shape:
+        return False
+
+    if np.issubdtype(new.dtype, np.number) and \
+            np.issubdtype(old.dtype, np.number):
+        # NaN never equals the previous value, so it is always set
+        return bool(np.all(np.abs(new - old) <= tolerance))
+
+    return bool(np.all(new == old))
+
+
 class SweepFunction(_GetterSetterFunction):
-    pass
+    def __init__(self, cablle, table, find_cache: Callable = None,
+                 buffered: Callable = None):
+        super().__init__(cablle, table, buffered)
+        self._find_cache = find_cache
+
+    def invalidate_cache(self) ->None:
+        """
+        Forget the last set values, so that the next set call is passed on
+        to the instrument even if the value did not change. Call this when
+        the parameter was changed by other means than this setter. This does
+        nothing if the setter has no cache of last set values.
+        """
+        cache = self._find_cache() if self._find_cache is not None else None
+        if cache is not None:
+            cache.invalidate()
 
 
 def _generate_tables(names_units: Iterable[Tuple]) ->List[ParamTable]:
@@ -69,7 +233,7 @@ def _generate_tables(names_units: Iterable[Tuple]) ->List[ParamTable]:
     return param_tables
 
 
-def getter(*names_units: Tuple) ->Callable:
+def getter(*names_units: Tuple, buffered: Callable = None) ->Callable:
     """
     Args:
         names_units
@@ -77,64 +241,186 @@ def getter(*names_units: Tuple) ->Callable:
             'paramtype' that defines how the data is saved),
             e.g. [("gate", "V"), ("Isd", "A", "array")].
             Allowed values for the paramtype are ['array', 'numeric', 'text']
+        buffered
+            Optionally, a function which takes a number of points, triggers
+            the instrument to measure that many points (e.g. on the triggers
+            of a list uploaded to a source) and returns the buffered
+            readings, in the same way as the decorated function returns a
+            single reading but with an array of values per parameter. A
+            nest of a sweep with a buffered setter and a measurement with a
+            buffered getter runs the sweep in one go (see `Nest`).
 
     Returns:
         A decorator. The decorated function returns a callable and a parameter
         table. The callable calls the decorated function which should return
         measurement values.
 
+    The decorated function may be a coroutine function. In that case the
+    measurement is awaited when sweep objects are iterated asynchronously
+    (see `async_do_experiment`). The same goes for the buffered function.
+
     For more information about 'paramtype' argument, see `register_parameter`
     method of `Measurement` class in QCoDeS.
     """
 
     table = param_table.add(_generate_tables(names_units))
 
+    def to_dict(results) ->dict:
+        if not isinstance(results, tuple):
+            results = (results,)
+        return {k[0]: v for k, v in zip(names_units, results)}
+
+    def checked(results, n_points: int) ->dict:
+        results = to_dict(results)
+        if any(len(values) != n_points for values in results.values()):
+            raise ValueError(f"The buffered getter did not return "
+                             f"{n_points} values for every parameter")
+        return results
+
+    read = None
+    if buffered is not None and inspect.iscoroutinefunction(buffered):
+        async def async_read(n_points: int) ->dict:
+            return checked(await buffered(n_points), n_points)
+
+        read = _AsyncCallable(async_read)
+    elif buffered is not None:
+        read = _AsyncCallable(
+            lambda n_points: checked(buffered(n_points), n_points)
+        )
+
     def decorator(func: Callable) ->MeasureFunction:
+        if inspect.iscoroutinefunction(func):
+            async def async_inner() ->dict:
+                return to_dict(await func())
+
+            return MeasureFunction(async_inner, table.copy(), read)
+
         def inner() ->dict:
-            results = func()
-            if not isinstance(results, tuple):
-                results = (results,)
-            return {k[0]: v for k, v in zip(names_units, results)}
+            return to_dict(func())
 
-        return MeasureFunction(inner, table.copy())
+        return MeasureFunction(inner, table.copy(), read)
     return decorator
 
 
-def setter(*names_units: Tuple) ->Callable:
+def setter(
+        *names_units: Tuple, skip_unchanged: bool = False,
+        tolerance: float = 0, buffered: Callable = None) ->Callable:
     """
     Args:
         names_units
             List of tuples with parameter names and units (and optionally
             'paramtype' that defines how the data is saved),
             e.g. [("gate", "V"), ("Isd", "A", "array")]
+        skip_unchanged
+            If True, the decorated function is not called when all values
+            are within `tolerance` of the values it was last called with.
+            The set values are still returned as usual. Use
+            `invalidate_cache` on the returned setter when the instrument
+            was changed by other means.
+        tolerance
+            The largest absolute difference of numeric values which is
+            considered unchanged. Other values need to be equal.
+        buffered
+            Optionally, a function which uploads a whole list of set points
+            to the instrument (e.g. as a trigger list), to be stepped
+            through in hardware. It gets an array of values for every
+            parameter, like the decorated function gets a single value for
+            every parameter. See the `buffered` argument of `getter`.
 
     Returns:
         A decorator. The decorated function returns a callable and a parameter
         table. The callable calls the decorated function this the argument
         provided. This will set independent parameters
 
+    The decorated function may be a coroutine function. In that case the
+    set operation is awaited when sweep objects are iterated asynchronously
+    (see `async_do_experiment`). The same goes for the buffered function.
+
     For more information about 'paramtype' argument, see `register_parameter`
     method of `Measurement` class in QCoDeS.
     """
+    cache = _SetValueCache() if skip_unchanged else None
+    return _setter(
+        names_units, skip_unchanged, tolerance, buffered, lambda: cache
+    )
+
 
+def _setter(names_units: Tuple[Tuple, ...], skip_unchanged: bool,
+            tolerance: float, buffered: Optional[Callable],
+            find_cache: Callable[[], Optional[_SetValueCache]]) ->Callable:
+    """
+    Make the decorator of `setter`. The cache of last set values is looked
+    up with `find_cache` on every call, since it may be shared between
+    setters of the same parameter; it is kept up to date by all of them,
+    also by those which do not skip unchanged values.
+    """
     table = param_table.prod(_generate_tables(names_units))
 
+    def needs_set(cache: Optional[_SetValueCache], set_values: tuple) ->bool:
+        if cache is None:
+            return True
+        if skip_unchanged and cache.unchanged(set_values, tolerance):
+            return False
+        # If setting fails, we do not know the state of the instrument
+        cache.invalidate()
+        return True
+
+    def forget() ->None:
+        # After a buffered sweep, the instrument is left at the last point
+        # of the list, not at what the cache remembers
+        cache = find_cache()
+        if cache is not None:
+            cache.invalidate()
+
+    upload = None
+    if buffered is not None and inspect.iscoroutinefunction(buffered):
+        async def async_upload(*set_values) ->None:
+            forget()
+            await buffered(*set_values)
+
+        upload = _AsyncCallable(async_upload)
+    elif buffered is not None:
+        def sync_upload(*set_values) ->None:
+            forget()
+            buffered(*set_values)
+
+        upload = _AsyncCallable(sync_upload)
+
     def decorator(func: Callable) ->SweepFunction:
+        if inspect.iscoroutinefunction(func):
+            async def async_inner(*set_values) ->dict:
+                cache = find_cache()
+                if needs_set(cache, set_values):
+                    await func(*set_values)
+                    if cache is not None:
+                        cache.remember(set_values)
+                return {k[0]: v for k, v in zip(names_units, set_values)}
+
+            return SweepFunction(async_inner, table, find_cache, upload)
+
         def inner(*set_values) ->dict:
-            func(*set_values)
+            cache = find_cache()
+            if needs_set(cache, set_values):
+                func(*set_values)
+                if cache is not None:
+                    cache.remember(set_values)
             return {k[0]: v for k, v in zip(names_units, set_values)}
 
-        return SweepFunction(inner, table)
+        return SweepFunction(inner, table, find_cache, upload)
     return decorator
 
 
-def hardsweep(ind: List[Tuple], dep: List[Tuple]) ->Callable:
+def hardsweep(
+        ind: List[Tuple], dep: List[Tuple], n_points: int = None) ->Callable:
     """
     Args:
         ind: List of independent parameters, defined as tuples of names and
                 units (and optionally 'paramtype').
         dep: List of dependent parameters, defined as tuples of names and
                 units (and optionally 'paramtype').
+        n_points: Optionally, the number of set points the decorated
+                function returns. If given, the length of the sweep object is
+                known in advance (see `BaseSweepObject.shape`).
 
     Returns:
         A decorator which returns a sweep object, which can be directly used
@@ -186,7 +472,12 @@ def hardsweep(ind: List[Tuple], dep: List[Tuple]) ->Callable:
             any_array = np.any(np.array([ind_paramtypes + dep_paramtypes])
                                == 'array')
 
-            def wrapper() ->dict:
+            def acquire() ->Tuple[np.ndarray, np.ndarray]:
+                # Like a measurement, wait for swept parameters to settle
+                clock = sweep_object._settle_clock
+                if clock.deadline:
+                    clock.wait(clock.deadline)
+
                 spoints, measurements = func(*args, **kwargs)
 
                 spoints = np.atleast_2d(spoints)
@@ -198,6 +489,12 @@ def hardsweep(ind: List[Tuple], dep: List[Tuple]) ->Callable:
                     raise ValueError("The number of points or measurements "
                                      "returned does not match the number of "
                                      "dependent and/or independent parameters")
+
+                return spoints, measurements
+
+            def wrapper() ->dict:
+                spoints, measurements = acquire()
+
                 if any_array:
                     res = {k[0]: v for k, v in zip(ind, spoints)}
                     res.update({k[0]: v for k, v in zip(dep, measurements)})
@@ -208,8 +505,30 @@ def hardsweep(ind: List[Tuple], dep: List[Tuple]) ->Callable:
                         res.update({k[0]: v for k, v in zip(dep, measurement)})
                         yield res
 
+            def blocks() ->dict:
+                # The columns of the block are views of the returned arrays,
+                # so that no value is copied or boxed into a Python object
+                spoints, measurements = acquire()
+                names = [k[0] for k in ind] + [k[0] for k in dep]
+                values = list(spoints) + list(measurements)
+
+                if any_array:
+                    # A single row holding the arrays as they are
+                    yield {k: v[np.newaxis] for k, v in zip(names, values)}
+                else:
+                    yield dict(zip(names, values))
+
+            # With array parameters, all points are yielded in one go
+            if any_array:
+                shape = ()
+            elif n_points is not None:
+                shape = (n_points,)
+            else:
+                shape = None
+
             sweep_object = IteratorSweep(
-                wrapper, parameter_table=table.copy(), measurable=True
+                wrapper, parameter_table=table.copy(), measurable=True,
+                block_function=blocks, shape=shape
             )
             return sweep_object
 
@@ -217,12 +536,78 @@ def hardsweep(ind: List[Tuple], dep: List[Tuple]) ->Callable:
     return decorator
 
 
-def parameter_setter(parameter, paramtype: str = None):
+# The last set values per QCoDeS parameter, shared by all setters of a
+# parameter. A parameter only gets a cache once one of its setters skips
+# unchanged values.
+_parameter_caches = weakref.WeakKeyDictionary()
+
+
+def _qcodes_cache_valid(cache) ->bool:
+    valid = getattr(cache, "valid", None)
+    if valid is None:
+        # Older QCoDeS versions have no `valid`; a cache which was never
+        # written has no timestamp
+        return getattr(cache, "timestamp", None) is not None
+    return valid
+
+
+def _known_value_function(parameter) ->Optional[Callable]:
+    if getattr(parameter, "cache", None) is None:
+        return None
+
+    # The QCoDeS cache refers to the parameter, so it is looked up through a
+    # weak reference which does not keep the parameter alive
+    reference = weakref.ref(parameter)
+
+    def known_value():
+        parameter = reference()
+        if parameter is None or not _qcodes_cache_valid(parameter.cache):
+            return None
+        return parameter.cache.get(get_if_invalid=False)
+
+    return known_value
+
 
+def _parameter_cache(parameter) ->_SetValueCache:
+    cache = _parameter_caches.get(parameter)
+    if cache is None:
+        cache = _parameter_caches[parameter] = _SetValueCache(
+            _known_value_function(parameter)
+        )
+
+    return cache
+
+
+def parameter_setter(parameter, paramtype: str = None,
+                     skip_unchanged: bool = False, tolerance: float = 0,
+                     buffered: Callable = None):
+    """
+    A setter of a QCoDeS parameter. All setters of a parameter share the
+    last set value, so that setters which skip unchanged values (see
+    `setter`) also notice writes and buffered uploads by the other setters.
+    Writes with `parameter.set` are noticed from the value in the QCoDeS
+    cache of the parameter; reading the parameter does not forget the last
+    set value, unless the value read differs from it.
+
+    As long as no setter of the parameter skips unchanged values, no last
+    set value is kept and the QCoDeS cache is not consulted.
+    """
     paramtype = paramtype or "numeric"
     names_units = (parameter.full_name, parameter.unit, paramtype, parameter.label)
 
-    return setter(names_units)(parameter.set)
+    if skip_unchanged:
+        cache = _parameter_cache(parameter)
+
+        def find_cache() ->_SetValueCache:
+            return cache
+    else:
+        # Only keep the cache of skipping setters up to date, if there are
+        # any
+        find_cache = functools.partial(_parameter_caches.get, parameter)
+
+    return _setter(
+        (names_units,), skip_unchanged, tolerance, buffered, find_cache
+    )(parameter.set)
 
 
 def parameter_getter(parameter, paramtype: str = None):
@@ -1,43 +1,237 @@
 import numpy as np
+from collections import OrderedDict
 from warnings import warn
 
 import qcodes
-from qcodes.dataset.data_export import get_data_by_id
 from qcodes.dataset.plotting import plot_by_id
 from qcodes.dataset.experiment_container import load_or_create_experiment
 from qcodes.dataset.data_set import DataSet
 
+from qsweep.checkpoint import (
+    Checkpoint, checkpoint_program, load_checkpoint, completed_rows,
+    reopen_dataset
+)
 from qsweep.measurement import SweepMeasurement
+from qsweep.qcodes_compat import make_datasaver
+from qsweep.writer import ResultWriter
+from qsweep.pipeline import AcquisitionThread
+from qsweep.sharding import iter_sharded
+from qsweep.storage import NumpyStore
+
+# The default number of rows read at a time when data is read in chunks
+_CHUNK_ROWS = 100000
 
 
 class _DataExtractor:
     """
     A convenience class to quickly extract data from a data saver instance
+    or a `NumpyStore`.
+
+    The layouts (i.e. which parameters are stored together) are known from
+    the parameter table of the sweep object, or else from the dependencies
+    of the parameters of the dataset. Only the data of a requested
+    layout is loaded, the first time it is requested; the most recently used
+    layouts are kept in a cache.
+
+    Layouts which are too large to fit in memory can be read in chunks of
+    rows with `iter_chunks`, or reduced chunk by chunk with `mean`, `min`,
+    `max` and `histogram`.
+
+    Args:
+        datasaver: A QCoDeS data saver or a `NumpyStore`
+        parameter_table: The parameter table of the sweep object which was
+            run. Not needed for a `NumpyStore`, which knows its layouts. If
+            not given for a data saver, the layouts are read from the
+            description of its dataset.
+        cache_size: The maximum number of layouts kept in memory
     """
-    def __init__(self, datasaver):
-        self._run_id = datasaver.run_id
-        self._dataset = datasaver.dataset
+    def __init__(self, datasaver, parameter_table=None, cache_size=16):
+        if isinstance(datasaver, NumpyStore):
+            self._store = datasaver
+            self._run_id = None
+            self._dataset = None
+            self._layouts = datasaver.layouts
+        else:
+            self._store = None
+            self._run_id = datasaver.run_id
+            self._dataset = datasaver.dataset
+            if parameter_table is None:
+                self._layouts = self._dataset_layouts(self._dataset)
+            else:
+                parameter_table.resolve_dependencies()
+                self._layouts = parameter_table.nests
 
-    def __getitem__(self, layout):
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def _dataset_layouts(dataset):
+        """
+        The layouts of a dataset, each with its dependent parameter last
+        """
+        interdeps = dataset.description.interdeps
+        layouts = [
+            [setpoint.name for setpoint in setpoints] + [dependent.name]
+            for dependent, setpoints in interdeps.dependencies.items()
+        ]
+        layouts.extend(
+            [standalone.name] for standalone in
+            sorted(interdeps.standalones, key=lambda spec: spec.name)
+        )
+        return layouts
 
+    def _find_layout(self, layout):
         layout = sorted(layout.split(","))
-        all_data = get_data_by_id(self._run_id)
-        data_layouts = [sorted([d["name"] for d in ad]) for ad in all_data]
 
-        i = np.array([
-            set(layout).issubset(set(data_layout))
-            for data_layout in data_layouts
-        ])
+        for index, data_layout in enumerate(self._layouts):
+            if set(layout).issubset(data_layout):
+                return index
+
+        data_layouts = [sorted(data_layout) for data_layout in self._layouts]
+        raise ValueError(f"No such layout {layout}. "
+                         f"Available layouts: {data_layouts}")
+
+    def _load_layout(self, index):
+        if self._store is not None:
+            return self._store.get_layout_data(index)
+
+        # All parameters of a layout are in the tree of its dependent
+        dependent = self._layouts[index][-1]
+        return self._dataset.get_parameter_data(dependent)[dependent]
+
+    def __getitem__(self, layout):
+
+        index = self._find_layout(layout)
+
+        if index in self._cache:
+            self._cache.move_to_end(index)
+        else:
+            self._cache[index] = self._load_layout(index)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        return dict(self._cache[index])
+
+    def _chunk_slices(self, index, rows):
+        data = self._cache.get(index)
+        if data is None and self._store is not None:
+            # Memory maps are only paged in when slices are read
+            data = self._store.get_layout_data(index)
+
+        if data is not None:
+            length = len(data[self._layouts[index][-1]])
+            for start in range(0, length, rows):
+                yield {
+                    name: values[start: start + rows]
+                    for name, values in data.items()
+                }
+            return
+
+        dependent = self._layouts[index][-1]
+        start = 1
+        while True:
+            # Rows are counted from 1 and the end is inclusive
+            chunk = self._dataset.get_parameter_data(
+                dependent, start=start, end=start + rows - 1
+            )[dependent]
+
+            # No arrays at all are returned past the last row
+            length = len(chunk.get(dependent, ()))
+            if length:
+                yield chunk
+            if length < rows:
+                return
+            start += rows
+
+    def iter_chunks(self, layout, rows=_CHUNK_ROWS):
+        """
+        Iterate over the data of a layout in chunks of (at most) `rows` rows,
+        so that large runs can be processed with bounded memory. Each chunk
+        is a dictionary with an array for every parameter of the layout.
+
+        Example:
+            >>> for chunk in result.iter_chunks("x,y,i", rows=1000000):
+            >>>     process(chunk["x"], chunk["y"], chunk["i"])
+        """
+        if rows < 1:
+            raise ValueError("The number of rows per chunk must be positive")
+
+        return self._chunk_slices(self._find_layout(layout), rows)
+
+    def _parameter_chunks(self, layout, parameter, rows):
+        index = self._find_layout(layout)
+        if parameter not in self._layouts[index]:
+            raise ValueError(f"Parameter {parameter} is not in layout "
+                             f"{sorted(self._layouts[index])}")
+
+        for chunk in self.iter_chunks(layout, rows):
+            yield np.asarray(chunk[parameter])
+
+    def mean(self, layout, parameter, rows=_CHUNK_ROWS):
+        """
+        The mean of a parameter over all rows, computed chunk by chunk. For
+        array valued parameters this is the mean of each element.
+        """
+        total = 0
+        count = 0
+        for values in self._parameter_chunks(layout, parameter, rows):
+            total = total + np.sum(values, axis=0, dtype=np.float64)
+            count += len(values)
+
+        if not count:
+            raise ValueError(f"No data for parameter {parameter}")
+
+        return total / count
+
+    def _extremum(self, layout, parameter, rows, reduce, combine):
+        result = None
+        for values in self._parameter_chunks(layout, parameter, rows):
+            chunk_result = reduce(values, axis=0)
+            result = chunk_result if result is None else \
+                combine(result, chunk_result)
+
+        if result is None:
+            raise ValueError(f"No data for parameter {parameter}")
 
-        ind = np.flatnonzero(i)
-        if len(ind) == 0:
-            raise ValueError(f"No such layout {layout}. "
-                             f"Available layouts: {data_layouts}")
+        return result
 
-        data = all_data[ind[0]]
-        return {d["name"]: d["data"] for d in data}
+    def min(self, layout, parameter, rows=_CHUNK_ROWS):
+        """
+        The minimum of a parameter over all rows, computed chunk by chunk
+        """
+        return self._extremum(layout, parameter, rows, np.min, np.minimum)
+
+    def max(self, layout, parameter, rows=_CHUNK_ROWS):
+        """
+        The maximum of a parameter over all rows, computed chunk by chunk
+        """
+        return self._extremum(layout, parameter, rows, np.max, np.maximum)
+
+    def histogram(self, layout, parameter, bins=10, range=None,
+                  rows=_CHUNK_ROWS):
+        """
+        A histogram of all values of a parameter, computed chunk by chunk.
+        The arguments and return values are as for `numpy.histogram`. If no
+        range is given, the data is read twice: once to find the minimum and
+        maximum, and once to count.
+        """
+        if range is None:
+            range = (
+                float(np.min(self.min(layout, parameter, rows))),
+                float(np.max(self.max(layout, parameter, rows)))
+            )
+
+        edges = np.histogram_bin_edges([], bins=bins, range=range)
+        counts = np.zeros(len(edges) - 1, dtype=np.int64)
+        for values in self._parameter_chunks(layout, parameter, rows):
+            counts += np.histogram(values, bins=edges)[0]
+
+        return counts, edges
 
     def plot(self):
+        if self._store is not None:
+            raise TypeError("Only results stored in a QCoDeS dataset can be "
+                            "plotted")
         plot_by_id(self._run_id)
 
     @property
@@ -45,9 +239,27 @@ class _DataExtractor:
         return self._run_id
 
 
-def do_experiment(
-        experiment_name, sweep_object, setup=None, cleanup=None,
-        station=None, live_plot=False):
+def _run_actions(callables, action=None):
+    """
+    Either run the given callables (which are optionally given as tuples of
+    callables and arguments) or register them with `action`
+    """
+    if callables is None:
+        return
+
+    for cabble in np.atleast_1d(callables):
+        if not isinstance(cabble, tuple):
+            cabble = (cabble, ())
+
+        if action is None:
+            cabble[0](*cabble[1])
+        else:
+            action(*cabble)
+
+
+def _prepare_measurement(
+        experiment_name, sweep_object, setup, cleanup, station
+) ->SweepMeasurement:
 
     if "/" in experiment_name:
         experiment_name, sample_name = experiment_name.split("/")
@@ -56,42 +268,319 @@ def do_experiment(
 
     experiment = load_or_create_experiment(experiment_name, sample_name)
 
-    def add_actions(action, callables):
-        if callables is None:
-            return
+    meas = SweepMeasurement(exp=experiment, station=station)
+    meas.register_sweep(sweep_object)
 
-        for cabble in np.atleast_1d(callables):
-            if not isinstance(cabble, tuple):
-                cabble = (cabble, ())
+    _run_actions(setup, meas.add_before_run)
+    _run_actions(cleanup, meas.add_after_run)
+
+    return meas
+
+
+def _start_live_plot(live_plot):
+    """
+    Returns a function subscribing a live plot to a dataset, or None if
+    live plotting is not requested or not possible
+    """
+    if not live_plot:
+        return None
+
+    try:
+        from plottr.qcodes_dataset import QcodesDatasetSubscriber
+        from plottr.tools import start_listener
+
+        start_listener()
+
+    except ImportError:
+        warn("Cannot perform live plots, plottr not installed")
+        return None
+
+    def subscribe(dataset):
+        dataset.subscribe(
+            QcodesDatasetSubscriber(dataset),
+            state=[], min_wait=0, min_count=1
+        )
+
+    return subscribe
 
-            action(*cabble)
 
-    if live_plot:
+def _start_progress_bar(progress, sweep_object):
+    """
+    Returns a progress bar, or None if no progress bar is requested or
+    possible. If the length of the sweep object is known, the progress bar
+    shows an estimate of the remaining time.
+    """
+    if not progress:
+        return None
+
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        warn("Cannot show progress, tqdm not installed")
+        return None
+
+    total = len(sweep_object) if sweep_object.shape is not None else None
+    return tqdm(total=total, unit="pts")
+
+
+def _track_progress(add, progress_bar, blocks):
+    if progress_bar is None:
+        return add
+
+    def add_and_count(item):
+        add(item)
+        progress_bar.update(len(next(iter(item.values()))) if blocks else 1)
+
+    return add_and_count
+
+
+def _pick_flush_rows(sweep_object, flush_rows):
+    """
+    Unless the number of rows per write is given explicitly, aim for about a
+    hundred writes per run if the length of the sweep object is known
+    """
+    if flush_rows is not None:
+        return flush_rows
+
+    if sweep_object.shape is None:
+        return 1000
+
+    return int(np.clip(len(sweep_object) // 100, 100, 10000))
+
+
+def _run_sweep(
+        sweep_object, datasaver, flush_rows, flush_interval, block_size,
+        pipelined, queue_size, progress, profiler, processes, on_flush=None,
+        ordered=False):
+    """
+    Iterate over the sweep object and write the results to the data saver
+    """
+    writer = ResultWriter(
+        datasaver, sweep_object.parameter_table,
+        flush_rows=_pick_flush_rows(sweep_object, flush_rows),
+        flush_interval=flush_interval, profiler=profiler, on_flush=on_flush,
+        ordered=ordered
+    )
+
+    if profiler is not None:
+        profiler.attach(sweep_object)
+
+    if processes is not None:
+        source = iter_sharded(sweep_object, processes, block_size=block_size)
+    elif block_size is None:
+        source = sweep_object
+    else:
+        source = sweep_object.iter_blocks(block_size)
+
+    add = writer.add_result if block_size is None else writer.add_block
+
+    progress_bar = _start_progress_bar(progress, sweep_object)
+    add = _track_progress(add, progress_bar, block_size is not None)
+
+    try:
+        with writer:
+            if pipelined:
+                # The data saver stays on this thread, since the database
+                # connection may only be used by the thread which created it
+                with AcquisitionThread(source, queue_size) as acquisition:
+                    for item in acquisition:
+                        add(item)
+            else:
+                for item in source:
+                    add(item)
+    finally:
+        if progress_bar is not None:
+            progress_bar.close()
+        if profiler is not None:
+            profiler.detach()
+
+
+def do_experiment(
+        experiment_name, sweep_object, setup=None, cleanup=None,
+        station=None, live_plot=False, flush_rows=None, flush_interval=1.0,
+        block_size=None, pipelined=False, queue_size=1000, progress=False,
+        storage=None, profiler=None, processes=None, checkpoint=None):
+    """
+    Run a sweep object and store the results in a QCoDeS dataset.
+
+    Args:
+        experiment_name: Either an experiment name or a string of the form
+            "experiment_name/sample_name"
+        sweep_object: The sweep object to run
+        setup: Callables (or tuples of callables and arguments) which are
+            run before the measurement starts
+        cleanup: Callables (or tuples of callables and arguments) which are
+            run after the measurement has finished
+        station: The QCoDeS station
+        live_plot: Plot the data as it comes in (requires plottr)
+        flush_rows: Results are buffered and written to the database in
+            bulk once this many rows have been acquired. By default this is
+            chosen from the length of the sweep object, if known.
+        flush_interval: Buffered results are written to the database at least
+            this often (in seconds)
+        block_size: If given, iterate the sweep object in blocks of at most
+            this many rows (see `BaseSweepObject.iter_blocks`) instead of
+            point by point
+        pipelined: If True, run the sweep object on a separate acquisition
+            thread, so that writing results to the database does not hold up
+            the instruments (see `AcquisitionThread`)
+        queue_size: In pipelined mode, the maximum number of points (or
+            blocks) which have been acquired but not yet written. The
+            acquisition waits when this number is reached.
+        progress: Show a progress bar (requires tqdm)
+        storage: Optionally, a `NumpyStore` to write the results to instead
+            of a QCoDeS dataset. In that case, `station` and `live_plot` are
+            ignored.
+        profiler: Optionally, a `Profiler` which records the time spent in
+            each node of the sweep object and in writing the results (see
+            `qsweep.profiling`). Sweep objects which run on worker processes
+            are not profiled.
+        processes: If given, divide the set points of the outermost sweep
+            over this many worker processes (see `qsweep.sharding`). This
+            only makes sense for simulated instruments, since every process
+            has its own copy of the setters and getters. The workers are
+            forked, which is not safe while other threads run, so this cannot
+            be combined with `pipelined`.
+        checkpoint: Optionally, the path of a file in which to record the
+            progress of the run, so that it can be continued with `resume`
+            if it is interrupted (see `qsweep.checkpoint`). The compiled
+            sweep object is run for this (see `BaseSweepObject.compile`),
+            which has some restrictions:
+            - Only sweep objects built from sweeps with static set points,
+              measurements, nests, chains and zips can be compiled. Others,
+              like hardsweeps, parallel and adaptive sweep objects, raise a
+              ValueError before the run starts.
+            - Compiled sweep objects run point by point, so nests of
+              buffered setters and getters do not run in one go.
+            - Checkpoints cannot be combined with `storage` or `processes`.
+    """
+    if processes is not None and pipelined:
+        raise ValueError("Runs divided over processes cannot be pipelined, "
+                         "since the worker processes would be forked from "
+                         "the acquisition thread")
+
+    if checkpoint is not None:
+        if storage is not None or processes is not None:
+            raise ValueError("Checkpoints are only supported for runs which "
+                             "are stored in a QCoDeS dataset by a single "
+                             "process")
+        sweep_object = checkpoint_program(sweep_object)
+
+    run_options = dict(
+        flush_rows=flush_rows, flush_interval=flush_interval,
+        block_size=block_size, pipelined=pipelined, queue_size=queue_size,
+        progress=progress, profiler=profiler, processes=processes
+    )
+
+    if storage is not None:
+        storage.register_sweep(sweep_object, experiment_name)
+        _run_actions(setup)
         try:
-            from plottr.qcodes_dataset import QcodesDatasetSubscriber
-            from plottr.tools import start_listener
+            with storage:
+                _run_sweep(sweep_object, storage, **run_options)
+        finally:
+            _run_actions(cleanup)
 
-            start_listener()
+        return _DataExtractor(storage)
 
-        except ImportError:
-            warn("Cannot perform live plots, plottr not installed")
-            live_plot = False
+    subscribe_live_plot = _start_live_plot(live_plot)
+    meas = _prepare_measurement(
+        experiment_name, sweep_object, setup, cleanup, station
+    )
 
-    meas = SweepMeasurement(exp=experiment, station=station)
-    meas.register_sweep(sweep_object)
+    with meas.run() as datasaver:
+
+        if subscribe_live_plot is not None:
+            subscribe_live_plot(datasaver.dataset)
+
+        if checkpoint is None:
+            _run_sweep(sweep_object, datasaver, **run_options)
+        else:
+            tracker = Checkpoint(checkpoint, sweep_object, datasaver)
+            tracker.save()
+            _run_sweep(sweep_object, datasaver, on_flush=tracker.rows_written,
+                       ordered=True, **run_options)
+            tracker.save(finished=True)
+
+    return _DataExtractor(datasaver, sweep_object.parameter_table)
+
+
+def resume(
+        checkpoint, sweep_object, setup=None, cleanup=None, flush_rows=None,
+        flush_interval=1.0, block_size=None, pipelined=False,
+        queue_size=1000, progress=False, profiler=None):
+    """
+    Continue an interrupted run of `do_experiment` from its checkpoint. The
+    rows which were already stored are skipped, without calling the setters
+    and getters which produced them; the sweeps are set to where the run was
+    interrupted and the remaining rows are appended to the same dataset.
+
+    Args:
+        checkpoint: The checkpoint file given to `do_experiment`
+        sweep_object: The same sweep object as was given to
+            `do_experiment` (or an identical one, e.g. when resuming from
+            another Python session)
+
+    The other arguments are those of `do_experiment`.
+    """
+    sweep_object = checkpoint_program(sweep_object)
+
+    state = load_checkpoint(checkpoint, sweep_object)
+    dataset = reopen_dataset(state["run_id"])
+    datasaver = make_datasaver(dataset)
+    # Rows may have been written after the checkpoint was last updated
+    rows = completed_rows(state, dataset)
+    tracker = Checkpoint(checkpoint, sweep_object, datasaver, rows)
+
+    _run_actions(setup)
+    try:
+        _run_sweep(
+            sweep_object.resume_after(rows), datasaver,
+            flush_rows=flush_rows, flush_interval=flush_interval,
+            block_size=block_size, pipelined=pipelined,
+            queue_size=queue_size, progress=progress, profiler=profiler,
+            processes=None, on_flush=tracker.rows_written, ordered=True
+        )
+        tracker.save(finished=True)
+    finally:
+        # Like the end of a QCoDeS measurement, also after an exception
+        datasaver.flush_data_to_database()
+        dataset.mark_completed()
+        _run_actions(cleanup)
+
+    return _DataExtractor(datasaver, sweep_object.parameter_table)
 
-    add_actions(meas.add_before_run, setup)
-    add_actions(meas.add_after_run, cleanup)
+
+async def async_do_experiment(
+        experiment_name, sweep_object, setup=None, cleanup=None,
+        station=None, live_plot=False, flush_rows=None, flush_interval=1.0):
+    """
+    Like `do_experiment`, but the sweep object is iterated asynchronously on
+    the running event loop. Getters and setters which wrap coroutine
+    functions are awaited, so that a single event loop can overlap the I/O of
+    many instruments.
+
+    Writing to the database is not asynchronous; it happens in bulk
+    (see `flush_rows` and `flush_interval`) on the event loop thread.
+    """
+    subscribe_live_plot = _start_live_plot(live_plot)
+    meas = _prepare_measurement(
+        experiment_name, sweep_object, setup, cleanup, station
+    )
 
     with meas.run() as datasaver:
 
-        if live_plot:
-            datasaver.dataset.subscribe(
-                QcodesDatasetSubscriber(datasaver.dataset),
-                state=[], min_wait=0, min_count=1
-            )
+        if subscribe_live_plot is not None:
+            subscribe_live_plot(datasaver.dataset)
+
+        writer = ResultWriter(
+            datasaver, sweep_object.parameter_table,
+            flush_rows=_pick_flush_rows(sweep_object, flush_rows),
+            flush_interval=flush_interval
+        )
 
-        for data in sweep_object:
-            datasaver.add_result(*data.items())
+        with writer:
+            async for data in sweep_object:
+                writer.add_result(data)
 
-    return _DataExtractor(datasaver)
+    return _DataExtractor(datasaver, sweep_object.parameter_table)
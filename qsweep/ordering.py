@@ -0,0 +1,121 @@
+"""
+Orders in which a nest visits the points of a grid of set points.
+
+Each ordering takes the number of set points along every axis of the grid
+(outermost first) and yields tuples with the index of the set point along
+each axis, once for every point of the grid. Consecutive points of the
+"snake" and "hilbert" orderings are neighbours on the grid (with a few
+exceptions for Hilbert curves on grids of odd size), so that swept
+parameters never need to ramp back to the start of their sweep.
+"""
+import itertools
+from typing import Callable, Dict, Iterator, Sequence, Tuple
+
+
+def raster_indices(lengths: Sequence[int]) ->Iterator[Tuple[int, ...]]:
+    """
+    Every inner axis runs from its first to its last set point at every
+    step of the axes outside of it
+    """
+    return itertools.product(*[range(length) for length in lengths])
+
+
+def snake_indices(lengths: Sequence[int]) ->Iterator[Tuple[int, ...]]:
+    """
+    Like the raster order, except that every inner axis reverses its
+    direction each time it is restarted (i.e. boustrophedon). Consecutive
+    points differ in a single index, by one.
+    """
+    for raster in raster_indices(lengths):
+        index = []
+        passes = 0
+        for digit, length in zip(raster, lengths):
+            # The number of times this axis was run before, in raster order,
+            # determines its direction
+            index.append(length - 1 - digit if passes % 2 else digit)
+            passes = passes * length + digit
+
+        yield tuple(index)
+
+
+def hilbert_indices(lengths: Sequence[int]) ->Iterator[Tuple[int, ...]]:
+    """
+    Follow a (generalized) Hilbert curve through a two dimensional grid of
+    arbitrary size. Besides avoiding long jumps, this visits points which
+    are close on the grid at close moments in time, so that slow drifts
+    affect neighbouring points alike.
+    """
+    if len(lengths) != 2:
+        raise ValueError("A Hilbert curve needs a two dimensional grid")
+
+    width, height = lengths
+    if not width or not height:
+        return
+
+    if width >= height:
+        yield from _hilbert(0, 0, width, 0, 0, height)
+    else:
+        yield from _hilbert(0, 0, 0, height, width, 0)
+
+
+def _sign(value: int) ->int:
+    return (value > 0) - (value < 0)
+
+
+def _hilbert(x: int, y: int, ax: int, ay: int, bx: int,
+             by: int) ->Iterator[Tuple[int, int]]:
+    """
+    Fill the rectangle with corner (x, y), spanned by the major axis
+    (ax, ay) and the minor axis (bx, by), by recursively splitting it
+    (the "gilbert" algorithm for rectangles of any size)
+    """
+    width = abs(ax + ay)
+    height = abs(bx + by)
+    dax, day = _sign(ax), _sign(ay)
+    dbx, dby = _sign(bx), _sign(by)
+
+    if height == 1:
+        for _ in range(width):
+            yield x, y
+            x, y = x + dax, y + day
+        return
+
+    if width == 1:
+        for _ in range(height):
+            yield x, y
+            x, y = x + dbx, y + dby
+        return
+
+    ax2, ay2 = ax // 2, ay // 2
+    bx2, by2 = bx // 2, by // 2
+    width2 = abs(ax2 + ay2)
+    height2 = abs(bx2 + by2)
+
+    if 2 * width > 3 * height:
+        # Long rectangle: split it in two along the major axis
+        if width2 % 2 and width > 2:
+            ax2, ay2 = ax2 + dax, ay2 + day
+
+        yield from _hilbert(x, y, ax2, ay2, bx, by)
+        yield from _hilbert(x + ax2, y + ay2, ax - ax2, ay - ay2, bx, by)
+        return
+
+    if height2 % 2 and height > 2:
+        bx2, by2 = bx2 + dbx, by2 + dby
+
+    # Standard case: one step up, one long horizontal step, one step down
+    yield from _hilbert(x, y, bx2, by2, ax2, ay2)
+    yield from _hilbert(x + bx2, y + by2, ax, ay, bx - bx2, by - by2)
+    yield from _hilbert(
+        x + (ax - dax) + (bx2 - dbx), y + (ay - day) + (by2 - dby),
+        -bx2, -by2, -(ax - ax2), -(ay - ay2)
+    )
+
+
+# The orderings by name, with the number of axes they need (None for any
+# number of at least two axes)
+ORDERINGS: Dict[str, Tuple[Callable, int]] = {
+    "raster": (raster_indices, None),
+    "snake": (snake_indices, None),
+    "hilbert": (hilbert_indices, 2),
+}
@@ -1,5 +1,5 @@
-from copy import deepcopy
-from typing import List
+from itertools import chain as chain_iterables
+from typing import List, Sequence, Tuple
 from qcodes import ParamSpec
 
 
@@ -7,7 +7,14 @@ class ParamTable:
     """
     A ParamTable is used by sweep objects to keep track of parameters and
     their inter dependencies.
+
+    Tables are immutable: nesting and chaining tables create new tables which
+    share the (unmodified) param specs of the operands, so that building a
+    sweep object with many parameters takes linear time. The param specs with
+    resolved dependencies are computed once and cached.
     """
+    __slots__ = ("_param_specs", "_nests", "_resolved_specs")
+
     def __init__(self, param_specs: List[ParamSpec],
                  nests: List[List[str]]=None) ->None:
         """
@@ -21,13 +28,36 @@ class ParamTable:
                 This means that parameter 'i' is dependent on 'x' and 'y'
                 while parameter 'j' is dependent only on 'x'.
         """
+        param_specs = tuple(param_specs)
+        if nests is None:
+            nests = tuple((spec.name,) for spec in param_specs)
+        else:
+            nests = tuple(tuple(nest) for nest in nests)
+
+        self._init(param_specs, nests)
+
+    def _init(self, param_specs: Tuple[ParamSpec, ...],
+              nests: Tuple[Tuple[str, ...], ...]) ->None:
 
         self._param_specs = param_specs
-        # A list of lists. Inner list is a list of names
-        self._nests = [[spec.name] for spec in
-                       self._param_specs] if nests is None else nests
+        # A tuple of tuples. Inner tuple is a tuple of names
+        self._nests = nests
+        # The param specs with resolved dependencies, once resolved
+        self._resolved_specs: Tuple[ParamSpec, ...] = None
+
+    @classmethod
+    def _from_tuples(cls, param_specs: Tuple[ParamSpec, ...],
+                     nests: Tuple[Tuple[str, ...], ...]) ->'ParamTable':
+        """
+        Create a table without copying the given tuples
+        """
+        table = cls.__new__(cls)
+        table._init(param_specs, nests)
+        return table
 
-        self._dependencies_resolved = False
+    @property
+    def _dependencies_resolved(self) ->bool:
+        return self._resolved_specs is not None
 
     def check_unresolved(self) ->None:
         """
@@ -42,7 +72,9 @@ class ParamTable:
         """
         Return a copy of this table
         """
-        return ParamTable(self.param_specs, self.nests)
+        return ParamTable._from_tuples(
+            self._resolved_specs or self._param_specs, self._nests
+        )
 
     def nest(self, other: 'ParamTable') ->'ParamTable':
         """
@@ -54,12 +86,7 @@ class ParamTable:
             other: A table to nest in self
         """
         self.check_unresolved()
-        other.check_unresolved()
-
-        param_specs = self.param_specs + other.param_specs
-        nests = [self.nests[0] + nest for nest in other.nests]
-
-        return ParamTable(param_specs, nests)
+        return prod([self, other])
 
     def chain(self, other: 'ParamTable') ->'ParamTable':
         """
@@ -69,16 +96,11 @@ class ParamTable:
             other: A table to chain with self
         """
         self.check_unresolved()
-        other.check_unresolved()
-
-        param_specs = self.param_specs + other.param_specs
-        nests = self.nests + other.nests
-
-        return ParamTable(param_specs, nests)
+        return add([self, other])
 
     @property
     def param_specs(self) ->List[ParamSpec]:
-        return [spec.copy() for spec in self._param_specs]
+        return list(self._resolved_specs or self._param_specs)
 
     @property
     def nests(self) ->List[List[str]]:
@@ -91,24 +113,43 @@ class ParamTable:
         if self._dependencies_resolved:
             return
 
+        resolved_specs = list(self._param_specs)
         param_spec_dict = {spec.name: i
-                           for i, spec in enumerate(self._param_specs)}
+                           for i, spec in enumerate(resolved_specs)}
 
         for nest in self._nests:
             dependent_name = nest[-1]
             spec_index = param_spec_dict[dependent_name]
-            spec = self._param_specs[spec_index]
+            spec = resolved_specs[spec_index]
 
-            depends_on = deepcopy(spec._depends_on)
+            depends_on = list(spec._depends_on)
             depends_on.extend(nest[:-1])
 
             new_spec = ParamSpec(spec.name, spec.type, spec.label, spec.unit,
-                                 deepcopy(spec._inferred_from),
+                                 list(spec._inferred_from),
                                  depends_on)
 
-            self._param_specs[spec_index] = new_spec
+            resolved_specs[spec_index] = new_spec
+
+        self._resolved_specs = tuple(resolved_specs)
 
-        self._dependencies_resolved = True
+
+def _concatenated_specs(
+        param_tables: Sequence[ParamTable]) ->Tuple[ParamSpec, ...]:
+    """
+    The param specs of all tables. As when the first table is copied and the
+    others are nested in, or chained to, this copy, only the other tables need
+    to be unresolved.
+    """
+    first_table, *other_tables = param_tables
+    for table in other_tables:
+        table.check_unresolved()
+
+    return first_table.copy()._param_specs + tuple(
+        chain_iterables.from_iterable(
+            table._param_specs for table in other_tables
+        )
+    )
 
 
 def prod(param_tables: List[ParamTable]) ->ParamTable:
@@ -119,11 +160,19 @@ def prod(param_tables: List[ParamTable]) ->ParamTable:
     Args:
         param_tables
     """
-    table_product = param_tables[0].copy()
-    for table in param_tables[1:]:
-        table_product = table_product.nest(table)
+    if len(param_tables) == 1:
+        return param_tables[0].copy()
 
-    return table_product
+    param_specs = _concatenated_specs(param_tables)
+    # Every nest of the innermost table depends on the first nest of each
+    # of the outer tables
+    *outer_tables, inner_table = param_tables
+    prefix = tuple(chain_iterables.from_iterable(
+        table._nests[0] for table in outer_tables
+    ))
+    nests = tuple(prefix + nest for nest in inner_table._nests)
+
+    return ParamTable._from_tuples(param_specs, nests)
 
 
 def add(param_tables: List[ParamTable]) ->ParamTable:
@@ -134,8 +183,12 @@ def add(param_tables: List[ParamTable]) ->ParamTable:
     Args:
         param_tables
     """
-    table_product = param_tables[0].copy()
-    for table in param_tables[1:]:
-        table_product = table_product.chain(table)
+    if len(param_tables) == 1:
+        return param_tables[0].copy()
+
+    param_specs = _concatenated_specs(param_tables)
+    nests = tuple(chain_iterables.from_iterable(
+        table._nests for table in param_tables
+    ))
 
-    return table_product
+    return ParamTable._from_tuples(param_specs, nests)
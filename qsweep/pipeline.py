@@ -0,0 +1,173 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Executor, wait
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
+class _Done:
+    """
+    Put on the queue by the acquisition thread once the iterable is exhausted
+    """
+
+
+class _Failure:
+    """
+    Put on the queue by the acquisition thread if unrolling the iterable
+    raised an exception
+    """
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+class MergedAcquisition:
+    """
+    Unroll several iterables (typically independent sweep objects) on
+    separate threads, one per iterable, and hand their items to the thread
+    which iterates over this object through a single bounded queue. Items
+    are passed on in the order in which they arrive, so the items of
+    different iterables are interleaved; the items of each iterable remain
+    in order.
+
+    Errors propagate as in `AcquisitionThread`: the first exception raised
+    while unrolling any of the iterables is re-raised in the consuming
+    thread, and leaving the context stops all acquisition threads.
+
+    Args:
+        iterables: The iterables to unroll concurrently
+        queue_size: The maximum number of items which have been acquired but
+            not yet consumed
+        executor: Optionally, a thread pool with a thread for each iterable
+            to unroll the iterables on, instead of starting new threads
+    """
+    def __init__(self, iterables: Iterable[Iterable],
+                 queue_size: int = 1000, executor: Executor = None) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._iterables = list(iterables)
+        self._executor = executor
+        self._futures: list = []
+        self._threads = [] if executor is not None else [
+            threading.Thread(target=self._acquire, args=(iterable,),
+                             daemon=True)
+            for iterable in self._iterables
+        ]
+
+    def _put(self, item) -> bool:
+        """
+        Put an item on the queue, waiting for space to become available.
+        Returns False if the consumer has asked us to stop in the meantime.
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _acquire(self, iterable: Iterable) -> None:
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except BaseException as exception:
+            self._put(_Failure(exception))
+        else:
+            self._put(_Done())
+
+    def __enter__(self) -> 'MergedAcquisition':
+        if self._executor is not None:
+            self._futures = [
+                self._executor.submit(self._acquire, iterable)
+                for iterable in self._iterables
+            ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self._stop.set()
+        wait(self._futures)
+        for thread in self._threads:
+            thread.join()
+
+    def __iter__(self) -> Iterator:
+        running = len(self._iterables)
+        while running:
+            item = self._queue.get()
+
+            if isinstance(item, _Done):
+                running -= 1
+                continue
+            if isinstance(item, _Failure):
+                raise item.exception
+
+            yield item
+
+
+class AcquisitionThread(MergedAcquisition):
+    """
+    Unroll an iterable (typically a sweep object) on a separate thread and
+    hand its items to the thread which iterates over this object, through a
+    bounded queue.
+
+    This decouples instrument I/O from storage: while the consuming thread is
+    writing results, the acquisition thread is already taking the next
+    points. When the queue is full the acquisition thread blocks, so a storage
+    stall throttles the acquisition instead of consuming unbounded memory.
+
+    Errors propagate in both directions. An exception raised while unrolling
+    the iterable is re-raised in the consuming thread. If the consuming
+    thread leaves the context (e.g. because writing failed) the acquisition
+    thread stops taking new points.
+
+    Example:
+        >>> with AcquisitionThread(sweep_object) as acquisition:
+        >>> ... for data in acquisition:
+        >>> ...     datasaver.add_result(*data.items())
+
+    Args:
+        iterable: The iterable to unroll on the acquisition thread
+        queue_size: The maximum number of items which have been acquired but
+            not yet consumed
+    """
+    def __init__(self, iterable: Iterable, queue_size: int = 1000) -> None:
+        super().__init__([iterable], queue_size)
+
+
+async def merged_async(iterables: Iterable[AsyncIterable],
+                       queue_size: int = 1000) -> AsyncIterator:
+    """
+    The asynchronous counterpart of `MergedAcquisition`: unroll several
+    asynchronous iterables as concurrent tasks on the running event loop and
+    yield their items in the order in which they arrive. The first exception
+    raised while unrolling any of the iterables is re-raised, and the
+    remaining tasks are cancelled when the iteration ends.
+    """
+    items: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def pump(iterable):
+        try:
+            async for item in iterable:
+                await items.put(item)
+        except Exception as exception:
+            await items.put(_Failure(exception))
+        else:
+            await items.put(_Done())
+
+    tasks = [asyncio.ensure_future(pump(iterable)) for iterable in iterables]
+    running = len(tasks)
+    try:
+        while running:
+            item = await items.get()
+            if isinstance(item, _Done):
+                running -= 1
+            elif isinstance(item, _Failure):
+                raise item.exception
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,401 @@
+"""
+Opt-in timing instrumentation of sweep objects.
+
+A `Profiler` attached to a sweep object wraps the set, get and post step
+functions of every node in the tree of sweep objects, as well as the
+generators which step through them, so that each call is timed. Nothing is
+timed unless a profiler is attached, so sweep objects do not pay for this
+when they are not profiled.
+
+Example:
+    >>> profiler = Profiler()
+    >>> do_experiment("exp/sample", sweep_object, profiler=profiler)
+    >>> print(profiler.report())
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+
+from qsweep.base import (
+    _acall, BaseSweepObject, Sweep, Measure, Nest, Chain, Zip
+)
+from qsweep.adaptive import AdaptiveSweep
+from qsweep.compiler import SweepProgram
+
+# Kinds of timed operations
+SET = 0       # A call to the set function of a (adaptive) sweep
+GET = 1       # A call to the get function of a Measure
+POST = 2      # A call to a post step function
+NEXT = 3      # Producing the next value of a node, including its children
+FLUSH = 4     # Writing buffered results to storage
+
+_KIND_NAMES = ["set", "get", "post", "next", "flush"]
+
+# The node index under which storage flushes are recorded
+STORAGE = -1
+
+_EVENT_DTYPE = np.dtype([
+    ("node", np.int32),
+    ("kind", np.int8),
+    ("start", np.float64),
+    ("duration", np.float64)
+])
+
+
+class _TimedCall:
+    """
+    Time the calls of a set, get or post step function. Asynchronous
+    functions are timed as well when they are awaited.
+    """
+    def __init__(self, func: Callable, profiler: 'Profiler', node: int,
+                 kind: int) -> None:
+        self._func = func
+        self._profiler = profiler
+        self._node = node
+        self._kind = kind
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self._func(*args)
+        finally:
+            self._profiler.record(
+                self._node, self._kind, start, time.perf_counter() - start
+            )
+
+    async def acall(self, *args):
+        start = time.perf_counter()
+        try:
+            return await _acall(self._func, *args)
+        finally:
+            self._profiler.record(
+                self._node, self._kind, start, time.perf_counter() - start
+            )
+
+
+class Profiler:
+    """
+    Record the wall clock time of every set, get and post step call and of
+    every step of each node of a sweep object, as well as the time spent
+    writing results to storage in `do_experiment`.
+
+    The individual timings of the most recent operations are kept in a
+    preallocated ring buffer of `capacity` events (see `events`). Totals per
+    node are accumulated over the whole run, also when the ring buffer wraps
+    around (see `summary` and `report`).
+
+    Note that when iterating asynchronously, the time of a step includes the
+    time the event loop spends elsewhere while the step is awaiting.
+
+    Args:
+        capacity: The number of events kept in the ring buffer
+    """
+    def __init__(self, capacity: int = 100000) -> None:
+        if capacity < 1:
+            raise ValueError("The capacity needs to be at least one")
+
+        self._events = np.zeros(capacity, dtype=_EVENT_DTYPE)
+        self._n_events = 0
+        self._lock = threading.Lock()
+
+        self._nodes: List[BaseSweepObject] = []
+        self._parents: List[int] = []
+        self._depths: List[int] = []
+        # Per node, and for storage in the last row, the number of calls and
+        # the total duration of each kind of operation
+        self._counts = np.zeros((1, len(_KIND_NAMES)), dtype=np.int64)
+        self._totals = np.zeros((1, len(_KIND_NAMES)))
+        self._node_indices: Dict[int, int] = {}
+        self._instrumented = set()
+        self._originals: List[tuple] = []
+        # The lists of post step functions which hold timed calls
+        self._post_step_lists: List[list] = []
+
+    @property
+    def n_events(self) -> int:
+        """
+        The number of events recorded so far, including those which no
+        longer fit in the ring buffer
+        """
+        return self._n_events
+
+    def record(self, node: int, kind: int, start: float,
+               duration: float) -> None:
+        """
+        Record a timed operation of a node (or `STORAGE`)
+        """
+        with self._lock:
+            self._events[self._n_events % len(self._events)] = (
+                node, kind, start, duration
+            )
+            self._n_events += 1
+            self._counts[node, kind] += 1
+            self._totals[node, kind] += duration
+
+    def record_flush(self, start: float, duration: float) -> None:
+        """
+        Record writing buffered results to storage (see `ResultWriter`)
+        """
+        self.record(STORAGE, FLUSH, start, duration)
+
+    def events(self) -> np.ndarray:
+        """
+        The events in the ring buffer, in the order in which the operations
+        finished, as a structured array with the fields "node", "kind",
+        "start" and "duration". Node indices refer to `labels`; storage
+        events have node index -1.
+        """
+        capacity = len(self._events)
+        if self._n_events <= capacity:
+            return self._events[:self._n_events].copy()
+
+        split = self._n_events % capacity
+        return np.concatenate([self._events[split:], self._events[:split]])
+
+    @property
+    def labels(self) -> List[str]:
+        """
+        A label for every node which is being profiled, in the order of
+        the node indices
+        """
+        return [_label(node) for node in self._nodes]
+
+    def attach(self, sweep_object: BaseSweepObject) -> BaseSweepObject:
+        """
+        Instrument every node in the tree of a sweep object. This needs to
+        be done before iterating the sweep object. Returns the sweep object.
+
+        Attaching to a sweep object which was profiled before (and detached)
+        adds to the timings recorded for it.
+        """
+        self._attach(sweep_object, parent=-1, depth=0)
+
+        n_rows = len(self._nodes) + 1
+        counts = np.zeros((n_rows, len(_KIND_NAMES)), dtype=np.int64)
+        totals = np.zeros((n_rows, len(_KIND_NAMES)))
+        # Keep what was recorded so far, storage last
+        counts[:len(self._counts) - 1] = self._counts[:-1]
+        totals[:len(self._totals) - 1] = self._totals[:-1]
+        counts[-1] = self._counts[-1]
+        totals[-1] = self._totals[-1]
+        self._counts, self._totals = counts, totals
+
+        return sweep_object
+
+    def _attach(self, sweep_object: BaseSweepObject, parent: int,
+                depth: int) -> None:
+
+        # Attaching again (e.g. for another run) adds to the same totals
+        node = self._node_indices.get(id(sweep_object))
+        if node is None:
+            node = self._node_indices[id(sweep_object)] = len(self._nodes)
+            self._nodes.append(sweep_object)
+            self._parents.append(parent)
+            self._depths.append(depth)
+
+        # The same sweep object may occur more than once in a tree
+        if id(sweep_object) in self._instrumented:
+            return
+        self._instrumented.add(id(sweep_object))
+
+        if isinstance(sweep_object, (Sweep, AdaptiveSweep)):
+            self._wrap(sweep_object, "_set_function",
+                       _TimedCall(sweep_object._set_function, self, node, SET))
+        elif isinstance(sweep_object, Measure):
+            self._wrap(sweep_object, "_get_function",
+                       _TimedCall(sweep_object._get_function, self, node, GET))
+
+        # The calls are wrapped in place, so that post steps which are added
+        # while the profiler is attached are kept when it is detached. These
+        # are not timed.
+        post_step_calls = sweep_object._post_step_calls
+        post_step_calls[:] = [
+            _TimedCall(call, self, node, POST) for call in post_step_calls
+        ]
+        self._post_step_lists.append(post_step_calls)
+        self._wrap(sweep_object, "_generator_factory", self._timed_factory(
+            sweep_object._generator_factory, node
+        ))
+        if isinstance(sweep_object, Sweep):
+            # Nests replay the set points of inner sweeps instead of
+            # iterating them
+            self._wrap(sweep_object, "_replay_points", self._timed_factory(
+                sweep_object._replay_points, node
+            ))
+        self._wrap(
+            sweep_object, "_async_generator_factory",
+            self._timed_async_factory(
+                sweep_object._async_generator_factory, node
+            )
+        )
+
+        for child in _children(sweep_object):
+            self._attach(child, node, depth + 1)
+
+    def _wrap(self, sweep_object: BaseSweepObject, name: str,
+              value) -> None:
+        had_attribute = name in vars(sweep_object)
+        self._originals.append(
+            (sweep_object, name, had_attribute, getattr(sweep_object, name))
+        )
+        setattr(sweep_object, name, value)
+
+    def detach(self) -> None:
+        """
+        Remove the instrumentation from all sweep objects. The recorded
+        timings are kept.
+        """
+        for sweep_object, name, had_attribute, value in \
+                reversed(self._originals):
+            if had_attribute:
+                setattr(sweep_object, name, value)
+            else:
+                delattr(sweep_object, name)
+
+        for post_step_calls in self._post_step_lists:
+            post_step_calls[:] = [
+                call._func if isinstance(call, _TimedCall) and
+                call._profiler is self else call
+                for call in post_step_calls
+            ]
+
+        self._originals = []
+        self._post_step_lists = []
+        self._instrumented = set()
+
+    def _timed_factory(self, factory: Callable, node: int) -> Callable:
+        def timed_factory() -> Iterator:
+            iterator = iter(factory())
+            while True:
+                start = time.perf_counter()
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+                self.record(node, NEXT, start, time.perf_counter() - start)
+                yield value
+
+        return timed_factory
+
+    def _timed_async_factory(self, factory: Callable, node: int) -> Callable:
+        async def timed_factory():
+            iterator = factory().__aiter__()
+            while True:
+                start = time.perf_counter()
+                try:
+                    value = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                self.record(node, NEXT, start, time.perf_counter() - start)
+                yield value
+
+        return timed_factory
+
+    def summary(self) -> List[Dict[str, object]]:
+        """
+        The time spent in each node of the sweep tree, in depth first order.
+        For every node this gives the number of steps taken, the total time
+        in seconds of each kind of operation, and the "overhead": the time
+        spent stepping the node which is not accounted for by its own set
+        and get calls or by its children (e.g. generator overhead). The
+        overhead is only known for nodes which were iterated point by point.
+        The last entry holds the time spent writing to storage.
+        """
+        summary = []
+        for node, sweep_object in enumerate(self._nodes):
+            totals = self._totals[node]
+            children = [
+                child for child, parent in enumerate(self._parents)
+                if parent == node
+            ]
+
+            overhead = None
+            if self._counts[node, NEXT]:
+                accounted = totals[SET] + totals[GET] + sum(
+                    self._child_time(child) for child in children
+                )
+                overhead = max(totals[NEXT] - accounted, 0.0)
+
+            entry = {
+                "node": _label(sweep_object),
+                "depth": self._depths[node],
+                "steps": int(self._counts[node, NEXT]),
+                "overhead": overhead
+            }
+            entry.update({
+                name: float(totals[kind])
+                for kind, name in enumerate(_KIND_NAMES)
+                if kind != FLUSH
+            })
+            summary.append(entry)
+
+        summary.append({
+            "node": "storage",
+            "depth": 0,
+            "flushes": int(self._counts[STORAGE, FLUSH]),
+            "flush": float(self._totals[STORAGE, FLUSH])
+        })
+
+        return summary
+
+    def _child_time(self, child: int) -> float:
+        totals = self._totals[child]
+        if self._counts[child, NEXT]:
+            return totals[NEXT] + totals[POST]
+        # The child was not stepped itself (e.g. in a compiled program)
+        return totals[SET] + totals[GET] + totals[POST]
+
+    def report(self) -> str:
+        """
+        A table of the time spent in each node of the sweep tree. See
+        `summary`.
+        """
+        columns = ["steps", "set", "get", "post", "next", "overhead"]
+        lines = [
+            f"{'node':<40}" + "".join(f"{name:>12}" for name in columns)
+        ]
+
+        *node_entries, storage = self.summary()
+        for entry in node_entries:
+            label = "  " * entry["depth"] + entry["node"]
+            if len(label) > 39:
+                label = label[:36] + "..."
+
+            cells = [f"{entry['steps']:>12d}"]
+            for name in columns[1:]:
+                value = entry[name]
+                cells.append(
+                    f"{'-':>12}" if value is None else f"{value:>12.6f}"
+                )
+            lines.append(f"{label:<40}" + "".join(cells))
+
+        lines.append(
+            f"{'storage':<40}{storage['flushes']:>12d}"
+            f"{'flush: ' + format(storage['flush'], '.6f'):>60}"
+        )
+
+        return "\n".join(lines)
+
+
+def _children(sweep_object: BaseSweepObject) -> List[BaseSweepObject]:
+    # Note that Parallel is a subclass of Chain
+    if isinstance(sweep_object, (Nest, Chain, Zip)):
+        return list(sweep_object._sweep_objects)
+
+    if isinstance(sweep_object, AdaptiveSweep):
+        return [sweep_object._sweep_object]
+
+    if isinstance(sweep_object, SweepProgram):
+        return list(sweep_object._nodes)
+
+    return []
+
+
+def _label(sweep_object: BaseSweepObject) -> str:
+    names = []
+    for nest in sweep_object.parameter_table.nests:
+        names.extend(name for name in nest if name not in names)
+
+    return f"{type(sweep_object).__name__}({', '.join(names)})"
@@ -0,0 +1,78 @@
+"""
+Access to QCoDeS internals which differ between QCoDeS versions.
+
+Resuming a run (see `qsweep.checkpoint`) appends results to an existing
+dataset, for which QCoDeS has no public interface. The version specific
+parts of this are kept here. Each of them checks that the installed version
+of QCoDeS provides what it needs, and raises a RuntimeError naming the
+version otherwise.
+"""
+import qcodes
+from qcodes.dataset.data_set import DataSet
+from qcodes.dataset.measurements import DataSaver
+
+try:
+    from qcodes.dataset.sqlite.connection import atomic_transaction
+except ImportError:
+    # Older versions of QCoDeS
+    try:
+        from qcodes.dataset.sqlite_base import atomic_transaction
+    except ImportError:
+        atomic_transaction = None
+
+# The write period of `Measurement.run` in versions of QCoDeS which do not
+# have it in their configuration
+_DEFAULT_WRITE_PERIOD = 5.0
+
+
+def _unsupported(feature: str) ->RuntimeError:
+    return RuntimeError(f"{feature} is not supported with version "
+                        f"{qcodes.__version__} of QCoDeS")
+
+
+def write_period() ->float:
+    """
+    The number of seconds between writes of a data saver to the database,
+    as configured for new measurements
+    """
+    try:
+        return float(qcodes.config["dataset"]["write_period"])
+    except KeyError:
+        return _DEFAULT_WRITE_PERIOD
+
+
+def make_datasaver(dataset: DataSet) ->DataSaver:
+    """
+    A data saver which adds results to an existing dataset
+    """
+    description = getattr(dataset, "description", None)
+    interdeps = getattr(description, "interdeps", None)
+    if interdeps is None:
+        raise _unsupported("Adding results to an existing dataset")
+
+    return DataSaver(dataset, write_period(), interdeps)
+
+
+def _runs_columns(dataset: DataSet) ->set:
+    cursor = atomic_transaction(dataset.conn, "PRAGMA table_info(runs)")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def mark_incomplete(dataset: DataSet) ->DataSet:
+    """
+    Undo the completion of a dataset, so that results can be added to it
+    again. QCoDeS has no way to do this, so the runs table of the database
+    is updated directly. Returns the reloaded dataset.
+    """
+    if atomic_transaction is None or not hasattr(dataset, "conn") or \
+            not {"completed_timestamp", "is_completed"} <= \
+            _runs_columns(dataset):
+        raise _unsupported("Reopening a completed dataset")
+
+    atomic_transaction(
+        dataset.conn,
+        "UPDATE runs SET completed_timestamp=NULL, is_completed=? "
+        "WHERE run_id=?",
+        False, dataset.run_id
+    )
+    return DataSet(run_id=dataset.run_id, conn=dataset.conn)
@@ -0,0 +1,442 @@
+"""
+Lazily evaluated set points.
+
+Set point generators know how many set points they have and between which
+bounds these lie, without computing the set points themselves. Set points
+are computed a chunk at a time while they are iterated over, or on demand by
+indexing, so that very long sweeps do not need to be held in memory. Sweeps
+(see `qsweep.sweep`) recognize set point generators, so that their shape is
+known in advance while the set points are never materialized.
+
+Example:
+    >>> so = sweep(gate, Logspace(-3, 0, 1000))(measure(current))
+    >>> len(so)
+    1000
+"""
+import abc
+import math
+import os
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+# The number of set points which are computed at once while iterating
+_CHUNK_SIZE = 4096
+
+
+class SetPoints(abc.ABC):
+    """
+    The base class of set point generators. Subclasses implement `_values`,
+    which computes the set points at an array of indices, and set the number
+    of set points in `_length`.
+
+    Set points of a single parameter are numbers. Generators of set points
+    of several parameters at once (e.g. `LatinHypercube`) produce an array
+    of values per set point, to be used with a setter of several parameters.
+    """
+    def __init__(self, length: int) ->None:
+        if length < 0:
+            raise ValueError("The number of set points cannot be negative")
+        self._length = int(length)
+
+    @abc.abstractmethod
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        """
+        The set points at the given indices
+        """
+
+    def __len__(self) ->int:
+        return self._length
+
+    def __iter__(self):
+        for start in range(0, self._length, _CHUNK_SIZE):
+            stop = min(start + _CHUNK_SIZE, self._length)
+            yield from self._values(np.arange(start, stop))
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            indices = range(self._length)[index]
+            return self._values(
+                np.arange(indices.start, indices.stop, indices.step)
+            )
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Set point index out of range")
+
+        return self._values(np.array([index]))[0]
+
+    @property
+    def bounds(self) ->Tuple:
+        """
+        The smallest and the largest set point
+        """
+        if not self._length:
+            return None, None
+
+        first, last = self._values(np.array([0, self._length - 1]))
+        return min(first, last), max(first, last)
+
+    def to_array(self) ->np.ndarray:
+        """
+        Compute all set points
+        """
+        return self._values(np.arange(self._length))
+
+    def _key(self) ->tuple:
+        """
+        A tuple of plain Python values which determines the set points, e.g.
+        to fingerprint a sweep (see `SweepProgram.fingerprint`). This
+        implementation holds all set points; subclasses override it with
+        their parameters, so that the set points are not computed.
+        """
+        return (type(self).__name__,) + tuple(self.to_array().tolist())
+
+    def __repr__(self) ->str:
+        return f"<{type(self).__name__} of {self._length} set points>"
+
+
+class Linspace(SetPoints):
+    """
+    Evenly spaced set points from start to stop, like `numpy.linspace`
+    """
+    def __init__(self, start: float, stop: float, num: int,
+                 endpoint: bool = True) ->None:
+        super().__init__(num)
+        self.start = start
+        self.stop = stop
+        self.endpoint = endpoint
+
+    @property
+    def step(self) ->float:
+        divisor = self._length - 1 if self.endpoint else self._length
+        if divisor < 1:
+            return float("nan")
+        return (self.stop - self.start) / divisor
+
+    def _key(self) ->tuple:
+        return ("Linspace", float(self.start), float(self.stop), self._length,
+                bool(self.endpoint))
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        step = self.step if self._length > 1 or not self.endpoint else 0
+        values = self.start + indices * step
+        if self.endpoint and self._length > 1:
+            # Like numpy, make sure that the last set point is exact
+            values = np.where(indices == self._length - 1, self.stop, values)
+        return values
+
+
+class Logspace(SetPoints):
+    """
+    Set points from base ** start to base ** stop which are evenly spaced on
+    a logarithmic scale, like `numpy.logspace`
+    """
+    def __init__(self, start: float, stop: float, num: int,
+                 base: float = 10.0) ->None:
+        super().__init__(num)
+        self._exponents = Linspace(start, stop, num)
+        self.base = base
+
+    def _key(self) ->tuple:
+        return "Logspace", self._exponents._key(), float(self.base)
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        return np.power(self.base, self._exponents._values(indices))
+
+
+class Geomspace(SetPoints):
+    """
+    A geometric progression of set points from start to stop, like
+    `numpy.geomspace`. Start and stop need to have the same sign.
+    """
+    def __init__(self, start: float, stop: float, num: int) ->None:
+        if start == 0 or stop == 0 or (start < 0) != (stop < 0):
+            raise ValueError("The start and stop values of a geometric "
+                             "progression need to be nonzero and have the "
+                             "same sign")
+
+        super().__init__(num)
+        self.start = start
+        self.stop = stop
+        self._exponents = Linspace(
+            math.log10(abs(start)), math.log10(abs(stop)), num
+        )
+
+    def _key(self) ->tuple:
+        return "Geomspace", float(self.start), float(self.stop), self._length
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        values = np.sign(self.start) * np.power(
+            10.0, self._exponents._values(indices)
+        )
+        # Make the end points exact
+        values = np.where(indices == 0, self.start, values)
+        if self._length > 1:
+            values = np.where(indices == self._length - 1, self.stop, values)
+        return values
+
+
+class Chebyshev(SetPoints):
+    """
+    The Chebyshev nodes of the interval from start to stop, in increasing
+    order. These are denser towards the ends of the interval, which makes
+    them a good choice for fitting polynomials to the measurements.
+    """
+    def __init__(self, start: float, stop: float, num: int) ->None:
+        super().__init__(num)
+        self.start = start
+        self.stop = stop
+
+    def _key(self) ->tuple:
+        return "Chebyshev", float(self.start), float(self.stop), self._length
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        center = (self.start + self.stop) / 2
+        radius = (self.stop - self.start) / 2
+        angles = (2 * indices + 1) * np.pi / (2 * self._length)
+        return center - radius * np.cos(angles)
+
+
+class Piecewise(SetPoints):
+    """
+    Concatenate segments of set points, e.g. a coarse and a fine sweep. The
+    segments are set point generators or sequences of set points. Note that
+    set points at which segments join appear twice, unless a segment leaves
+    out its end point (see the `endpoint` argument of `Linspace`).
+    """
+    def __init__(self, *segments: Union[SetPoints, Sequence]) ->None:
+        self._segments = [
+            segment if isinstance(segment, SetPoints) else _Explicit(segment)
+            for segment in segments
+        ]
+        lengths = [len(segment) for segment in self._segments]
+        self._offsets = np.cumsum([0] + lengths)
+        super().__init__(self._offsets[-1])
+
+    def _key(self) ->tuple:
+        return ("Piecewise",) + tuple(
+            segment._key() for segment in self._segments
+        )
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        segment_indices = np.searchsorted(
+            self._offsets, indices, side="right"
+        ) - 1
+
+        pieces = []
+        for number in np.unique(segment_indices):
+            selected = segment_indices == number
+            pieces.append((selected, self._segments[number]._values(
+                indices[selected] - self._offsets[number]
+            )))
+
+        if not len(pieces):
+            return np.empty(0)
+
+        values = np.empty(
+            (len(indices),) + pieces[0][1].shape[1:],
+            dtype=np.result_type(*[piece for _, piece in pieces])
+        )
+        for selected, piece in pieces:
+            values[selected] = piece
+        return values
+
+    @property
+    def bounds(self) ->Tuple:
+        bounds = [
+            segment.bounds for segment in self._segments if len(segment)
+        ]
+        if not len(bounds):
+            return None, None
+        return min(low for low, _ in bounds), max(high for _, high in bounds)
+
+
+class _Explicit(SetPoints):
+    """
+    Set points which are given explicitly, to use them as a segment
+    """
+    def __init__(self, values: Sequence) ->None:
+        self._array = np.asarray(values)
+        super().__init__(len(self._array))
+
+    def _key(self) ->tuple:
+        # The set points are in memory anyway
+        return "Explicit", self._array.tolist()
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        return self._array[indices]
+
+    @property
+    def bounds(self) ->Tuple:
+        if not self._length:
+            return None, None
+        return self._array.min(), self._array.max()
+
+
+class DenseWindows(Piecewise):
+    """
+    A coarse grid of evenly spaced set points from start to stop, with
+    windows in which the set points are denser, e.g. around a resonance.
+
+    Args:
+        start, stop: The interval to sweep, with start smaller than stop
+        num: The number of set points of the coarse grid over the whole
+            interval
+        windows: Tuples (low, high, num) of the boundaries of a window and
+            the number of evenly spaced set points in it, including the
+            boundaries. The points of the coarse grid within a window are
+            left out.
+    """
+    def __init__(self, start: float, stop: float, num: int,
+                 windows: Sequence[Tuple[float, float, int]]) ->None:
+        if not start < stop:
+            raise ValueError("The start value needs to be smaller than the "
+                             "stop value")
+        if num < 2:
+            raise ValueError("The coarse grid needs at least two points")
+
+        windows = sorted(windows)
+        boundary = start
+        for low, high, _ in windows:
+            if not boundary <= low < high <= stop:
+                raise ValueError("Windows need to lie between the start and "
+                                 "stop values and cannot overlap")
+            boundary = high
+
+        step = (stop - start) / (num - 1)
+        tolerance = 1e-9
+
+        def coarse(low, high, include_low, include_high):
+            # The indices of the coarse grid points between low and high
+            low, high = (low - start) / step, (high - start) / step
+            first = math.ceil(low - tolerance) if include_low else \
+                math.floor(low + tolerance) + 1
+            last = math.floor(high + tolerance) if include_high else \
+                math.ceil(high - tolerance) - 1
+            count = max(last - first + 1, 0)
+            return Linspace(start + first * step, start + last * step, count)
+
+        segments = []
+        low, include_low = start, True
+        for window_low, window_high, window_num in windows:
+            segments.append(coarse(low, window_low, include_low, False))
+            segments.append(Linspace(window_low, window_high, window_num))
+            low, include_low = window_high, False
+        segments.append(coarse(low, stop, include_low, True))
+
+        super().__init__(*segments)
+
+
+class Random(SetPoints):
+    """
+    Set points drawn uniformly at random between low and high. The set
+    points are reproducible: iterating again, or indexing, gives the same
+    values. Pass a seed to get the same values in another session.
+    """
+    def __init__(self, low: float, high: float, num: int,
+                 seed: int = None) ->None:
+        super().__init__(num)
+        self.low = low
+        self.high = high
+        self.seed = _pick_seed(seed)
+
+    def _key(self) ->tuple:
+        return ("Random", float(self.low), float(self.high), self._length,
+                int(self.seed))
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        uniform = _uniform_chunks(self.seed, 0, indices)
+        return self.low + (self.high - self.low) * uniform
+
+    @property
+    def bounds(self) ->Tuple:
+        return self.low, self.high
+
+
+class LatinHypercube(SetPoints):
+    """
+    A Latin hypercube sample of set points of several parameters: along
+    every parameter, each of `num` equal slices of the interval holds
+    exactly one set point. Every set point is an array with a value per
+    parameter (for a setter of several parameters), or a number if there is
+    only one parameter.
+
+    Args:
+        bounds: Tuples (low, high) with the interval of every parameter
+        num: The number of set points
+        seed: Optionally, a seed to get the same values in another session
+    """
+    def __init__(self, bounds: Sequence[Tuple[float, float]], num: int,
+                 seed: int = None) ->None:
+        super().__init__(num)
+        self._lows = np.array([low for low, _ in bounds], dtype=float)
+        self._highs = np.array([high for _, high in bounds], dtype=float)
+        self.seed = _pick_seed(seed)
+        # The slice of every set point along every parameter; computed on
+        # first use
+        self._permutations: np.ndarray = None
+
+    def _key(self) ->tuple:
+        return ("LatinHypercube", self._lows.tolist(), self._highs.tolist(),
+                self._length, int(self.seed))
+
+    def _values(self, indices: np.ndarray) ->np.ndarray:
+        n_parameters = len(self._lows)
+        if self._permutations is None:
+            self._permutations = np.array([
+                _random_state(self.seed, parameter).permutation(self._length)
+                for parameter in range(n_parameters)
+            ]).T
+
+        uniform = np.stack([
+            _uniform_chunks(self.seed, parameter + 1, indices)
+            for parameter in range(n_parameters)
+        ], axis=-1)
+
+        fractions = (self._permutations[indices] + uniform) / self._length
+        values = self._lows + (self._highs - self._lows) * fractions
+        return values[:, 0] if n_parameters == 1 else values
+
+    @property
+    def bounds(self) ->Tuple:
+        if len(self._lows) == 1:
+            return self._lows[0], self._highs[0]
+        return self._lows, self._highs
+
+
+def _pick_seed(seed: int = None) ->int:
+    if seed is not None:
+        return seed
+    return int.from_bytes(os.urandom(8), "little") % 2 ** 63
+
+
+def _random_state(seed: int, *streams: int) ->np.random.RandomState:
+    """
+    A random number generator seeded with a seed and stream numbers. The
+    seed is split into 32 bit words, as `RandomState` requires.
+    """
+    seed %= 2 ** 64
+    return np.random.RandomState(
+        [seed & 0xffffffff, seed >> 32] + [int(stream) for stream in streams]
+    )
+
+
+def _uniform_chunks(seed: int, stream: int,
+                    indices: np.ndarray) ->np.ndarray:
+    """
+    Uniform random numbers at the given indices of a reproducible sequence.
+    The sequence is generated in chunks with a generator seeded per chunk,
+    so that any index can be reached without generating all numbers before
+    it.
+    """
+    values = np.empty(len(indices))
+    chunks = indices // _CHUNK_SIZE
+    for chunk in np.unique(chunks):
+        selected = chunks == chunk
+        generator = _random_state(seed, stream, chunk)
+        values[selected] = generator.random_sample(_CHUNK_SIZE)[
+            indices[selected] - chunk * _CHUNK_SIZE
+        ]
+    return values
@@ -0,0 +1,127 @@
+"""
+Run a sweep object on a pool of worker processes.
+
+The set points of the outermost sweep are divided into contiguous shards.
+Each worker process runs the complete sweep object (that is, everything
+nested in the outermost sweep) for the set points of one shard at a time,
+and the results of the shards are passed on in the original order. This
+scales sweeps over CPU bound "instruments", like simulators wrapped in
+`qsweep.setter` and `qsweep.getter`, over all cores.
+
+Worker processes are forked, so that sweep objects (which are full of
+closures) do not need to be pickled; only the results are sent back. Each
+worker has its own copy of the state of the setters and getters, which is
+why this only makes sense for simulated instruments and not for hardware.
+Since only the forking thread lives on in a worker, the pool should not be
+started while other threads hold locks the sweep object needs (e.g. from a
+pipelined run, see `do_experiment`).
+"""
+import itertools
+import multiprocessing
+from typing import Iterator, List, Optional, Tuple
+
+from qsweep.base import BaseSweepObject, Sweep, Nest
+
+# In a worker process, the sweep object being run and the block size, if
+# any. This is set by the initializer of the worker.
+_sharded: Optional[Tuple[BaseSweepObject, Optional[int]]] = None
+
+
+def _init_worker(sweep_object: BaseSweepObject,
+                 block_size: Optional[int]) -> None:
+    global _sharded
+    _sharded = (sweep_object, block_size)
+
+
+def _outer_sweep(sweep_object: BaseSweepObject) -> Sweep:
+    # Nests may be nested themselves, e.g. "sweep(x, ...)(sweep(y, ...))(...)"
+    outer = sweep_object
+    while isinstance(outer, Nest):
+        if outer.order != "raster":
+            raise TypeError("Only nests in raster order can be divided "
+                            "over processes")
+        outer = outer._sweep_objects[0]
+
+    if not isinstance(outer, Sweep) or not outer.static_points:
+        raise TypeError("Only a sweep with static set points, or a nest "
+                        "whose outermost sweep has static set points, can "
+                        "be divided over processes")
+
+    return outer
+
+
+def _make_shard(sweep_object: BaseSweepObject, start: int,
+                stop: int) -> BaseSweepObject:
+    """
+    Make a copy of the sweep object which only runs the set points from
+    `start` up to `stop` of the outermost sweep
+    """
+    if isinstance(sweep_object, Nest):
+        first, *others = sweep_object._sweep_objects
+        shard = Nest(_make_shard(first, start, stop), *others)
+    else:
+        outer = _outer_sweep(sweep_object)
+        set_values = [
+            value for value, _ in itertools.islice(outer._points(), start, stop)
+        ]
+        shard = Sweep(
+            outer._set_function, outer.parameter_table, lambda: set_values,
+            static_points=True, step_delay=outer.step_delay
+        )
+
+    shard._post_step_calls = list(sweep_object._post_step_calls)
+    return shard
+
+
+def _run_shard(bounds: Tuple[int, int]) -> list:
+    sweep_object, block_size = _sharded
+    shard = _make_shard(sweep_object, *bounds)
+
+    if block_size is None:
+        return list(shard)
+
+    return list(shard.iter_blocks(block_size))
+
+
+def iter_sharded(
+        sweep_object: BaseSweepObject, processes: int = None,
+        shard_size: int = None, block_size: int = None) -> Iterator:
+    """
+    Iterate over a sweep object, dividing the set points of its outermost
+    sweep over a pool of worker processes. The results are the same, and in
+    the same order, as when iterating over the sweep object directly.
+
+    Args:
+        sweep_object: A sweep with static set points, or a nest whose first
+            sweep object is a sweep with static set points
+        processes: The number of worker processes. By default, one per CPU.
+        shard_size: The number of outer set points each worker runs at a
+            time. By default, the set points are divided into four shards
+            per process, to balance the load.
+        block_size: If given, the workers iterate in blocks (see
+            `BaseSweepObject.iter_blocks`) and blocks are yielded instead of
+            dictionaries per point. Sending blocks back to this process is
+            a lot cheaper.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Dividing sweeps over processes requires the "
+                           "'fork' start method, which is not available on "
+                           "this platform")
+
+    outer = _outer_sweep(sweep_object)
+    n_points = len(outer)
+    processes = processes or multiprocessing.cpu_count()
+    if shard_size is None:
+        shard_size = max(-(-n_points // (4 * processes)), 1)
+
+    shards: List[Tuple[int, int]] = [
+        (start, min(start + shard_size, n_points))
+        for start in range(0, n_points, shard_size)
+    ]
+
+    # Forked workers get the initializer arguments without pickling
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes, initializer=_init_worker,
+                      initargs=(sweep_object, block_size)) as pool:
+        for results in pool.imap(_run_shard, shards):
+            yield from results
@@ -0,0 +1,307 @@
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from qsweep.base import BaseSweepObject
+
+_SIDECAR = "params.json"
+
+
+class _Column:
+    """
+    A growable, memory mapped array in a raw binary file. The first axis runs
+    over rows; the data type and the shape of a row are fixed by the first
+    values which are appended.
+    """
+    def __init__(self, path: str, capacity: int) -> None:
+        self.path = path
+        self.rows = 0
+        self.dtype: np.dtype = None
+        self.row_shape: tuple = None
+
+        self._capacity = capacity
+        self._memmap: np.memmap = None
+
+    def _map(self) -> None:
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape))
+        with open(self.path, "ab") as fh:
+            fh.truncate(self._capacity * row_bytes)
+
+        self._memmap = np.memmap(
+            self.path, dtype=self.dtype, mode="r+",
+            shape=(self._capacity,) + self.row_shape
+        )
+
+    def append(self, values: np.ndarray) -> None:
+        if self.dtype is None:
+            if values.dtype.kind not in "biufc":
+                raise TypeError(f"Cannot store values of type {values.dtype} "
+                                f"in a memory mapped file")
+            # Integers are promoted, so that later non integer values fit
+            self.dtype = np.promote_types(values.dtype, np.float64)
+            self.row_shape = values.shape[1:]
+            self._map()
+
+        if values.shape[1:] != self.row_shape:
+            raise ValueError(f"Cannot store values of shape "
+                             f"{values.shape[1:]} in {self.path}, which "
+                             f"holds values of shape {self.row_shape}")
+
+        values = values.astype(self.dtype, casting="same_kind", copy=False)
+        count = len(values)
+
+        if self.rows + count > self._capacity:
+            self._memmap.flush()
+            self._memmap = None
+            self._capacity = max(2 * self._capacity, self.rows + count)
+            self._map()
+
+        self._memmap[self.rows: self.rows + count] = values
+        self.rows += count
+
+    def close(self) -> None:
+        """
+        Flush the data to disk and cut off the unused capacity
+        """
+        if self._memmap is None:
+            return
+
+        self._memmap.flush()
+        self._memmap = None
+
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape))
+        with open(self.path, "ab") as fh:
+            fh.truncate(self.rows * row_bytes)
+
+    def description(self, directory: str) -> dict:
+        return {
+            "file": os.path.relpath(self.path, directory),
+            "dtype": None if self.dtype is None else self.dtype.str,
+            "shape": [self.rows] + list(self.row_shape or ())
+        }
+
+
+class NumpyStore:
+    """
+    A storage backend for `do_experiment` which writes every parameter into
+    a memory mapped binary file, as an alternative to a QCoDeS dataset. This
+    is much faster for large array valued results (e.g. traces acquired in a
+    hardsweep), since the data is not converted to blobs row by row.
+
+    The layout on disk follows the nests of the parameter table of the
+    sweep object: each nest (that is, each dependent parameter together with
+    the parameters it depends on) gets a sub directory with one file per
+    parameter. A JSON sidecar file, "params.json", holds the parameter specs
+    and the data type and shape of every file. Only 'numeric' and 'array'
+    parameters can be stored.
+
+    If the length of the sweep object is known in advance, the files are
+    preallocated accordingly. Otherwise they grow as needed. Unused space is
+    removed when the run is finished.
+
+    Example:
+        >>> result = do_experiment("exp/sample", sweep_object,
+        >>> ...                    storage=NumpyStore("/data/run_0001"))
+        >>> result["x,i"]
+
+    Stored results can be read back later with `NumpyStore(path).get_data()`.
+
+    Args:
+        directory: The directory to write to. It is created if it does not
+            exist.
+        capacity: The number of rows to preallocate per file if the length
+            of the sweep object is not known
+    """
+    def __init__(self, directory: str, capacity: int = 1024) -> None:
+        self._directory = directory
+        self._default_capacity = capacity
+
+        self._param_specs: List[dict] = None
+        self._nests: List[List[str]] = None
+        self._columns: List[Dict[str, _Column]] = None
+        self._experiment_name: str = None
+        # Maps the parameter names of incoming data to the nests which
+        # receive (part of) this data
+        self._routes: Dict[tuple, List[Tuple[int, List[int]]]] = {}
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def register_sweep(
+            self, sweep_object: BaseSweepObject,
+            experiment_name: str = None
+    ) -> None:
+
+        table = sweep_object.parameter_table
+        table.resolve_dependencies()
+
+        self._param_specs = [
+            {
+                "name": spec.name,
+                "paramtype": spec.type,
+                "label": spec.label,
+                "unit": spec.unit,
+                "depends_on": list(spec.depends_on_),
+                "inferred_from": list(spec.inferred_from_)
+            }
+            for spec in table.param_specs
+        ]
+
+        unsupported = [
+            spec["name"] for spec in self._param_specs
+            if spec["paramtype"] not in ("numeric", "array")
+        ]
+        if len(unsupported):
+            raise TypeError(f"Cannot store parameters {unsupported}; only "
+                            f"'numeric' and 'array' parameters are supported")
+
+        self._nests = table.nests
+        self._experiment_name = experiment_name
+
+        if sweep_object.shape is not None:
+            capacity = max(len(sweep_object), 1)
+        else:
+            capacity = self._default_capacity
+
+        self._columns = []
+        for count, nest in enumerate(self._nests):
+            layout_directory = os.path.join(self._directory, f"layout_{count}")
+            os.makedirs(layout_directory, exist_ok=True)
+
+            self._columns.append({
+                name: _Column(
+                    os.path.join(layout_directory, f"{name}.dat"), capacity
+                )
+                for name in nest
+            })
+
+        self._write_sidecar()
+
+    def __enter__(self) -> 'NumpyStore':
+        if self._columns is None:
+            raise RuntimeError("Please register a sweep object first")
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.close()
+
+    def _route(self, names: tuple) -> List[Tuple[int, List[int]]]:
+        route = self._routes.get(names)
+        if route is None:
+            route = self._routes[names] = [
+                (count, [names.index(name) for name in nest])
+                for count, nest in enumerate(self._nests)
+                if set(nest).issubset(names)
+            ]
+
+            if not len(route):
+                raise ValueError(f"Parameters {names} do not match any "
+                                 f"layout. Available layouts: {self._nests}")
+
+        return route
+
+    def add_columns(self, names: tuple, columns: List[np.ndarray]) -> None:
+        """
+        Store a block of rows. The first axis of each column runs over the
+        rows. This is used by `ResultWriter` when it flushes.
+        """
+        for count, indices in self._route(tuple(names)):
+            layout = self._columns[count]
+            for index in indices:
+                layout[names[index]].append(np.asarray(columns[index]))
+
+    def add_result(self, *res: Tuple[str, object]) -> None:
+        """
+        Store a single row, in the style of a QCoDeS data saver
+        """
+        names = tuple(name for name, _ in res)
+        self.add_columns(
+            names, [np.asarray(value)[np.newaxis] for _, value in res]
+        )
+
+    def close(self) -> None:
+        for layout in self._columns:
+            for column in layout.values():
+                column.close()
+
+        self._write_sidecar()
+
+    def _write_sidecar(self) -> None:
+        description = {
+            "experiment_name": self._experiment_name,
+            "param_specs": self._param_specs,
+            "layouts": [
+                {
+                    "parameters": nest,
+                    "columns": {
+                        name: column.description(self._directory)
+                        for name, column in layout.items()
+                    }
+                }
+                for nest, layout in zip(self._nests, self._columns)
+            ]
+        }
+
+        with open(os.path.join(self._directory, _SIDECAR), "w") as fh:
+            json.dump(description, fh, indent=2)
+
+    def _read_sidecar(self) -> dict:
+        with open(os.path.join(self._directory, _SIDECAR), "r") as fh:
+            return json.load(fh)
+
+    @property
+    def layouts(self) -> List[List[str]]:
+        """
+        The parameter names of every stored layout
+        """
+        return [
+            layout["parameters"] for layout in self._read_sidecar()["layouts"]
+        ]
+
+    def get_layout_data(self, index: int) -> Dict[str, np.ndarray]:
+        """
+        Read back the data of a single layout, as read-only memory maps
+        """
+        layout = self._read_sidecar()["layouts"][index]
+        return {
+            name: self._load_column(layout["columns"][name])
+            for name in layout["parameters"]
+        }
+
+    def _load_column(self, column: dict) -> np.ndarray:
+        if column["dtype"] is None or not column["shape"][0]:
+            return np.empty(0)
+
+        return np.memmap(
+            os.path.join(self._directory, column["file"]),
+            dtype=np.dtype(column["dtype"]), mode="r",
+            shape=tuple(column["shape"])
+        )
+
+    def get_data(self) -> List[List[dict]]:
+        """
+        Read back the stored data in the same format as
+        `qcodes.dataset.data_export.get_data_by_id`: a list with, for every
+        layout, a list of dictionaries with the name, label, unit and data
+        of each parameter. The data arrays are read-only memory maps.
+        """
+        description = self._read_sidecar()
+        specs = {spec["name"]: spec for spec in description["param_specs"]}
+
+        all_data = []
+        for layout in description["layouts"]:
+            layout_data = []
+            for name in layout["parameters"]:
+                layout_data.append({
+                    "name": name,
+                    "label": specs[name]["label"],
+                    "unit": specs[name]["unit"],
+                    "data": self._load_column(layout["columns"][name])
+                })
+
+            all_data.append(layout_data)
+
+        return all_data
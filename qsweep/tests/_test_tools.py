@@ -5,3 +5,18 @@ class Factory(dict):
 
     def __missing__(self, name):
         return self._factory(name)
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module in timing tests: the time only advances
+    when sleeping
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
@@ -1,4 +1,8 @@
+import gc
+
+import pytest
 from qcodes import Parameter
+from qsweep import decorators
 from qsweep.decorators import (
     getter, setter, parameter_getter, parameter_setter
 )
@@ -115,3 +119,140 @@ def test_param_setter_with_paramtype():
     assert param_spec.name == "p"
     assert param_spec.unit == "P"
     assert param_spec.type == "array"
+
+
+def test_setter_skip_unchanged():
+    calls = []
+
+    strr = setter(("a", "A"), skip_unchanged=True, tolerance=0.01)(
+        calls.append
+    )
+
+    assert strr(0) == {"a": 0}
+    assert strr(0.005) == {"a": 0.005}
+    assert strr(1) == {"a": 1}
+    assert calls == [0, 1]
+
+    strr.invalidate_cache()
+    strr(1)
+    assert calls == [0, 1, 1]
+
+
+def test_setter_failure_invalidates_cache():
+    calls = []
+
+    def set_function(value):
+        calls.append(value)
+        if len(calls) == 2:
+            raise RuntimeError("instrument went away")
+
+    strr = setter(("a", "A"), skip_unchanged=True)(set_function)
+    strr(0)
+    with pytest.raises(RuntimeError):
+        strr(1)
+
+    strr(1)
+    assert calls == [0, 1, 1]
+
+
+def test_param_setter_skip_unchanged():
+    set_values = []
+
+    p = Parameter("p", unit="P", get_cmd=None, set_cmd=set_values.append)
+    # Setters of the same parameter share the last set value
+    first = parameter_setter(p, skip_unchanged=True)
+    second = parameter_setter(p, skip_unchanged=True)
+
+    first(0)
+    second(0)
+    second(1)
+    first(1)
+    assert set_values == [0, 1]
+
+    first.invalidate_cache()
+    second(1)
+    assert set_values == [0, 1, 1]
+
+    # Without skip_unchanged, every value is set
+    parameter_setter(p)(1)
+    assert set_values == [0, 1, 1, 1]
+
+
+def test_param_setter_cache_follows_other_writes():
+    set_values = []
+    uploads = []
+
+    p = Parameter("p", unit="P", get_cmd=None, set_cmd=set_values.append)
+    skipping = parameter_setter(p, skip_unchanged=True)
+    plain = parameter_setter(p)
+    buffered = parameter_setter(p, buffered=uploads.append)
+
+    skipping(0)
+    # Setters which do not skip still update the last set value
+    plain(1)
+    skipping(0)
+    assert set_values == [0, 1, 0]
+
+    # As do buffered uploads
+    buffered.buffered([1, 2])
+    skipping(0)
+    assert set_values == [0, 1, 0, 0]
+
+    # And setting the parameter directly
+    p.set(3)
+    skipping(0)
+    assert set_values == [0, 1, 0, 0, 3, 0]
+
+    skipping(0)
+    assert set_values == [0, 1, 0, 0, 3, 0]
+
+
+def test_param_setter_without_skipping_keeps_no_cache():
+    set_values = []
+    p = Parameter("p", unit="P", get_cmd=None, set_cmd=set_values.append)
+    plain = parameter_setter(p)
+
+    plain(0)
+    assert p not in decorators._parameter_caches
+
+    # A skipping setter made later still sees the writes of the plain setter
+    skipping = parameter_setter(p, skip_unchanged=True)
+    skipping(0)
+    plain(1)
+    skipping(0)
+    assert set_values == [0, 0, 1, 0]
+
+
+def test_param_setter_cache_survives_reads():
+    set_values = []
+    p = Parameter("p", unit="P", get_cmd=None, set_cmd=set_values.append)
+    skipping = parameter_setter(p, skip_unchanged=True)
+
+    skipping(0)
+    p.get()
+    skipping(0)
+    assert set_values == [0]
+
+    # Reading another value than the last set value does count as a change
+    p.cache.set(2)
+    skipping(0)
+    assert set_values == [0, 0]
+
+
+def test_param_setter_caches_are_collected():
+    # Parameters of other tests may still be waiting to be collected
+    gc.collect()
+    n_caches = len(decorators._parameter_caches)
+
+    parameters = [
+        Parameter(f"p{count}", get_cmd=None, set_cmd=None)
+        for count in range(3)
+    ]
+    setters = [
+        parameter_setter(p, skip_unchanged=True) for p in parameters
+    ]
+    assert len(decorators._parameter_caches) == n_caches + 3
+
+    del parameters, setters
+    gc.collect()
+    assert len(decorators._parameter_caches) == n_caches
@@ -18,6 +18,8 @@ def test_hardsweep():
 
     assert isinstance(hardsweep_sweep_object, IteratorSweep)
     assert True == hardsweep_sweep_object.measurable
+    # Array parameters are yielded in one go
+    assert hardsweep_sweep_object.shape == ()
 
     table = hardsweep_sweep_object.parameter_table
     assert table.nests == [["time", "space", "magn"]]
@@ -251,3 +253,62 @@ def test_hardsweep_with_2_ind_numeric_and_2_dep_numeric():
                        for t_val, s_val, m_val, p_val
                        in zip(time_vals, space_vals, magn_vals, phas_vals)]
     assert expected_output == sweep_output
+
+
+def test_hardsweep_n_points():
+
+    @hardsweep(ind=[("time", "us")], dep=[("magn", "V")], n_points=7)
+    def measure_with_alazar():
+        return numpy.arange(7), numpy.arange(7)
+
+    @hardsweep(ind=[("time", "us")], dep=[("magn", "V")])
+    def measure_unknown():
+        return numpy.arange(7), numpy.arange(7)
+
+    assert len(measure_with_alazar()) == 7
+    assert measure_unknown().shape is None
+
+
+def test_hardsweep_blocks_are_views():
+
+    @setter(('repetition', '#', 'numeric'))
+    def repetition_param(repetition):
+        pass
+
+    n_pts = 7
+    time_vals = numpy.random.rand(n_pts)
+    magn_vals = numpy.random.rand(n_pts)
+
+    @hardsweep(ind=[("time", "us")], dep=[("magn", "V")])
+    def measure_with_alazar():
+        return time_vals, magn_vals
+
+    blocks = list(measure_with_alazar().iter_blocks(4))
+
+    assert [len(block["time"]) for block in blocks] == [4, 3]
+    for block in blocks:
+        assert numpy.shares_memory(block["time"], time_vals)
+        assert numpy.shares_memory(block["magn"], magn_vals)
+
+    so = sweep(repetition_param, [1, 2])(measure_with_alazar())
+    blocks = list(so.iter_blocks(100))
+    rows = [
+        dict(zip(block.keys(), values))
+        for block in blocks for values in zip(*block.values())
+    ]
+    assert rows == list(so)
+
+
+def test_hardsweep_array_blocks_are_views():
+
+    time_vals = numpy.random.rand(5)
+    magn_vals = numpy.random.rand(5)
+
+    @hardsweep(ind=[("time", "us", "array")], dep=[("magn", "V", "array")])
+    def measure_with_alazar():
+        return time_vals, magn_vals
+
+    block, = list(measure_with_alazar().iter_blocks(100))
+    assert block["time"].shape == (1, 5)
+    assert numpy.shares_memory(block["time"], time_vals)
+    assert numpy.all(block["magn"][0] == magn_vals)
@@ -0,0 +1,128 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from qsweep.adaptive import uniform_loss
+from qsweep.convenience import adaptive_sweep, sweep, measure, chain
+from qsweep.decorators import getter, setter
+
+
+@pytest.fixture()
+def instruments():
+    state = {"x": 0, "y": 0}
+    calls = []
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        state["x"] = value
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        state["y"] = value
+
+    @getter(("i", "A"))
+    def i_getter():
+        calls.append(state["x"])
+        # A sharp step at x = 0.3
+        return np.tanh((state["x"] - 0.3) / 0.01) + state["y"]
+
+    @getter(("j", "A"))
+    def j_getter():
+        return state["x"]
+
+    return x_setter, y_setter, i_getter, j_getter, calls
+
+
+def test_refines_around_features(instruments):
+    x_setter, y_setter, i_getter, j_getter, calls = instruments
+
+    so = adaptive_sweep(x_setter, measure(i_getter), -1, 1, n_points=40)
+    assert so.parameter_table.nests == [["x", "i"]]
+
+    result = list(so)
+    x = np.array([data["x"] for data in result])
+
+    assert len(result) == 40
+    assert calls == list(x)
+    assert x[0] == -1 and x[1] == 1
+    # Most points end up close to the step
+    assert np.sum(np.abs(x - 0.3) < 0.1) > 20
+
+    uniform = adaptive_sweep(x_setter, measure(i_getter), -1, 1, n_points=9,
+                             loss=uniform_loss)
+    assert np.allclose(sorted(data["x"] for data in uniform),
+                       np.linspace(-1, 1, 9))
+
+
+def test_stop_criteria(instruments):
+    x_setter, y_setter, i_getter, j_getter, calls = instruments
+
+    so = adaptive_sweep(x_setter, measure(j_getter), 0, 1, loss_goal=0.1)
+    # A straight line is refined up to the loss goal and no further
+    assert len(list(so)) == 17
+
+    so = adaptive_sweep(x_setter, measure(j_getter), 0, 1, min_step=0.1)
+    x = sorted(data["x"] for data in so)
+    assert np.min(np.diff(x)) >= 0.1
+
+    with pytest.raises(ValueError):
+        adaptive_sweep(x_setter, measure(j_getter), 0, 1)
+
+    with pytest.raises(TypeError):
+        adaptive_sweep(x_setter, sweep(y_setter, [0, 1]), 0, 1, n_points=5)
+
+    with pytest.raises(ValueError):
+        adaptive_sweep(x_setter, measure(j_getter), 0, 1, n_points=5,
+                       target="k")
+
+
+def test_nest_and_chain(instruments):
+    x_setter, y_setter, i_getter, j_getter, calls = instruments
+
+    so = sweep(y_setter, [0, 10])(
+        adaptive_sweep(
+            x_setter, chain(measure(j_getter), measure(i_getter)), -1, 1,
+            n_points=10, target="i"
+        )
+    )
+
+    assert so.parameter_table.nests == [["y", "x", "j"], ["y", "x", "i"]]
+
+    result = list(so)
+    assert len(result) == 2 * 10 * 2
+    assert [data["y"] for data in result] == 20 * [0] + 20 * [10]
+    # The refinement starts anew for each line
+    assert [data["x"] for data in result[:20]] == \
+        [data["x"] for data in result[20:]]
+
+
+def test_async_iteration():
+    state = {"x": 0}
+
+    @setter(("x", "V"))
+    async def x_setter(value):
+        await asyncio.sleep(0)
+        state["x"] = value
+
+    @getter(("i", "A"))
+    async def i_getter():
+        await asyncio.sleep(0)
+        return np.tanh((state["x"] - 0.3) / 0.01)
+
+    def make_sweep_object():
+        return adaptive_sweep(x_setter, measure(i_getter), -1, 1,
+                              n_points=20)
+
+    async def collect():
+        # The getter and setter are awaited on the running loop
+        return [value async for value in make_sweep_object()]
+
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(collect())
+    finally:
+        loop.close()
+
+    assert result == list(make_sweep_object())
+    assert len(result) == 20
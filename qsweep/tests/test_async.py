@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from qsweep.convenience import sweep, measure, szip, parallel, nest
+from qsweep.decorators import getter, setter
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def alist(sweep_object):
+    return [value async for value in sweep_object]
+
+
+def make_instruments(delay=0):
+    state = {}
+
+    @setter(("x", "V"))
+    async def x_setter(value):
+        await asyncio.sleep(delay)
+        state["x"] = value
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        state["y"] = value
+
+    @getter(("i", "A"))
+    async def i_getter():
+        await asyncio.sleep(delay)
+        return state["x"] ** 2
+
+    @getter(("j", "A"))
+    async def j_getter():
+        await asyncio.sleep(delay)
+        return state["x"] + state.get("y", 0)
+
+    return x_setter, y_setter, i_getter, j_getter
+
+
+def test_async_decorators():
+    x_setter, y_setter, i_getter, j_getter = make_instruments()
+
+    assert x_setter.is_async
+    assert not y_setter.is_async
+
+    # Asynchronous functions can still be called synchronously
+    assert x_setter(3) == {"x": 3}
+    assert i_getter() == {"i": 9}
+    assert run(i_getter.acall()) == {"i": 9}
+
+
+def test_async_iteration_matches_sync():
+    x_setter, y_setter, i_getter, j_getter = make_instruments()
+
+    def make_sweep_object():
+        return sweep(x_setter, [0, 1, 2])(
+            measure(i_getter),
+            sweep(y_setter, [3, 4])(measure(j_getter)),
+            szip(sweep(y_setter, [5, 6]), measure(j_getter))
+        )
+
+    expected = list(make_sweep_object())
+    assert run(alist(make_sweep_object())) == expected
+
+
+def test_async_parallel():
+    delay = 0.1
+    x_setter, y_setter, i_getter, j_getter = make_instruments(delay)
+
+    sweep_values = [0, 1, 2]
+    sweep_object = sweep(x_setter, sweep_values)(
+        parallel(measure(i_getter), measure(j_getter))
+    )
+
+    t0 = time.perf_counter()
+    result = run(alist(sweep_object))
+    duration = time.perf_counter() - t0
+
+    assert result == [
+        row for x in sweep_values for row in [{"x": x, "i": x ** 2},
+                                              {"x": x, "j": x}]
+    ]
+    # One delay for setting, one for the concurrent measurements
+    assert duration < len(sweep_values) * 3 * delay
+
+
+def test_sync_call_inside_running_loop():
+    x_setter, y_setter, i_getter, j_getter = make_instruments()
+
+    async def main():
+        # E.g. in a notebook, or a sweep object without an asynchronous
+        # implementation run by `async_do_experiment`
+        x_setter(2)
+        return i_getter()
+
+    assert run(main()) == {"i": 4}
+    # Also when a loop is still running in this thread afterwards
+    assert run(main()) == {"i": 4}
+
+
+def test_async_parallel_unordered():
+    delay = 0.05
+    x_setter, y_setter, i_getter, j_getter = make_instruments()
+
+    @getter(("k", "A"))
+    async def slow_getter():
+        await asyncio.sleep(delay)
+        return 1
+
+    @getter(("l", "A"))
+    async def fast_getter():
+        return 2
+
+    sweep_object = parallel(
+        measure(slow_getter), measure(fast_getter), ordered=False
+    )
+
+    # The fast measurement does not wait for the slow one
+    assert run(alist(sweep_object)) == [{"l": 2}, {"k": 1}]
+
+
+def test_async_snake():
+    x_setter, y_setter, i_getter, j_getter = make_instruments()
+
+    so = nest(
+        sweep(x_setter, [0, 1]),
+        sweep(y_setter, [0, 1, 2]),
+        measure(j_getter),
+        order="snake"
+    )
+
+    assert run(alist(so)) == list(so)
+    assert [(row["x"], row["y"]) for row in so] == [
+        (0, 0), (0, 1), (0, 2), (1, 2), (1, 1), (1, 0)
+    ]
@@ -1,8 +1,10 @@
 import itertools
+import threading
+import time
 import pytest
 
 from qcodes import Parameter, ParamSpec
-from qsweep.base import Sweep, Measure, Nest, Chain
+from qsweep.base import Sweep, Measure, Nest, Chain, Zip, Parallel
 from qsweep.param_table import ParamTable
 
 from ._test_tools import Factory
@@ -287,3 +289,400 @@ def test_post_call(indep_params):
 
     assert list(parameter_sweep) == [{"x": value} for value in sweep_values]
     assert post_call.call_count == len(sweep_values)
+
+
+def _unravel_blocks(blocks):
+    """
+    Turn blocks produced by `iter_blocks` back into a list of dictionaries
+    """
+    rows = []
+    for block in blocks:
+        names = list(block.keys())
+        for values in zip(*block.values()):
+            rows.append(dict(zip(names, values)))
+    return rows
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 100])
+def test_iter_blocks_nest_chain(indep_params, dep_params, block_size):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pz, z, tablez = indep_params["z"]
+
+    pi, i, tablei = dep_params["i"]
+    pj, j, tablej = dep_params["j"]
+
+    pi.get = lambda: px() ** 2
+    pj.get = lambda: px() ** 2 + py() ** 2 + pz()
+
+    def make_sweep_object():
+        return Nest(
+            Sweep(x, tablex, lambda: [0, 1, 2]),
+            Chain(
+                Measure(i, tablei),
+                Nest(
+                    Zip(
+                        Sweep(y, tabley, lambda: [4, 5, 6]),
+                        Sweep(z, tablez, lambda: [7, 8, 9])
+                    ),
+                    Measure(j, tablej)
+                )
+            )
+        )
+
+    expected = list(make_sweep_object())
+    blocks = list(make_sweep_object().iter_blocks(block_size))
+
+    assert all(
+        len(column) <= block_size
+        for block in blocks for column in block.values()
+    )
+    assert _unravel_blocks(blocks) == expected
+
+
+def test_iter_blocks_nest_measure(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pi, i, tablei = dep_params["i"]
+
+    pi.get = lambda: px() ** 2
+
+    so = Nest(Sweep(x, tablex, lambda: range(5)), Measure(i, tablei))
+    blocks = list(so.iter_blocks(100))
+    assert [len(block["x"]) for block in blocks] == [5]
+    assert list(blocks[0]["i"]) == [x ** 2 for x in range(5)]
+
+    # Blocks of consecutive outer steps are merged
+    so = Nest(
+        Sweep(y, tabley, lambda: range(4)),
+        Sweep(x, tablex, lambda: range(3)),
+        Measure(i, tablei)
+    )
+    blocks = list(so.iter_blocks(5))
+    assert [len(block["x"]) for block in blocks] == [5, 5, 2]
+    assert _unravel_blocks(blocks) == list(so)
+
+
+def test_iter_blocks_post_call(indep_params):
+    calls = []
+
+    px, x, table = indep_params["x"]
+    parameter_sweep = Sweep(x, table, lambda: [0, 1, 2])
+    parameter_sweep.add_post_step(lambda: calls.append(px()))
+
+    blocks = list(parameter_sweep.iter_blocks(2))
+    assert [list(block["x"]) for block in blocks] == [[0, 1], [2]]
+    assert calls == [0, 1, 2]
+
+
+@pytest.mark.parametrize("combine", [Nest, Chain, Zip])
+def test_iter_blocks_post_call_order(combine):
+    """
+    Post steps of nests, chains and zips run between the points, like they
+    do when iterating normally
+    """
+    calls = []
+
+    def setter(value):
+        calls.append(f"set{value}")
+        return {"x": value}
+
+    def getter():
+        calls.append("get")
+        return {"y": 0}
+
+    def make_sweep_object():
+        so = combine(
+            Sweep(setter, ParamTable([ParamSpec("x", "numeric")]),
+                  lambda: [0, 1, 2]),
+            Measure(getter, ParamTable([ParamSpec("y", "numeric")]))
+        )
+        so.add_post_step(lambda: calls.append("post"))
+        return so
+
+    rows = list(make_sweep_object())
+    expected_calls = list(calls)
+    calls.clear()
+
+    blocks = list(make_sweep_object().iter_blocks(10))
+    assert _unravel_blocks(blocks) == rows
+    assert calls == expected_calls
+
+
+def test_parallel(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+
+    delay = 0.2
+    pools = set()
+
+    def get_function():
+        # Threads are named after the thread pool they belong to
+        pools.add(threading.current_thread().name.rsplit("_", 1)[0])
+        time.sleep(delay)
+        return px()
+
+    getters = []
+    for name in ["i", "j", "k"]:
+        p, get, table = dep_params[name]
+        p.get = get_function
+        getters.append(Measure(get, table))
+
+    sweep_values = [0, 1]
+    sweep_object = Nest(
+        Sweep(x, tablex, lambda: sweep_values),
+        Parallel(*getters)
+    )
+
+    assert sweep_object.parameter_table.nests == [
+        ["x", "i"], ["x", "j"], ["x", "k"]
+    ]
+
+    n_threads = threading.active_count()
+    t0 = time.perf_counter()
+    result = list(sweep_object)
+    duration = time.perf_counter() - t0
+
+    assert result == [
+        {"x": xval, name: xval}
+        for xval in sweep_values for name in ["i", "j", "k"]
+    ]
+    assert duration < len(sweep_values) * 2 * delay
+    # The threads are kept from one outer step to the next, and shut down
+    # when the nest has finished
+    assert len(pools) == 1
+    assert threading.active_count() == n_threads
+
+
+def test_parallel_only_measurable(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+    pi, i, tablei = dep_params["i"]
+
+    with pytest.raises(TypeError):
+        Parallel(Sweep(x, tablex, lambda: []), Measure(i, tablei))
+
+
+def test_parallel_unordered(indep_params, dep_params):
+    sweep_values = [0, 1, 2, 3]
+    # The y branch sets each value before the x branch does. As a branch
+    # passes on a row before setting its next value, the x branch cannot
+    # produce a row before the y branch has produced the row preceding it
+    y_set = {value: threading.Event() for value in sweep_values}
+
+    def branch(set_name, get_name):
+        p, set_function, table = indep_params[set_name]
+        pi, get_function, tablei = dep_params[get_name]
+        pi.get = p.get
+
+        def ordered_set(value):
+            if set_name == "y":
+                y_set[value].set()
+            else:
+                # The branches would deadlock if they did not run
+                # concurrently
+                assert y_set[value].wait(timeout=10)
+            return set_function(value)
+
+        return Nest(
+            Sweep(ordered_set, table, lambda: sweep_values),
+            Measure(get_function, tablei)
+        )
+
+    sweep_object = Parallel(
+        branch("x", "i"), branch("y", "j"), ordered=False
+    )
+
+    assert sweep_object.parameter_table.nests == [["x", "i"], ["y", "j"]]
+
+    result = list(sweep_object)
+
+    # Each branch is in order, but the branches are interleaved
+    assert [r for r in result if "x" in r] == \
+        [{"x": value, "i": value} for value in sweep_values]
+    assert [r for r in result if "y" in r] == \
+        [{"y": value, "j": value} for value in sweep_values]
+    for value in sweep_values[1:]:
+        assert result.index({"y": value - 1, "j": value - 1}) < \
+            result.index({"x": value, "i": value})
+
+
+def test_parallel_unordered_error(indep_params, dep_params):
+    pi, i, tablei = dep_params["i"]
+    pj, j, tablej = dep_params["j"]
+
+    def broken():
+        raise RuntimeError("instrument went away")
+
+    sweep_object = Parallel(
+        Measure(i, tablei), Measure(broken, tablej), ordered=False
+    )
+
+    with pytest.raises(RuntimeError):
+        list(sweep_object)
+
+
+@pytest.mark.parametrize("static_points", [True, False])
+def test_static_points(indep_params, dep_params, static_points,
+                       monkeypatch):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pi, i, tablei = dep_params["i"]
+
+    pi.get = lambda: px() + py()
+    point_function_calls = []
+
+    def y_points():
+        point_function_calls.append(None)
+        return [4, 5, 6]
+
+    y_set_values = []
+
+    def y_setter(value):
+        y_set_values.append(value)
+        return y(value)
+
+    sweep_values_x = [0, 1, 2]
+    y_sweep = Sweep(y_setter, tabley, y_points, static_points=static_points)
+    y_post_steps = []
+    y_sweep.add_post_step(lambda: y_post_steps.append(py()))
+
+    factory_calls = []
+    generator_factory = Sweep._generator_factory
+
+    def counting_factory(self):
+        if self is y_sweep:
+            factory_calls.append(None)
+        return generator_factory(self)
+
+    monkeypatch.setattr(Sweep, "_generator_factory", counting_factory)
+
+    sweep_object = Nest(
+        Sweep(x, tablex, lambda: sweep_values_x),
+        Chain(y_sweep),
+        Measure(i, tablei)
+    )
+
+    for _ in range(2):
+        assert list(sweep_object) == [
+            {"x": xval, "y": yval, "i": xval + yval}
+            for xval, yval in itertools.product(sweep_values_x, [4, 5, 6])
+        ]
+
+    expected_calls = 1 if static_points else 2 * len(sweep_values_x)
+    assert len(point_function_calls) == expected_calls
+    # The set and post step calls are repeated at every outer step, but
+    # with static set points the inner sweep is not restarted
+    assert y_set_values == [4, 5, 6] * 2 * len(sweep_values_x)
+    assert y_post_steps == [4, 5, 6] * 2 * len(sweep_values_x)
+    expected_calls = 0 if static_points else 2 * len(sweep_values_x)
+    assert len(factory_calls) == expected_calls
+
+
+def test_shape(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pz, z, tablez = indep_params["z"]
+    pi, i, tablei = dep_params["i"]
+    pj, j, tablej = dep_params["j"]
+
+    def static_sweep(setter, table, points):
+        return Sweep(setter, table, lambda: points, static_points=True)
+
+    sweep_object = Nest(
+        static_sweep(x, tablex, [0, 1, 2]),
+        Chain(
+            Measure(i, tablei),
+            Nest(
+                Zip(
+                    static_sweep(y, tabley, [4, 5, 6, 7]),
+                    static_sweep(z, tablez, [7, 8, 9])
+                ),
+                Measure(j, tablej)
+            )
+        )
+    )
+
+    assert sweep_object.shape == (3, 4)
+    assert len(sweep_object) == 12
+    assert len(list(sweep_object)) == 12
+
+    unknown = Nest(
+        Sweep(x, tablex, lambda: [0, 1, 2]),
+        Measure(i, tablei)
+    )
+    assert unknown.shape is None
+    assert bool(unknown)
+    with pytest.raises(TypeError):
+        len(unknown)
+
+
+def test_snake_order(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pi, i, tablei = dep_params["i"]
+
+    pi.get = lambda: px() * 10 + py()
+    set_calls = []
+
+    def y_setter(value):
+        set_calls.append(value)
+        return y(value)
+
+    def make_sweep_object(order):
+        return Nest(
+            Sweep(x, tablex, lambda: [0, 1, 2], static_points=True),
+            Sweep(y_setter, tabley, lambda: [4, 5, 6], static_points=True),
+            Measure(i, tablei),
+            order=order
+        )
+
+    snake = make_sweep_object("snake")
+    assert list(snake) == [
+        {"i": xval * 10 + yval, "y": yval, "x": xval}
+        for xval, yvals in [(0, [4, 5, 6]), (1, [6, 5, 4]), (2, [4, 5, 6])]
+        for yval in yvals
+    ]
+    # The inner sweep is not set again when the outer sweep steps
+    assert set_calls == [4, 5, 6, 5, 4, 5, 6]
+
+    raster = make_sweep_object("raster")
+    assert snake.shape == raster.shape == (3, 3)
+    assert snake.parameter_table.nests == raster.parameter_table.nests
+
+    blocks = list(make_sweep_object("snake").iter_blocks(2))
+    assert _unravel_blocks(blocks) == list(make_sweep_object("snake"))
+
+
+def test_hilbert_order(indep_params):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+
+    so = Nest(
+        Sweep(x, tablex, lambda: range(5), static_points=True),
+        Sweep(y, tabley, lambda: range(6), static_points=True),
+        order="hilbert"
+    )
+
+    points = [(row["x"], row["y"]) for row in so]
+    assert sorted(points) == list(itertools.product(range(5), range(6)))
+    assert all(
+        abs(x1 - x2) + abs(y1 - y2) == 1
+        for (x1, y1), (x2, y2) in zip(points, points[1:])
+    )
+
+
+def test_order_needs_static_sweeps(indep_params, dep_params):
+    px, x, tablex = indep_params["x"]
+    py, y, tabley = indep_params["y"]
+    pi, i, tablei = dep_params["i"]
+
+    with pytest.raises(ValueError):
+        Nest(Sweep(x, tablex, lambda: [0]), Measure(i, tablei),
+             order="spiral")
+
+    with pytest.raises(TypeError):
+        Nest(
+            Sweep(x, tablex, lambda: [0, 1], static_points=True),
+            Sweep(y, tabley, lambda: [0, 1]),
+            Measure(i, tablei),
+            order="snake"
+        )
@@ -0,0 +1,210 @@
+import json
+
+import numpy as np
+import pytest
+
+try:
+    from qcodes.dataset.sqlite.database import (
+        initialise_or_create_database_at
+    )
+except ImportError:
+    # Older versions of QCoDeS
+    from qcodes.dataset.database import initialise_or_create_database_at
+
+from qcodes.dataset.data_set import load_by_id
+from qcodes.dataset.measurements import DataSaver
+
+from qsweep import qcodes_compat
+from qsweep.convenience import sweep, measure, nest, parallel
+from qsweep.decorators import getter, setter
+from qsweep.do_experiment import do_experiment, resume
+from qsweep.setpoints import Random
+
+
+@pytest.fixture()
+def database(tmp_path):
+    initialise_or_create_database_at(str(tmp_path / "experiments.db"))
+
+
+def make_sweep_object(log, fail_at=None, x_points=range(4)):
+    state = {}
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        log.append(("x", value))
+        state["x"] = value
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        log.append(("y", value))
+        state["y"] = value
+
+    @getter(("i", "A"))
+    def i_getter():
+        if (state["x"], state["y"]) == fail_at:
+            raise RuntimeError("instrument went away")
+        return state["x"] * 10 + state["y"]
+
+    return nest(sweep(x_setter, x_points), sweep(y_setter, range(3)),
+                measure(i_getter))
+
+
+def test_resume(database, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+
+    log = []
+    with pytest.raises(RuntimeError):
+        do_experiment("exp/sample", make_sweep_object(log, fail_at=(2, 1)),
+                      checkpoint=path)
+
+    with open(path) as fh:
+        state = json.load(fh)
+    assert state["rows"] == 7
+    assert not state["finished"]
+
+    log = []
+    result = resume(path, make_sweep_object(log))
+
+    # The sweeps are set to where the run stopped, and continue from there
+    assert log[:2] == [("x", 2), ("y", 0)]
+    assert log[2:] == [("y", 1), ("y", 2), ("x", 3), ("y", 0), ("y", 1),
+                       ("y", 2)]
+
+    data = result["x,y,i"]
+    assert data["x"].tolist() == [x for x in range(4) for _ in range(3)]
+    assert data["i"].tolist() == [
+        x * 10 + y for x in range(4) for y in range(3)
+    ]
+
+    with open(path) as fh:
+        assert json.load(fh)["finished"]
+
+    with pytest.raises(ValueError):
+        resume(path, make_sweep_object([]))
+
+
+def test_checkpoint_of_other_sweep_object(database, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+
+    with pytest.raises(RuntimeError):
+        do_experiment("exp/sample", make_sweep_object([], fail_at=(0, 1)),
+                      checkpoint=path)
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    with pytest.raises(ValueError):
+        resume(path, sweep(x_setter, range(4)))
+
+
+def test_checkpoint_of_other_set_points(database, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+
+    with pytest.raises(RuntimeError):
+        do_experiment("exp/sample", make_sweep_object([], fail_at=(0, 1)),
+                      checkpoint=path)
+
+    # The same number of set points, but other values
+    with pytest.raises(ValueError):
+        resume(path, make_sweep_object([], x_points=[0, 1, 2, 4]))
+
+    # Random set points without a seed differ between sessions
+    x_points = Random(0, 1, 4)
+    with pytest.raises(RuntimeError):
+        do_experiment(
+            "exp/sample",
+            make_sweep_object([], fail_at=(x_points[0], 1),
+                              x_points=x_points),
+            checkpoint=path
+        )
+
+    with pytest.raises(ValueError):
+        resume(path, make_sweep_object([], x_points=Random(0, 1, 4)))
+
+
+def test_flush_fails_partway(database, tmp_path, monkeypatch):
+    path = str(tmp_path / "checkpoint.json")
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    @getter(("i", "A"))
+    def i_getter():
+        return 1
+
+    @getter(("j", "A"))
+    def j_getter():
+        return 2
+
+    def make_chain():
+        # The layouts alternate, so that rows of both are in every flush
+        return sweep(x_setter, range(8))(measure(i_getter), measure(j_getter))
+
+    add_result = DataSaver.add_result
+    calls = []
+
+    def fail_on_seventh_call(self, *results):
+        calls.append(results)
+        if len(calls) == 7:
+            raise RuntimeError("disk full")
+        add_result(self, *results)
+
+    monkeypatch.setattr(DataSaver, "add_result", fail_on_seventh_call)
+    with pytest.raises(RuntimeError):
+        do_experiment("exp/sample", make_chain(), flush_rows=4,
+                      checkpoint=path)
+    monkeypatch.undo()
+
+    # The rows of the failed flush reached the database, but not the
+    # checkpoint
+    with open(path) as fh:
+        assert json.load(fh)["rows"] == 4
+
+    result = resume(path, make_chain())
+    assert result["x,i"]["x"].tolist() == list(range(8))
+    assert result["x,j"]["x"].tolist() == list(range(8))
+    assert result["x,i"]["i"].tolist() == [1] * 8
+
+
+def test_sweep_object_which_cannot_be_compiled(database, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+
+    @getter(("i", "A"))
+    def i_getter():
+        return 1
+
+    @getter(("j", "A"))
+    def j_getter():
+        return 2
+
+    with pytest.raises(ValueError):
+        do_experiment("exp/sample", parallel(measure(i_getter),
+                                             measure(j_getter)),
+                      checkpoint=path)
+
+
+def test_finished_run(database, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    result = do_experiment("exp/sample", make_sweep_object([]),
+                           checkpoint=path)
+
+    assert np.array_equal(result["x,y,i"]["i"], [
+        x * 10 + y for x in range(4) for y in range(3)
+    ])
+
+    with open(path) as fh:
+        state = json.load(fh)
+    assert state["finished"]
+    assert state["rows"] == 12
+
+
+def test_unsupported_qcodes(database, tmp_path, monkeypatch):
+    result = do_experiment("exp/sample", make_sweep_object([]))
+    dataset = load_by_id(result.run_id)
+
+    # Like a version of QCoDeS whose internals are not known
+    monkeypatch.setattr(qcodes_compat, "atomic_transaction", None)
+    with pytest.raises(RuntimeError, match="version"):
+        qcodes_compat.mark_incomplete(dataset)
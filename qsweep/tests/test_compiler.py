@@ -0,0 +1,143 @@
+import pytest
+
+from qcodes import ParamSpec
+
+from qsweep.base import Sweep, Measure, Nest, Chain, Zip, IteratorSweep
+from qsweep.compiler import compile_sweep
+from qsweep.param_table import ParamTable
+from qsweep.setpoints import Linspace, Random
+
+
+class Instruments:
+    """
+    Fake instruments which log every set, get and post step call
+    """
+    def __init__(self):
+        self.log = []
+        self.values = {}
+
+    def sweep(self, name, points):
+        def setter(value):
+            self.log.append(("set", name, value))
+            self.values[name] = value
+            return {name: value}
+
+        so = Sweep(setter, ParamTable([ParamSpec(name, "numeric")]),
+                   lambda: points, static_points=True)
+        so.add_post_step(lambda: self.log.append(("post", name)))
+        return so
+
+    def measure(self, name):
+        def getter():
+            self.log.append(("get", name))
+            return {name: sum(self.values.values())}
+
+        return Measure(getter, ParamTable([ParamSpec(name, "numeric")]))
+
+    def post_step(self, sweep_object, name):
+        sweep_object.add_post_step(lambda: self.log.append(("post", name)))
+        return sweep_object
+
+
+def _sweep_objects(instruments):
+    inst = instruments
+    return {
+        "sweep": inst.sweep("x", [0, 1, 2]),
+        "nest_3d": Nest(
+            inst.sweep("x", [0, 1]),
+            inst.sweep("y", [2, 3]),
+            inst.sweep("z", [4, 5]),
+            inst.measure("i")
+        ),
+        "interleave": inst.post_step(Nest(
+            inst.sweep("x", [0, 1, 2]),
+            inst.post_step(Chain(
+                inst.measure("i"),
+                Nest(
+                    inst.sweep("y", [4, 5]),
+                    inst.measure("j")
+                )
+            ), "chain")
+        ), "nest"),
+        "snake": Nest(
+            inst.sweep("x", [0, 1, 2]),
+            inst.sweep("y", [4, 5]),
+            inst.sweep("z", [6, 7]),
+            inst.measure("i"),
+            order="snake"
+        ),
+        "hilbert": inst.post_step(Nest(
+            inst.sweep("x", [0, 1, 2]),
+            inst.sweep("y", [4, 5, 6, 7]),
+            order="hilbert"
+        ), "nest"),
+        "zip_uneven": Nest(
+            inst.post_step(Zip(
+                inst.sweep("x", [0, 1, 2]),
+                inst.sweep("y", [4, 5])
+            ), "zip"),
+            inst.measure("i")
+        )
+    }
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["sweep", "nest_3d", "interleave", "snake", "hilbert", "zip_uneven"]
+)
+def test_compiled_equals_original(name):
+    original = Instruments()
+    expected = list(_sweep_objects(original)[name])
+
+    compiled = Instruments()
+    program = compile_sweep(_sweep_objects(compiled)[name])
+    # Compiling does not call any instrument
+    assert compiled.log == []
+
+    assert list(program) == expected
+    assert compiled.log == original.log
+
+    # Programs can be run more than once
+    compiled.log = []
+    compiled.values = {}
+    assert list(program) == expected
+    assert compiled.log == original.log
+
+
+def test_compile_method():
+    instruments = Instruments()
+    so = instruments.sweep("x", [0, 1])(instruments.measure("i"))
+    program = so.compile()
+
+    assert program.parameter_table.nests == so.parameter_table.nests
+    assert program.measurable
+    assert list(program) == [{"x": 0, "i": 0}, {"x": 1, "i": 1}]
+
+
+def test_cannot_compile():
+    table = ParamTable([ParamSpec("x", "numeric")])
+
+    with pytest.raises(TypeError):
+        compile_sweep(Sweep(lambda x: {"x": x}, table, lambda: [0, 1]))
+
+    with pytest.raises(TypeError):
+        compile_sweep(IteratorSweep(lambda: iter([{"x": 0}]), table))
+
+
+def test_fingerprint_of_set_point_generators(monkeypatch):
+
+    def fingerprint(points):
+        instruments = Instruments()
+        return compile_sweep(Nest(
+            instruments.sweep("x", points), instruments.measure("i")
+        )).fingerprint()
+
+    same = fingerprint(Random(0, 1, 4, seed=1))
+    assert fingerprint(Random(0, 1, 4, seed=1)) == same
+    assert fingerprint(Random(0, 1, 4, seed=2)) != same
+    assert fingerprint(Linspace(0, 1, 4)) != fingerprint(Linspace(0, 1, 5))
+
+    # The set points of generators are not computed for the fingerprint
+    program = compile_sweep(Instruments().sweep("x", Linspace(0, 1, 4)))
+    monkeypatch.setattr(Linspace, "_values", None)
+    program.fingerprint()
@@ -1,13 +1,19 @@
+import asyncio
+
 import pytest
 import numpy as np
 import time
+import warnings
 
 from qcodes import Parameter
 
-from qsweep.convenience import sweep, measure
+from qsweep import convenience
+from qsweep.convenience import (
+    sweep, measure, parallel, time_trace, buffered_time_trace
+)
 from qsweep.decorators import getter, setter
 
-from ._test_tools import Factory
+from ._test_tools import Factory, FakeClock
 
 
 @pytest.fixture()
@@ -18,6 +24,13 @@ def parameters():
     return Factory(create_param)
 
 
+@pytest.fixture()
+def fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(convenience, "time", clock)
+    return clock
+
+
 @pytest.fixture()
 def sweep_functions():
     def create_function(name):
@@ -144,3 +157,332 @@ def test_delay(parameters):
         (n_values - 1) * [step_delay],
         atol=1E-2
     )
+
+
+def test_delay_settles_before_measurement(parameters):
+
+    px, py, pi = parameters["x"], parameters["y"], parameters["i"]
+    step_delay = 0.1
+
+    get_times = []
+
+    @getter(("i", "A"))
+    def i_getter():
+        get_times.append(time.perf_counter())
+        return pi.get()
+
+    so = sweep(px, [0, 1], step_delay=step_delay)(
+        sweep(py, [0, 1], step_delay=step_delay)(measure(i_getter))
+    )
+
+    t0 = time.perf_counter()
+    list(so)
+    get_times = np.array(get_times) - t0
+
+    # x and y settle at the same time, so the first measurement only waits
+    # for one step delay
+    assert np.isclose(get_times[0], step_delay, atol=3E-2)
+    # Each measurement waits for the preceding set operation to settle
+    assert np.allclose(np.diff(get_times), step_delay, atol=3E-2)
+
+
+def test_delay_only_settles_own_tree(parameters):
+
+    px, pi = parameters["x"], parameters["i"]
+    step_delay = 0.3
+
+    get_times = []
+
+    @getter(("j", "A"))
+    def j_getter():
+        get_times.append(time.perf_counter())
+        return 0
+
+    # Setting a parameter in one sweep object does not delay measurements
+    # in another one
+    slow = sweep(px, [0, 1], step_delay=step_delay)(measure(pi))
+    next(iter(slow))
+
+    t0 = time.perf_counter()
+    list(measure(j_getter))
+    assert get_times[-1] - t0 < step_delay / 3
+
+    # Nor in an independent branch of a parallel sweep object
+    so = parallel(
+        sweep(px, [0, 1], step_delay=step_delay)(measure(pi)),
+        measure(j_getter)
+    )
+    t0 = time.perf_counter()
+    list(so)
+    assert get_times[-1] - t0 < step_delay / 3
+
+
+def test_no_delay(parameters):
+
+    so = sweep(parameters["p"], [0, 1])
+    assert so._post_step_calls == []
+    assert so.step_delay == 0
+
+
+def test_time_trace(fake_clock):
+    interval_time = 0.25
+    total_time = 2.5
+
+    @getter(("i", "A"))
+    def slow_getter():
+        fake_clock.sleep(0.1)
+        return 0
+
+    result = list(time_trace(interval_time, total_time)(measure(slow_getter)))
+
+    # Samples are taken on a fixed grid, so the time taken by the getter
+    # does not accumulate
+    times = [data["time"] for data in result]
+    assert times == list(interval_time * np.arange(11))
+    assert fake_clock.now == pytest.approx(total_time + 0.1)
+
+    count = [0]
+
+    def stop_condition():
+        count[0] += 1
+        return count[0] > 3
+
+    assert len(list(time_trace(interval_time,
+                               stop_condition=stop_condition))) == 3
+
+    with pytest.raises(ValueError):
+        time_trace(interval_time)
+
+
+def test_time_trace_missed_samples(fake_clock):
+
+    @getter(("i", "A"))
+    def slow_getter():
+        fake_clock.sleep(2.5)
+        return 0
+
+    with pytest.warns(RuntimeWarning, match="missed 6 of 11"):
+        result = list(time_trace(1, 10)(measure(slow_getter)))
+
+    # Samples which are late by less than an interval are taken right away,
+    # but are still reported at their grid time
+    assert [data["time"] for data in result] == [0, 2, 5, 7, 10]
+
+
+def test_buffered_time_trace(fake_clock):
+    interval_time = 0.001
+    reads = []
+
+    @getter(("v", "V"), ("w", "V"))
+    def read_buffer():
+        reads.append(fake_clock.perf_counter())
+        offset = 10 * (len(reads) - 1)
+        return np.arange(offset, offset + 10), np.zeros(10)
+
+    so = buffered_time_trace(
+        read_buffer, interval_time, total_time=0.0245, poll_interval=0.01
+    )
+
+    assert so.parameter_table.nests == [["time", "v"], ["time", "w"]]
+
+    result = list(so)
+    assert len(reads) == 3
+    assert [data["v"] for data in result] == list(range(25))
+    assert np.allclose([data["time"] for data in result],
+                       np.arange(25) * interval_time)
+    assert np.allclose(np.diff(reads), 0.01)
+
+    reads.clear()
+    blocks = list(so.iter_blocks(block_size=100))
+    assert [len(block["time"]) for block in blocks] == [10, 10, 5]
+
+
+def test_buffered_time_trace_slow_read(fake_clock):
+    n_reads = []
+
+    @getter(("v", "V"))
+    def read_buffer():
+        # Reading takes longer than the poll interval, but no samples are
+        # lost since they are buffered
+        fake_clock.sleep(0.02)
+        n_reads.append(1)
+        return np.arange(10)
+
+    so = buffered_time_trace(
+        read_buffer, 0.001, total_time=0.0295, poll_interval=0.01
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = list(so)
+
+    assert len(result) == 30
+    assert len(n_reads) == 3
+
+
+def test_buffered_time_trace_instrument_stops(fake_clock):
+    reads = []
+
+    @getter(("v", "V"))
+    def read_buffer():
+        # The instrument stops acquiring after the first read
+        reads.append(1)
+        return np.arange(5) if len(reads) == 1 else np.array([])
+
+    so = buffered_time_trace(
+        read_buffer, 0.01, total_time=0.1, poll_interval=0.02
+    )
+
+    with pytest.warns(RuntimeWarning):
+        result = list(so)
+
+    assert len(result) == 5
+    # Reading stops a poll interval after the total time
+    assert fake_clock.now < 0.1 + 3 * 0.02
+
+
+def _buffered_instruments():
+    """
+    A fake source with a trigger list and a fake meter with a buffer
+    """
+    calls = []
+    state = {"x": 0, "trigger_list": []}
+
+    def upload(values):
+        calls.append("upload")
+        state["trigger_list"] = list(values)
+
+    def read(n_points):
+        calls.append("read")
+        points = state["trigger_list"][:n_points]
+        return np.array(points) * 2, np.array(points) + 1
+
+    @setter(("x", "V"), buffered=upload)
+    def x_setter(value):
+        calls.append("set")
+        state["x"] = value
+
+    @getter(("i", "A"), ("j", "A"), buffered=read)
+    def i_getter():
+        calls.append("get")
+        return state["x"] * 2, state["x"] + 1
+
+    return x_setter, i_getter, calls
+
+
+def test_buffered_sweep():
+    x_setter, i_getter, calls = _buffered_instruments()
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        pass
+
+    so = sweep(y_setter, [0, 1])(sweep(x_setter, [1, 2, 3])(measure(i_getter)))
+    result = list(so)
+
+    assert result == [
+        {"y": y, "x": x, "i": 2 * x, "j": x + 1}
+        for y in [0, 1] for x in [1, 2, 3]
+    ]
+    # Like the rows of a nest which runs point by point
+    assert list(result[0]) == ["i", "j", "x", "y"]
+    assert calls == ["upload", "read"] * 2
+
+    calls.clear()
+    blocks = list(so.iter_blocks(100))
+    assert calls == ["upload", "read"] * 2
+
+    # The buffered acquisition is made once, not at every outer step
+    inner = sweep(x_setter, [1, 2, 3])(measure(i_getter))
+    assert inner._runnable_objects() is inner._runnable_objects()
+    # The blocks of both outer steps are merged
+    assert len(blocks) == 1
+    assert np.array_equal(blocks[0]["x"], [1, 2, 3] * 2)
+    assert np.array_equal(blocks[0]["i"], [2, 4, 6] * 2)
+    assert np.array_equal(blocks[0]["y"], [0, 0, 0, 1, 1, 1])
+
+
+def test_buffered_sweep_async():
+    x_setter, i_getter, calls = _buffered_instruments()
+
+    @setter(("y", "V"))
+    async def y_setter(value):
+        pass
+
+    so = sweep(y_setter, [0, 1])(sweep(x_setter, [1, 2, 3])(measure(i_getter)))
+
+    async def collect():
+        return [value async for value in so]
+
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(collect())
+    finally:
+        loop.close()
+
+    assert result == [
+        {"y": y, "x": x, "i": 2 * x, "j": x + 1}
+        for y in [0, 1] for x in [1, 2, 3]
+    ]
+    assert calls == ["upload", "read"] * 2
+
+
+def test_buffered_sweep_falls_back():
+    x_setter, i_getter, calls = _buffered_instruments()
+
+    # Post step functions need to run at every point
+    inner = sweep(x_setter, [1, 2])
+    inner.add_post_step(lambda: None)
+    so = inner(measure(i_getter))
+
+    result = list(so)
+    assert result == [{"x": x, "i": 2 * x, "j": x + 1} for x in [1, 2]]
+    assert list(result[0]) == ["i", "j", "x"]
+    assert calls == ["set", "get"] * 2
+
+
+def test_buffered_sweep_coroutines():
+    calls = []
+    state = {"trigger_list": []}
+
+    async def upload(values):
+        calls.append("upload")
+        state["trigger_list"] = list(values)
+
+    async def read(n_points):
+        calls.append("read")
+        return np.array(state["trigger_list"][:n_points]) * 2
+
+    @setter(("x", "V"), buffered=upload)
+    def x_setter(value):
+        calls.append("set")
+
+    @getter(("i", "A"), buffered=read)
+    def i_getter():
+        calls.append("get")
+        return 0
+
+    so = sweep(x_setter, [1, 2, 3])(measure(i_getter))
+    expected = [{"i": 2 * x, "x": x} for x in [1, 2, 3]]
+    assert list(so) == expected
+
+    async def collect():
+        return [value async for value in so]
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(collect()) == expected
+    finally:
+        loop.close()
+
+    assert calls == ["upload", "read"] * 2
+
+
+def test_buffered_getter_length():
+
+    @getter(("i", "A"), buffered=lambda n_points: np.zeros(n_points + 1))
+    def i_getter():
+        return 0
+
+    with pytest.raises(ValueError):
+        i_getter.buffered(3)
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+try:
+    from qcodes.dataset.sqlite.database import (
+        initialise_or_create_database_at
+    )
+except ImportError:
+    # Older versions of QCoDeS
+    from qcodes.dataset.database import initialise_or_create_database_at
+
+from qcodes.dataset.data_set import load_by_id
+
+from qsweep.convenience import sweep, measure, nest
+from qsweep.decorators import getter, setter
+from qsweep.do_experiment import do_experiment, _DataExtractor
+from qsweep.qcodes_compat import make_datasaver
+
+
+@pytest.fixture()
+def database(tmp_path):
+    initialise_or_create_database_at(str(tmp_path / "experiments.db"))
+
+
+@pytest.fixture()
+def run_id(database):
+    state = {}
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        state["x"] = value
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        state["y"] = value
+
+    @getter(("i", "A"))
+    def i_getter():
+        return state["x"] * 10 + state["y"]
+
+    @getter(("j", "A"))
+    def j_getter():
+        return -state["x"]
+
+    @getter(("k", "A"))
+    def k_getter():
+        return state["x"] ** 2
+
+    sweep_object = nest(
+        sweep(x_setter, np.linspace(-1, 1, 11)),
+        sweep(y_setter, [0, 1])
+    )(measure(i_getter), measure(j_getter), measure(k_getter))
+
+    return do_experiment("exp/sample", sweep_object).run_id
+
+
+def load_datasaver(run_id):
+    return make_datasaver(load_by_id(run_id))
+
+
+def test_layouts_from_dataset(run_id):
+    result = _DataExtractor(load_datasaver(run_id))
+
+    x_values = np.repeat(np.linspace(-1, 1, 11), 2)
+    data = result["x,y,i"]
+    assert np.allclose(data["x"], x_values)
+    assert np.allclose(data["i"], x_values * 10 + np.tile([0, 1], 11))
+    assert np.allclose(result["j"]["j"], -x_values)
+
+    with pytest.raises(ValueError):
+        result["x,z"]
+
+
+def test_cache_eviction(run_id):
+    datasaver = load_datasaver(run_id)
+    dataset = datasaver.dataset
+
+    loaded = []
+    get_parameter_data = dataset.get_parameter_data
+
+    def counting_get_parameter_data(*names, **kwargs):
+        loaded.extend(names)
+        return get_parameter_data(*names, **kwargs)
+
+    dataset.get_parameter_data = counting_get_parameter_data
+    result = _DataExtractor(datasaver, cache_size=2)
+
+    result["x,y,i"]
+    result["x,y,j"]
+    result["x,y,i"]
+    assert loaded == ["i", "j"]
+
+    # The least recently used layout is evicted
+    result["x,y,k"]
+    result["x,y,i"]
+    assert loaded == ["i", "j", "k"]
+    result["x,y,j"]
+    assert loaded == ["i", "j", "k", "j"]
+
+
+def test_chunked_readout(run_id):
+    result = _DataExtractor(load_datasaver(run_id))
+    x_values = np.repeat(np.linspace(-1, 1, 11), 2)
+
+    chunks = list(result.iter_chunks("x,y,k", rows=4))
+    assert [len(chunk["k"]) for chunk in chunks] == [4, 4, 4, 4, 4, 2]
+    assert np.allclose(np.concatenate([chunk["x"] for chunk in chunks]),
+                       x_values)
+
+    assert np.isclose(result.mean("x,y,j", "j", rows=4), 0)
+    assert np.isclose(result.min("x,y,k", "k", rows=5), 0)
+    assert np.isclose(result.max("x,y,i", "i", rows=5), 11)
+
+    counts, edges = result.histogram("x,y,k", "k", bins=4, rows=3)
+    expected_counts, expected_edges = np.histogram(x_values ** 2, bins=4)
+    assert np.all(counts == expected_counts)
+    assert np.allclose(edges, expected_edges)
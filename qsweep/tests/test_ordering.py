@@ -0,0 +1,39 @@
+import itertools
+
+import pytest
+
+from qsweep.ordering import raster_indices, snake_indices, hilbert_indices
+
+
+def _steps(indices):
+    return [
+        sum(abs(a - b) for a, b in zip(first, second))
+        for first, second in zip(indices, indices[1:])
+    ]
+
+
+@pytest.mark.parametrize("lengths", [(3,), (3, 4), (2, 3, 4), (1, 5, 2)])
+def test_snake_indices(lengths):
+    indices = list(snake_indices(lengths))
+
+    assert sorted(indices) == list(raster_indices(lengths))
+    assert all(step == 1 for step in _steps(indices))
+
+
+@pytest.mark.parametrize(
+    "lengths", [(1, 1), (4, 4), (8, 8), (5, 3), (3, 7), (6, 10), (1, 4)]
+)
+def test_hilbert_indices(lengths):
+    indices = list(hilbert_indices(lengths))
+
+    assert sorted(indices) == list(
+        itertools.product(*[range(length) for length in lengths])
+    )
+    assert all(step == 1 for step in _steps(indices))
+
+
+def test_hilbert_dimensions():
+    assert list(hilbert_indices((0, 3))) == []
+
+    with pytest.raises(ValueError):
+        list(hilbert_indices((2, 2, 2)))
@@ -1,5 +1,8 @@
 from qcodes import ParamSpec
+import pytest
+
 from qsweep.base import ParamTable
+from qsweep.param_table import prod, add
 
 
 def test_nest():
@@ -254,3 +257,30 @@ def test_nest_chain_nest():
 
     assert table_specs[4].name == 'e'
     assert table_specs[4].depends_on == 'a, d'
+
+
+def test_shared_structure():
+    """
+    Nesting and chaining share the param specs of the operands, which are
+    never modified, and resolved dependencies are cached
+    """
+    specs = [ParamSpec(f"p{i}", paramtype="numeric") for i in range(300)]
+    tables = [ParamTable([spec]) for spec in specs]
+
+    table_result = prod([tables[0], add(tables[1:])])
+    assert table_result.param_specs == specs
+    assert all(a is b for a, b in zip(table_result.param_specs, specs))
+
+    table_result.resolve_dependencies()
+    table_specs = table_result.param_specs
+    assert table_specs[1].depends_on == 'p0'
+    assert specs[1].depends_on == ''
+    # Resolving again returns the cached specs
+    table_result.resolve_dependencies()
+    assert all(a is b for a, b in zip(table_result.param_specs, table_specs))
+
+    with pytest.raises(TypeError):
+        tables[0].nest(table_result)
+
+    with pytest.raises(AttributeError):
+        table_result.extra = None
@@ -0,0 +1,67 @@
+import threading
+import pytest
+
+from qsweep.pipeline import AcquisitionThread
+from qsweep.convenience import sweep, measure
+from qsweep.decorators import getter, setter
+
+
+def test_order_preserved():
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    @getter(("i", "A"))
+    def i_getter():
+        return threading.current_thread().name
+
+    so = sweep(x_setter, range(50))(measure(i_getter))
+
+    with AcquisitionThread(so, queue_size=4) as acquisition:
+        result = list(acquisition)
+
+    assert [r["x"] for r in result] == list(range(50))
+    # The getter ran on the acquisition thread
+    assert all(r["i"] != threading.current_thread().name for r in result)
+
+
+def test_acquisition_error_is_raised():
+
+    def points():
+        yield 0
+        raise RuntimeError("instrument went away")
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    so = sweep(x_setter, points)
+    received = []
+
+    with pytest.raises(RuntimeError):
+        with AcquisitionThread(so) as acquisition:
+            for data in acquisition:
+                received.append(data)
+
+    assert received == [{"x": 0}]
+
+
+def test_consumer_error_stops_acquisition():
+    set_values = []
+    queue_size = 3
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        set_values.append(value)
+
+    so = sweep(x_setter, range(1000))
+
+    with pytest.raises(RuntimeError):
+        with AcquisitionThread(so, queue_size=queue_size) as acquisition:
+            for data in acquisition:
+                raise RuntimeError("disk full")
+
+    # One item consumed, the queue filled up and at most one item was in
+    # flight when the acquisition was told to stop
+    assert len(set_values) <= 1 + queue_size + 1
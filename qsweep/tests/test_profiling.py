@@ -0,0 +1,151 @@
+import time
+
+import numpy as np
+import pytest
+
+from qsweep.convenience import sweep, measure
+from qsweep.decorators import getter, setter
+from qsweep.do_experiment import do_experiment
+from qsweep.profiling import Profiler, SET, GET, POST
+from qsweep.storage import NumpyStore
+
+
+def make_sweep_object(delay):
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        time.sleep(delay)
+
+    @getter(("i", "A"))
+    def i_getter():
+        return 1
+
+    sweep_object = sweep(x_setter, [0, 1, 2])(measure(i_getter))
+    sweep_object.add_post_step(lambda: time.sleep(delay))
+
+    return sweep_object
+
+
+def test_profile_sweep_tree():
+    delay = 0.01
+    sweep_object = make_sweep_object(delay)
+
+    profiler = sweep_object.profile()
+    result = list(sweep_object)
+    assert result == [{"x": x, "i": 1} for x in [0, 1, 2]]
+
+    summary = profiler.summary()
+    nest, x_sweep, chain, i_measure, storage = summary
+
+    assert [entry["depth"] for entry in summary[:-1]] == [0, 1, 1, 2]
+    assert nest["node"] == "Nest(x, i)"
+    assert nest["steps"] == 3
+    assert nest["post"] >= 3 * delay
+    assert x_sweep["set"] >= 3 * delay
+    assert x_sweep["get"] == 0
+    assert i_measure["steps"] == 3
+    assert nest["next"] >= x_sweep["set"]
+    assert storage["flushes"] == 0
+
+    events = profiler.events()
+    assert len(events) == profiler.n_events
+    assert np.sum(events["kind"] == SET) == 3
+    assert np.sum(events["kind"] == GET) == 3
+    assert np.sum((events["kind"] == POST) & (events["node"] == 0)) == 3
+    # Events are recorded when the operation finishes
+    assert np.all(np.diff(events["start"] + events["duration"]) > -1e-9)
+
+    report = profiler.report()
+    assert "Measure(i)" in report
+    assert "storage" in report
+
+
+def test_profile_replayed_inner_sweep():
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        pass
+
+    y_sweep = sweep(y_setter, [0, 1, 2])
+    y_post_steps = []
+    y_sweep.add_post_step(lambda: y_post_steps.append(None))
+    sweep_object = sweep(x_setter, [0, 1])(y_sweep)
+
+    profiler = sweep_object.profile()
+    assert len(list(sweep_object)) == 6
+
+    # The replayed set points of the inner sweep are timed like steps
+    y_entry = profiler.summary()[profiler.labels.index("Sweep(y)")]
+    assert y_entry["steps"] == 6
+    events = profiler.events()
+    y_node = profiler.labels.index("Sweep(y)")
+    assert np.sum((events["kind"] == SET) & (events["node"] == y_node)) == 6
+    assert np.sum((events["kind"] == POST) & (events["node"] == y_node)) == 6
+    assert len(y_post_steps) == 6
+
+
+def test_post_steps_added_while_attached():
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    calls = []
+    sweep_object = sweep(x_setter, [0, 1])
+    sweep_object.add_post_step(lambda: calls.append("before"))
+
+    profiler = Profiler()
+    profiler.attach(sweep_object)
+    sweep_object.add_post_step(lambda: calls.append("attached"))
+    list(sweep_object)
+    profiler.detach()
+    list(sweep_object)
+
+    # Post steps added while the profiler is attached are kept
+    assert calls == ["before", "attached"] * 4
+    # And the post steps are no longer timed
+    n_events = profiler.n_events
+    list(sweep_object)
+    assert profiler.n_events == n_events
+
+
+def test_ring_buffer_wraps():
+    sweep_object = make_sweep_object(delay=0)
+
+    profiler = Profiler(capacity=5)
+    profiler.attach(sweep_object)
+    list(sweep_object)
+
+    events = profiler.events()
+    assert len(events) == 5
+    assert profiler.n_events > 5
+    # Totals cover all events, not just the ones in the buffer
+    assert profiler.summary()[0]["steps"] == 3
+    assert events[-1]["kind"] == POST
+
+    with pytest.raises(ValueError):
+        Profiler(capacity=0)
+
+
+def test_profile_experiment(tmp_path):
+    sweep_object = make_sweep_object(delay=0)
+    set_function = sweep_object._sweep_objects[0]._set_function
+
+    profiler = Profiler()
+    do_experiment("exp/sample", sweep_object, profiler=profiler,
+                  storage=NumpyStore(str(tmp_path)), flush_rows=2)
+
+    storage = profiler.summary()[-1]
+    assert storage["flushes"] == 2
+    assert storage["flush"] > 0
+    assert profiler.summary()[1]["set"] > 0
+
+    # The instrumentation is removed after the run
+    assert sweep_object._sweep_objects[0]._set_function is set_function
+    n_events = profiler.n_events
+    list(sweep_object)
+    assert profiler.n_events == n_events
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from qsweep.convenience import sweep, measure
+from qsweep.decorators import getter, setter
+from qsweep.setpoints import (
+    Linspace, Logspace, Geomspace, Chebyshev, Piecewise, DenseWindows,
+    Random, LatinHypercube, SetPoints
+)
+
+
+@pytest.mark.parametrize("set_points, expected", [
+    (Linspace(-1, 1, 11), np.linspace(-1, 1, 11)),
+    (Linspace(0, 1, 10, endpoint=False), np.linspace(0, 1, 10, False)),
+    (Linspace(3, 4, 1), np.linspace(3, 4, 1)),
+    (Linspace(3, 4, 0), np.linspace(3, 4, 0)),
+    (Logspace(-3, 2, 6), np.logspace(-3, 2, 6)),
+    (Logspace(0, 3, 4, base=2), np.logspace(0, 3, 4, base=2)),
+    (Geomspace(1, 1000, 4), np.geomspace(1, 1000, 4)),
+    (Geomspace(-1, -16, 5), np.geomspace(-1, -16, 5)),
+])
+def test_like_numpy(set_points, expected):
+    assert len(set_points) == len(expected)
+    assert np.allclose(list(set_points), expected)
+    assert np.allclose(set_points.to_array(), expected)
+    assert np.allclose(set_points[::2], expected[::2])
+
+    if len(expected):
+        assert np.isclose(set_points[-1], expected[-1])
+        assert np.allclose(set_points.bounds, (expected.min(), expected.max()))
+
+
+def test_lazy():
+    set_points = Linspace(0, 1, 10 ** 12 + 1)
+
+    assert len(set_points) == 10 ** 12 + 1
+    assert set_points.bounds == (0, 1)
+    assert set_points[10 ** 11] == pytest.approx(0.1)
+
+    with pytest.raises(IndexError):
+        set_points[10 ** 12 + 1]
+
+
+def test_abstract():
+    with pytest.raises(TypeError):
+        SetPoints(10)
+
+
+def test_chebyshev():
+    set_points = Chebyshev(-1, 1, 5)
+    values = set_points.to_array()
+
+    assert np.all(np.diff(values) > 0)
+    # The roots of the Chebyshev polynomial of degree five
+    assert np.allclose(np.polynomial.chebyshev.chebval(values, [0] * 5 + [1]),
+                       0)
+
+
+def test_piecewise():
+    set_points = Piecewise(
+        Linspace(0, 1, 4, endpoint=False), [1, 1.5], Logspace(0.5, 1, 2)
+    )
+
+    expected = [0, 0.25, 0.5, 0.75, 1, 1.5, 10 ** 0.5, 10]
+    assert len(set_points) == len(expected)
+    assert np.allclose(list(set_points), expected)
+    assert np.allclose(set_points[3: 7], expected[3: 7])
+    assert set_points.bounds == (0, 10)
+
+
+def test_dense_windows():
+    set_points = DenseWindows(0, 10, 11, [(2.5, 3.5, 5), (7, 8, 3)])
+
+    assert np.allclose(list(set_points), [
+        0, 1, 2, 2.5, 2.75, 3, 3.25, 3.5, 4, 5, 6, 7, 7.5, 8, 9, 10
+    ])
+
+    with pytest.raises(ValueError):
+        DenseWindows(0, 10, 11, [(2, 5, 3), (4, 6, 3)])
+
+
+def test_random():
+    set_points = Random(-2, 2, 10000, seed=3)
+    values = set_points.to_array()
+
+    assert np.all((values >= -2) & (values < 2))
+    # Reproducible, by iteration as well as by index
+    assert np.array_equal(list(set_points), values)
+    assert set_points[9000] == values[9000]
+    assert np.array_equal(Random(-2, 2, 10000, seed=3).to_array(), values)
+    assert not np.array_equal(Random(-2, 2, 10000, seed=4).to_array(), values)
+
+    # Seeds which do not fit in 32 bits, as picked when no seed is given
+    large_seed = Random(-2, 2, 10, seed=2 ** 40 + 3).to_array()
+    assert not np.array_equal(large_seed, values[:10])
+    assert len(Random(-2, 2, 10).to_array()) == 10
+
+
+def test_latin_hypercube():
+    n_points = 20
+    set_points = LatinHypercube([(0, 1), (-10, 10)], n_points, seed=1)
+    values = set_points.to_array()
+
+    assert values.shape == (n_points, 2)
+    # Every slice along every parameter holds exactly one point
+    for parameter, (low, high) in enumerate([(0, 1), (-10, 10)]):
+        slices = np.floor(
+            (values[:, parameter] - low) / (high - low) * n_points
+        )
+        assert sorted(slices) == list(range(n_points))
+
+    assert np.array_equal(np.array(list(set_points)), values)
+
+
+def test_sweep_does_not_materialize():
+    set_values = []
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        set_values.append(value)
+
+    @getter(("i", "A"))
+    def i_getter():
+        return 0
+
+    so = sweep(x_setter, Linspace(0, 1, 10 ** 9))(measure(i_getter))
+    assert len(so) == 10 ** 9
+
+    for count, _ in zip(range(3), so):
+        pass
+    assert set_values == [0, 1 / (10 ** 9 - 1), 2 / (10 ** 9 - 1)]
+
+
+def test_sweep_several_parameters():
+
+    @setter(("x", "V"), ("y", "V"))
+    def xy_setter(x, y):
+        pass
+
+    set_points = LatinHypercube([(0, 1), (0, 1)], 5)
+    so = sweep(xy_setter, set_points)
+
+    assert len(so) == 5
+    result = list(so)
+    assert np.allclose([(row["x"], row["y"]) for row in result],
+                       set_points.to_array())
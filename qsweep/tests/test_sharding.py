@@ -0,0 +1,126 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from qsweep.convenience import sweep, measure, nest
+from qsweep.decorators import getter, setter
+from qsweep.do_experiment import do_experiment
+from qsweep.sharding import iter_sharded
+from qsweep.storage import NumpyStore
+
+
+@pytest.fixture()
+def simulator():
+    state = {"x": 0, "y": 0}
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        state["x"] = value
+
+    @setter(("y", "V"))
+    def y_setter(value):
+        state["y"] = value
+
+    @getter(("i", "A"), ("pid", ""))
+    def i_getter():
+        # Make sure that the shards do not all end up on one worker
+        time.sleep(0.005)
+        return state["x"] * 10 + state["y"], os.getpid()
+
+    return x_setter, y_setter, i_getter
+
+
+def test_same_results_in_order(simulator):
+    x_setter, y_setter, i_getter = simulator
+
+    so = nest(
+        sweep(x_setter, np.linspace(0, 9, 10)),
+        sweep(y_setter, [0, 1, 2]),
+        measure(i_getter)
+    )
+
+    result = list(iter_sharded(so, processes=2, shard_size=1))
+    expected = list(so)
+
+    def strip(rows):
+        return [{k: v for k, v in row.items() if k != "pid"} for row in rows]
+
+    assert strip(result) == strip(expected)
+    # The points were measured on the worker processes
+    pids = {row["pid"] for row in result}
+    assert os.getpid() not in pids
+    assert len(pids) == 2
+
+
+def test_blocks(simulator):
+    x_setter, y_setter, i_getter = simulator
+    so = sweep(x_setter, range(6))(sweep(y_setter, range(4)))(
+        measure(i_getter)
+    )
+
+    blocks = list(iter_sharded(so, processes=3, block_size=5))
+    i = np.concatenate([block["i"] for block in blocks])
+    assert np.array_equal(i, [x * 10 + y for x in range(6) for y in range(4)])
+
+
+def test_post_steps(simulator):
+    x_setter, y_setter, i_getter = simulator
+
+    outer = sweep(x_setter, range(4))
+    outer.add_post_step(lambda: y_setter(5))
+    so = outer(measure(i_getter))
+
+    result = list(iter_sharded(so, processes=2))
+    assert [row["i"] for row in result] == [5, 15, 25, 35]
+
+
+def test_dynamic_points_not_supported(simulator):
+    x_setter, y_setter, i_getter = simulator
+    so = sweep(x_setter, lambda: range(4))(measure(i_getter))
+
+    with pytest.raises(TypeError):
+        list(iter_sharded(so, processes=2))
+
+
+def test_do_experiment(tmp_path, simulator):
+    x_setter, y_setter, i_getter = simulator
+
+    so = sweep(x_setter, range(8))(sweep(y_setter, range(3)))(
+        measure(i_getter)
+    )
+
+    store = NumpyStore(str(tmp_path / "store"))
+    data = do_experiment("exp/sample", so, storage=store, processes=2)
+
+    layout = data["x,y,i"]
+    assert np.array_equal(layout["x"], np.repeat(range(8), 3))
+    assert np.array_equal(layout["i"], layout["x"] * 10 + layout["y"])
+
+
+def test_pipelined(tmp_path, simulator):
+    x_setter, _, i_getter = simulator
+    so = sweep(x_setter, range(4))(measure(i_getter))
+
+    store = NumpyStore(str(tmp_path / "store"))
+    with pytest.raises(ValueError):
+        do_experiment("exp/sample", so, storage=store, processes=2,
+                      pipelined=True)
+
+
+def test_async_getter():
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    @getter(("pid", ""))
+    async def pid_getter():
+        return os.getpid()
+
+    so = sweep(x_setter, range(4))(measure(pid_getter))
+    # Start the event loop for synchronous calls before forking
+    list(so)
+
+    result = list(iter_sharded(so, processes=2, shard_size=1))
+    assert {row["pid"] for row in result} != {os.getpid()}
@@ -0,0 +1,154 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from qsweep.convenience import sweep, measure
+from qsweep.decorators import getter, setter, hardsweep
+from qsweep.do_experiment import do_experiment
+from qsweep.storage import NumpyStore
+
+
+@pytest.fixture()
+def instruments():
+
+    @setter(("x", "V"))
+    def x_setter(value):
+        pass
+
+    @getter(("i", "A"))
+    def i_getter():
+        return 3
+
+    n_samples = 5
+
+    @hardsweep(ind=[("t", "s", "array")], dep=[("trace", "V", "array")])
+    def acquire_trace():
+        t = np.arange(n_samples)
+        return t, t ** 2
+
+    return x_setter, i_getter, acquire_trace
+
+
+@pytest.mark.parametrize("static_points", [True, False])
+def test_numpy_store(tmp_path, instruments, static_points):
+    x_setter, i_getter, acquire_trace = instruments
+
+    x_values = np.linspace(0, 1, 11)
+    points = x_values if static_points else lambda: x_values
+
+    sweep_object = sweep(x_setter, points)(
+        measure(i_getter),
+        acquire_trace()
+    )
+
+    # Use a small capacity to test growing files when the length of the
+    # sweep is unknown
+    store = NumpyStore(str(tmp_path), capacity=2)
+    result = do_experiment("exp/sample", sweep_object, storage=store,
+                           flush_rows=3)
+
+    data = result["x,i"]
+    assert np.all(data["x"] == x_values)
+    assert np.all(data["i"] == 3)
+
+    data = result["trace"]
+    assert np.all(data["x"] == x_values)
+    assert data["trace"].shape == (len(x_values), 5)
+    assert np.all(data["trace"] == np.arange(5) ** 2)
+
+    with open(os.path.join(str(tmp_path), "params.json")) as fh:
+        description = json.load(fh)
+
+    assert description["experiment_name"] == "exp/sample"
+    assert [layout["parameters"] for layout in description["layouts"]] == \
+        sweep_object.parameter_table.nests
+
+    specs = {spec["name"]: spec for spec in description["param_specs"]}
+    assert specs["trace"]["paramtype"] == "array"
+    assert specs["trace"]["depends_on"] == ["x", "t"]
+
+    # Files are truncated to the number of rows written
+    column = description["layouts"][0]["columns"]["x"]
+    file_size = os.path.getsize(os.path.join(str(tmp_path), column["file"]))
+    assert file_size == len(x_values) * 8
+
+    # Results can be read back later
+    stored = NumpyStore(str(tmp_path)).get_data()
+    assert np.all(stored[0][0]["data"] == x_values)
+
+
+def test_text_not_supported(tmp_path):
+
+    @setter(("x", "V", "text"))
+    def x_setter(value):
+        pass
+
+    with pytest.raises(TypeError):
+        NumpyStore(str(tmp_path)).register_sweep(sweep(x_setter, ["a", "b"]))
+
+
+def test_layouts_loaded_lazily(tmp_path, instruments):
+    x_setter, i_getter, acquire_trace = instruments
+
+    loaded = []
+
+    class CountingStore(NumpyStore):
+        def get_layout_data(self, index):
+            loaded.append(index)
+            return super().get_layout_data(index)
+
+    sweep_object = sweep(x_setter, [0, 1, 2])(
+        measure(i_getter),
+        acquire_trace()
+    )
+
+    store = CountingStore(str(tmp_path))
+    result = do_experiment("exp/sample", sweep_object, storage=store)
+    result._cache_size = 1
+    assert loaded == []
+
+    assert np.all(result["x,i"]["i"] == 3)
+    assert np.all(result["i"]["x"] == [0, 1, 2])
+    assert loaded == [0]
+
+    assert result["trace"]["trace"].shape == (3, 5)
+    assert loaded == [0, 1]
+
+    # The first layout was evicted from the cache
+    result["x,i"]
+    assert loaded == [0, 1, 0]
+
+    with pytest.raises(ValueError):
+        result["x,y"]
+
+
+def test_chunked_readout(tmp_path, instruments):
+    x_setter, i_getter, acquire_trace = instruments
+
+    x_values = np.linspace(-1, 1, 11)
+    sweep_object = sweep(x_setter, x_values)(
+        measure(i_getter),
+        acquire_trace()
+    )
+
+    result = do_experiment("exp/sample", sweep_object,
+                           storage=NumpyStore(str(tmp_path)))
+
+    chunks = list(result.iter_chunks("x,i", rows=4))
+    assert [len(chunk["x"]) for chunk in chunks] == [4, 4, 3]
+    assert np.all(np.concatenate([chunk["x"] for chunk in chunks]) == x_values)
+
+    assert np.isclose(result.mean("x,i", "x", rows=4), 0)
+    assert result.min("x,i", "x", rows=4) == -1
+    assert result.max("x,i", "x", rows=4) == 1
+    assert np.all(result.mean("trace", "trace", rows=4) == np.arange(5) ** 2)
+
+    counts, edges = result.histogram("x,i", "x", bins=4, rows=3)
+    expected_counts, expected_edges = np.histogram(x_values, bins=4)
+    assert np.all(counts == expected_counts)
+    assert np.allclose(edges, expected_edges)
+
+    with pytest.raises(ValueError):
+        result.mean("x,i", "trace")
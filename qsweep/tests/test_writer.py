@@ -0,0 +1,123 @@
+import pytest
+import numpy as np
+
+from qcodes import ParamSpec
+
+from qsweep.param_table import ParamTable
+from qsweep.writer import ResultWriter
+
+
+class RecordingSaver:
+    """
+    Mimics the `add_result` method of a QCoDeS data saver
+    """
+    def __init__(self):
+        self.calls = []
+
+    def add_result(self, *res):
+        self.calls.append({name: value for name, value in res})
+
+    def rows(self, *names):
+        """
+        Unravel the recorded calls into rows with the given parameter names
+        """
+        rows = []
+        for call in self.calls:
+            if set(call.keys()) != set(names):
+                continue
+            columns = [np.atleast_1d(call[name]) for name in names]
+            rows.extend(zip(*columns))
+        return rows
+
+
+@pytest.fixture()
+def table():
+    return ParamTable([
+        ParamSpec("x", "numeric"),
+        ParamSpec("i", "numeric"),
+        ParamSpec("j", "array")
+    ])
+
+
+def test_flush_rows(table):
+    saver = RecordingSaver()
+    writer = ResultWriter(saver, table, flush_rows=3, flush_interval=np.inf)
+
+    for x in range(2):
+        writer.add_result({"x": x, "i": x ** 2})
+
+    assert saver.calls == []
+    writer.add_result({"x": 2, "i": 4})
+
+    assert len(saver.calls) == 1
+    assert list(saver.calls[0]["x"]) == [0, 1, 2]
+    assert list(saver.calls[0]["i"]) == [0, 1, 4]
+
+
+def test_flush_interval(table):
+    saver = RecordingSaver()
+    writer = ResultWriter(saver, table, flush_rows=1000, flush_interval=0)
+
+    writer.add_result({"x": 0, "i": 1})
+    assert saver.rows("x", "i") == [(0, 1)]
+
+
+def test_layouts_keep_order(table):
+    saver = RecordingSaver()
+
+    with ResultWriter(saver, table, flush_interval=np.inf) as writer:
+        for x in range(4):
+            writer.add_result({"x": x, "i": x ** 2})
+            writer.add_result({"x": x, "j": np.arange(x + 1)})
+
+    assert saver.rows("x", "i") == [(x, x ** 2) for x in range(4)]
+
+    array_calls = [call for call in saver.calls if "j" in call]
+    # Array valued parameters are written row by row
+    assert len(array_calls) == 4
+    for x, call in enumerate(array_calls):
+        assert call["x"] == x
+        assert np.all(call["j"] == np.arange(x + 1))
+
+
+def test_flush_on_exception(table):
+    saver = RecordingSaver()
+
+    with pytest.raises(RuntimeError):
+        with ResultWriter(saver, table, flush_interval=np.inf) as writer:
+            writer.add_result({"x": 0, "i": 1})
+            raise RuntimeError("instrument went away")
+
+    assert saver.rows("x", "i") == [(0, 1)]
+
+
+def test_add_block(table):
+    saver = RecordingSaver()
+    x = np.arange(5)
+
+    with ResultWriter(saver, table, flush_interval=np.inf) as writer:
+        writer.add_block({"x": x, "i": x ** 2})
+        writer.add_result({"x": 5, "i": 25})
+
+    assert len(saver.calls) == 1
+    assert saver.rows("x", "i") == [(v, v ** 2) for v in range(6)]
+
+
+def test_ordered(table):
+    saver = RecordingSaver()
+    writer = ResultWriter(saver, table, flush_rows=1000,
+                          flush_interval=np.inf, ordered=True)
+
+    with writer:
+        for x in range(2):
+            writer.add_result({"x": x, "i": x})
+            writer.add_result({"x": x, "i": x, "j": [x]})
+        writer.add_result({"x": 2, "i": 2})
+        writer.add_result({"x": 3, "i": 3})
+
+    # Rows are written in the order they were added, consecutive rows of
+    # the same layout together
+    assert [sorted(call) for call in saver.calls] == [
+        ["i", "x"], ["i", "j", "x"], ["i", "x"], ["i", "j", "x"], ["i", "x"]
+    ]
+    assert list(saver.calls[-1]["x"]) == [2, 3]
@@ -0,0 +1,194 @@
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from qsweep.param_table import ParamTable
+
+
+class ResultWriter:
+    """
+    Collect the dictionaries produced by a sweep object into column arrays and
+    hand them to a data saver in bulk, instead of calling `add_result` once
+    per point.
+
+    Rows are buffered per layout (that is, per set of parameter names).
+    The buffer is flushed when it holds `flush_rows` rows or when
+    `flush_interval` seconds have passed since the last flush, whichever comes
+    first. Leaving the writer as a context manager always flushes, also when
+    an exception is raised inside the `with` block, so that no acquired data
+    is lost when a run aborts.
+
+    Note that within a single flush rows are written layout by layout. The
+    order of rows *within* a layout is preserved. With `ordered=True`, rows
+    are written in the order in which they were added, also across layouts;
+    only consecutive rows of the same layout are written in bulk.
+
+    If the data saver has an `add_columns(names, columns)` method (like
+    `NumpyStore`), every flushed layout is handed to it as whole columns,
+    whatever the parameter types.
+
+    Args:
+        datasaver: Anything with a QCoDeS `DataSaver` style `add_result`
+            method
+        parameter_table: The table of the sweep object which produces the
+            rows. This is used to look up parameter types; only layouts
+            consisting of 'numeric' parameters are written in bulk, the others
+            are written row by row.
+        flush_rows: The number of buffered rows which triggers a flush
+        flush_interval: The number of seconds after which buffered rows
+            are flushed, regardless of how many there are.
+        profiler: Optionally, a `Profiler` (or anything with a
+            `record_flush(start, duration)` method) which records the time
+            spent in each flush
+        on_flush: Optionally, a function which is called with the number of
+            rows written after every flush which wrote rows (e.g. to
+            checkpoint the progress of a run)
+        ordered: Write the rows in the order in which they were added, so
+            that the rows written at any moment are the first rows of the
+            run (e.g. to resume a run from the rows in the dataset)
+    """
+    def __init__(
+            self,
+            datasaver,
+            parameter_table: ParamTable,
+            flush_rows: int = 1000,
+            flush_interval: float = 1.0,
+            profiler=None,
+            on_flush: Callable[[int], None] = None,
+            ordered: bool = False
+    ) -> None:
+
+        if flush_rows < 1:
+            raise ValueError("flush_rows needs to be at least one")
+
+        self._datasaver = datasaver
+        self._add_columns = getattr(datasaver, "add_columns", None)
+        self._flush_rows = flush_rows
+        self._flush_interval = flush_interval
+        self._profiler = profiler
+        self._on_flush = on_flush
+        self._ordered = ordered
+
+        self._numeric = {
+            spec.name: spec.type == "numeric"
+            for spec in parameter_table.param_specs
+        }
+
+        # Tuples of a layout and a list of segments, in the order in which
+        # they are written. A segment is either a list of row tuples (from
+        # `add_result`) or a tuple of columns (from `add_block`).
+        self._buffers: List[
+            Tuple[Tuple[str, ...], List[Union[list, tuple]]]
+        ] = []
+        # The lists of segments which new rows are added to, per layout
+        self._open: Dict[Tuple[str, ...], List[Union[list, tuple]]] = {}
+        self._last_layout: Tuple[str, ...] = None
+        self._n_buffered = 0
+        self._last_flush = time.perf_counter()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.flush()
+
+    def add_result(self, data: dict) -> None:
+        """
+        Buffer a single row, as produced by iterating a sweep object
+        """
+        segments = self._segments(tuple(data.keys()))
+        if not len(segments) or not isinstance(segments[-1], list):
+            segments.append([])
+
+        segments[-1].append(tuple(data.values()))
+        self._n_buffered += 1
+        self._flush_if_due()
+
+    def add_block(self, block: dict) -> None:
+        """
+        Buffer a block of rows, as produced by `iter_blocks` of a sweep
+        object. The column arrays are kept as they are until they are written.
+        """
+        columns = tuple(block.values())
+        if not len(columns) or not len(columns[0]):
+            return
+
+        self._segments(tuple(block.keys())).append(columns)
+        self._n_buffered += len(columns[0])
+        self._flush_if_due()
+
+    def _segments(self, layout: Tuple[str, ...]) -> List[Union[list, tuple]]:
+        if self._ordered and layout != self._last_layout:
+            # Rows of this layout are written after those added in between
+            self._open = {}
+        self._last_layout = layout
+
+        segments = self._open.get(layout)
+        if segments is None:
+            segments = self._open[layout] = []
+            self._buffers.append((layout, segments))
+        return segments
+
+    def _flush_if_due(self) -> None:
+        if self._n_buffered >= self._flush_rows or \
+                time.perf_counter() - self._last_flush > self._flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered rows to the data saver
+        """
+        buffers, self._buffers = self._buffers, []
+        self._open = {}
+        self._last_layout = None
+        n_rows, self._n_buffered = self._n_buffered, 0
+        start = self._last_flush = time.perf_counter()
+
+        for layout, segments in buffers:
+            self._write_layout(layout, [
+                tuple(zip(*segment)) if isinstance(segment, list) else segment
+                for segment in segments
+            ])
+
+        if self._profiler is not None and len(buffers):
+            self._profiler.record_flush(start, time.perf_counter() - start)
+
+        if self._on_flush is not None and n_rows:
+            self._on_flush(n_rows)
+
+    def _write_layout(
+            self, layout: Tuple[str, ...], segments: List[tuple]) -> None:
+
+        if self._add_columns is not None:
+            self._add_columns(layout, [
+                np.asarray(segments[0][count]) if len(segments) == 1 else
+                np.concatenate([
+                    np.asarray(segment[count]) for segment in segments
+                ])
+                for count in range(len(layout))
+            ])
+            return
+
+        if all(self._numeric.get(name, False) for name in layout):
+            segments = [
+                tuple(np.asarray(column) for column in segment)
+                for segment in segments
+            ]
+            # Only plain scalar columns can be handed over in one go. Numeric
+            # parameters which received arrays are left to the data saver
+            # to unravel, one row at a time.
+            if all(c.ndim == 1 and c.dtype != object
+                   for segment in segments for c in segment):
+
+                columns = [
+                    segments[0][count] if len(segments) == 1 else
+                    np.concatenate([segment[count] for segment in segments])
+                    for count in range(len(layout))
+                ]
+                self._datasaver.add_result(*zip(layout, columns))
+                return
+
+        for segment in segments:
+            for row in zip(*segment):
+                self._datasaver.add_result(*zip(layout, row))